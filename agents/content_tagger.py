@@ -1,22 +1,26 @@
 import os
 import json
 import logging
-from typing import List, Dict, Any
-import google.generativeai as genai
+from typing import List, Dict, Any, AsyncIterator, Optional, Callable
+
+from utils.metrics import measure, document_scope
 
 logger = logging.getLogger(__name__)
 
 class ContentTagger:
-    def __init__(self, api_key: str):
-        """Initialize the content tagger with Gemini configuration."""
+    def __init__(self, api_key: str, model_factory: Optional[Callable[[str], Any]] = None):
+        """Initialize the content tagger with Gemini configuration (model_factory defaults to genai.GenerativeModel)."""
+        self.model_factory = model_factory
         self.configure_ai(api_key)
         self.skipped_count = 0
         logger.info("Content tagger initialized")
 
     def configure_ai(self, api_key: str):
         """Configure the Gemini AI model."""
+        import google.generativeai as genai
+
         genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash-lite')
+        self.model = (self.model_factory or genai.GenerativeModel)('gemini-2.0-flash-lite')
 
     async def process_document(self, doc: Dict[str, Any]) -> List[str]:
         """Process a single document and generate tags."""
@@ -27,7 +31,8 @@ class ContentTagger:
 Analysis: {doc.get('analysis', '')}"""
             
             # Generate tags using Gemini
-            tags = await self._generate_tags(content)
+            with document_scope(doc.get('id')):
+                tags = await self._generate_tags(content)
             logger.info(f"Generated {len(tags)} tags for document: {doc.get('name')}")
             
             return tags
@@ -48,7 +53,11 @@ Content:
 {content}"""
 
         try:
-            response = self.model.generate_content(prompt.format(content=content))
+            with measure("gemini.tagger") as measurement:
+                response = self.model.generate_content(prompt.format(content=content))
+                metadata = getattr(response, 'usage_metadata', None)
+                measurement.tokens_in = getattr(metadata, 'prompt_token_count', 0) or 0
+                measurement.tokens_out = getattr(metadata, 'candidates_token_count', 0) or 0
             tags_text = response.text.strip('" \n').lower()
             
             # Split, clean, and limit tags
@@ -71,42 +80,52 @@ Content:
         """Check if a document already has tags."""
         return 'tags' in doc and isinstance(doc['tags'], list) and len(doc['tags']) > 0
 
+    async def iter_process_all_documents(self, skip_tagged=False) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Tag all documents in the processed files database, yielding a result per document.
+        
+        Each result has the document's id and name plus either its new tags or
+        "skipped": True for documents that were already tagged.
+        """
+        self.skipped_count = 0  # Reset counter
+        
+        if not os.path.exists('data/processed_files.json'):
+            logger.warning("No processed files database found")
+            return
+
+        with open('data/processed_files.json', 'r') as f:
+            documents = json.load(f)
+
+        for doc_id, doc in documents.items():
+            # Skip if already tagged and skip_tagged is True
+            if skip_tagged and self._has_tags(doc):
+                logger.info(f"Skipping already tagged document: {doc.get('name', 'Unknown')}")
+                self.skipped_count += 1
+                yield {"id": doc_id, "name": doc.get('name'), "skipped": True}
+                continue
+                
+            tags = await self.process_document(doc)
+            if tags:
+                # Update the document with tags and save immediately
+                doc['tags'] = tags
+                
+                # Save after each successful tagging
+                with open('data/processed_files.json', 'w') as f:
+                    json.dump(documents, f, indent=2)
+                logger.info(f"Updated tags for document {doc.get('name')}")
+            yield {"id": doc_id, "name": doc.get('name'), "tags": tags}
+
     async def process_all_documents(self, skip_tagged=False) -> Dict[str, List[str]]:
         """Process all documents in the processed files database, with option to skip already tagged documents."""
         try:
-            self.skipped_count = 0  # Reset counter
-            
-            if not os.path.exists('data/processed_files.json'):
-                logger.warning("No processed files database found")
-                return {}
-
-            with open('data/processed_files.json', 'r') as f:
-                documents = json.load(f)
-
             results = {}
-            
-            for doc_id, doc in documents.items():
-                # Skip if already tagged and skip_tagged is True
-                if skip_tagged and self._has_tags(doc):
-                    logger.info(f"Skipping already tagged document: {doc.get('name', 'Unknown')}")
-                    self.skipped_count += 1
-                    continue
-                    
-                tags = await self.process_document(doc)
-                if tags:
-                    results[doc_id] = tags
-                    
-                    # Update the document with tags and save immediately
-                    doc['tags'] = tags
-                    
-                    # Save after each successful tagging
-                    with open('data/processed_files.json', 'w') as f:
-                        json.dump(documents, f, indent=2)
-                    logger.info(f"Updated tags for document {doc.get('name')}")
+            async for result in self.iter_process_all_documents(skip_tagged):
+                if result.get("tags"):
+                    results[result["id"]] = result["tags"]
             
             logger.info(f"Processed {len(results)} documents, skipped {self.skipped_count} documents")
             return results
 
         except Exception as e:
             logger.error(f"Error processing documents: {str(e)}")
-            return {} 
\ No newline at end of file
+            return {}
@@ -1,57 +1,294 @@
 import os
+import asyncio
 import logging
+import contextvars
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, Any, Optional
-from pypdf import PdfReader
-import google.generativeai as genai
-from googleapiclient.http import MediaIoBaseDownload
+from typing import Dict, Any, Optional, List, AsyncIterator, Callable, Tuple
 import json
 
-from connectors.google_drive import get_drive_service
+from connectors.google_drive import get_drive_service, batch_get_files
+from connectors.drive_downloads import DownloadManager, DownloadResult
 from utils.pdf_tools import extract_pdf_metadata
 from utils.text_extraction import extract_text_from_pdf
+from utils.text_cache import cache_text, get_cached_texts
+from utils.chunking import estimate_tokens, split_text, select_within_budget
+from utils.metrics import measure, document_scope
+from utils.provenance import prompt_hash
 from utils.db_operations import (
     save_document_to_db, 
     is_document_in_db, 
-    get_document_from_db,
     get_latest_document_id,
-    get_all_document_ids
+    record_llm_usage
+)
+from utils.dedup import (
+    extract_text_and_signature,
+    minhash_signature,
+    record_fingerprint,
+    unfingerprinted_documents,
+    find_exact_duplicate,
+    find_near_duplicate,
+    link_duplicate,
+    get_duplicate
 )
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Documents estimated above this many tokens are analyzed chunk by chunk
+LONG_DOCUMENT_TOKENS = int(os.getenv('ANALYSIS_LONG_DOCUMENT_TOKENS', '100000'))
+
+# Maximum estimated tokens per chunk in chunked analysis
+ANALYSIS_CHUNK_TOKENS = int(os.getenv('ANALYSIS_CHUNK_TOKENS', '25000'))
+
+# Maximum estimated input tokens spent on the chunks of one document
+ANALYSIS_TOKEN_BUDGET = int(os.getenv('ANALYSIS_TOKEN_BUDGET', '300000'))
+
+# Chunks analyzed concurrently per document, and the output cap per chunk
+ANALYSIS_CHUNK_CONCURRENCY = int(os.getenv('ANALYSIS_CHUNK_CONCURRENCY', '4'))
+ANALYSIS_NOTES_TOKENS = int(os.getenv('ANALYSIS_NOTES_TOKENS', '1024'))
+
+# Gemini calls made while analyzing the current document (one list per task)
+_llm_usage: contextvars.ContextVar = contextvars.ContextVar('llm_usage', default=None)
+
+@contextmanager
+def _llm_usage_scope():
+    """Collect the Gemini calls made inside the block into the yielded list."""
+    usage = []
+    token = _llm_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _llm_usage.reset(token)
+
+ANALYSIS_PROMPT = """Provide a comprehensive yet concise summary of this document with the following structure in Markdown format:
+
+1. Key Findings: 4-5 bullet points on the most significant discoveries or contributions
+2. Technical Innovation: Identify novel methodologies, algorithms, or frameworks introduced
+3. Market Applications: Potential commercial applications and relevant industry sectors
+4. Competitive Landscape: How this research positions against existing solutions mentioned in the document
+5. Technical Limitations: Critical constraints or weaknesses in the approach
+6. Investment Relevance: Alignment with emerging technology trends and investment thesis
+7. Diligence Questions: 3 technical questions to probe with founders claiming to implement this research
+
+{source}:
+{text_content}"""
+
+ANALYSIS_CHUNK_PROMPT = """You are reading part {index} of {count} of a long document. Write concise bullet-point notes on what this part contributes to:
+key findings, technical innovations, market applications, competitive landscape, technical limitations and investment relevance.
+Skip anything else. If this part adds nothing relevant (e.g. references or boilerplate), reply with "No relevant content."
+
+Document part:
+{chunk}"""
+
+SUMMARY_PROMPT = """Distill the core value of this document analysis in 3-4 sentences addressing:
+
+1. The fundamental innovation or insight presented
+2. Its practical market application and potential impact
+3. If applicable, the key differentiator from existing approaches
+4. The most relevant consideration for investment decision-making
+
+Analysis:
+{analysis}"""
+
+AUTHORS_PROMPT = """Extract all author names from this document text. Return only a comma-separated list of full names.
+
+Document text:
+{text_content}"""
+
+AFFILIATIONS_PROMPT = """Extract all institutional affiliations from this document text. Return only a comma-separated list of affiliations.
+
+Document text:
+{text_content}"""
+
+TAGS_PROMPT = """Based on the document analysis, generate 10-20 specific, hyphenated keyword tags that accurately represent the key concepts, technologies, and applications discussed.
+
+Format the tags as a comma-separated list of lowercase, hyphenated terms (e.g., machine-learning, neural-networks).
+
+Analysis:
+{analysis}"""
+
+TITLE_PROMPT = """Extract the formal title of this document. Return ONLY the title as a single string, with no additional text, quotes, or formatting. If you cannot determine a clear title, extract what appears to be the main heading or subject.
+
+Document text:
+{text_content}"""
+
+CLASSIFICATION_PROMPT = """Classify this document into exactly ONE of the following categories based on its content, structure, and style:
+
+- academic-paper: Research papers, scholarly articles, conference proceedings
+- equity-research-report: Financial analysis, stock reports, investment research
+- article: News articles, magazine pieces, journalistic content
+- blog-post: Blog entries, opinion pieces, informal web content
+- book-chapter: Book excerpts, textbook sections, monograph chapters
+- presentation: Slide decks, talks, conference presentations
+- technical-report: White papers, industry reports, technical documentation
+- legal-document: Contracts, patents, legal filings, regulations
+- social-media: Tweets, social media posts, short-form content
+- other: Documents that don't fit other categories
+
+Return ONLY the category name as a single word or hyphenated phrase, with no additional text.
+
+Document text:
+{text_content}"""
+
+# Categories a document can be classified into
+DOCUMENT_TYPES = (
+    'academic-paper', 'equity-research-report', 'article', 'blog-post',
+    'book-chapter', 'presentation', 'technical-report', 'legal-document',
+    'social-media', 'other'
+)
+
+# What each LLM-derived document field is generated from. The hash of these is
+# the field's prompt version (recorded per document by utils.provenance), so
+# editing a prompt here makes that field stale on the documents made with the old one
+FIELD_PROMPTS = {
+    "analysis": (ANALYSIS_PROMPT, ANALYSIS_CHUNK_PROMPT),
+    "summary": (SUMMARY_PROMPT,),
+    "title": (TITLE_PROMPT,),
+    "authors": (AUTHORS_PROMPT,),
+    "affiliations": (AFFILIATIONS_PROMPT,),
+    "tags": (TAGS_PROMPT,),
+    "document_type": (CLASSIFICATION_PROMPT, ",".join(DOCUMENT_TYPES))
+}
+PROMPT_VERSIONS = {field: prompt_hash(*templates) for field, templates in FIELD_PROMPTS.items()}
+
 class DocumentProcessor:
-    def __init__(self, api_key: str):
-        """Initialize the document processor with necessary configurations."""
+    def __init__(self, api_key: str, model_factory: Optional[Callable[[str], Any]] = None):
+        """
+        Initialize the document processor with necessary configurations.
+        
+        Args:
+            api_key: Gemini API key
+            model_factory: Builds a model from its name (default genai.GenerativeModel);
+                benchmarks pass an offline stand-in
+        """
+        self.model_factory = model_factory
         self.configure_ai(api_key)
-        self.drive_service = get_drive_service()
+        self.downloader = DownloadManager()
+        self._reprocessor = None
+
+    @property
+    def drive_service(self):
+        """Drive client for the calling thread (cached process-wide by the connector)."""
+        return get_drive_service()
         
     def configure_ai(self, api_key: str):
         """Configure the Gemini AI model."""
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
+        # Imported here rather than at module level: the SDK takes most of a second to load
+        import google.generativeai as genai
 
-    async def process_file(self, file: Dict[str, Any]) -> Dict[str, Any]:
-        """Process a single file from Google Drive."""
-        temp_path = None
+        genai.configure(api_key=api_key)
+        model_factory = self.model_factory or genai.GenerativeModel
+        self.model = model_factory('gemini-2.0-flash')
+        self.chunk_model = model_factory('gemini-2.0-flash-lite')
+
+    async def _generate(self, call: str, prompt: str, model=None, generation_config=None):
+        """Call Gemini and record the tokens used for the current document."""
+        model = model or self.model
+        async with measure(f"gemini.{call}") as measurement:
+            response = await model.generate_content_async(prompt, generation_config=generation_config)
+            
+            metadata = getattr(response, 'usage_metadata', None)
+            prompt_tokens = getattr(metadata, 'prompt_token_count', None)
+            output_tokens = getattr(metadata, 'candidates_token_count', None)
+            estimated = prompt_tokens is None
+            if estimated:
+                prompt_tokens = estimate_tokens(prompt)
+                output_tokens = estimate_tokens(response.text)
+            measurement.tokens_in = prompt_tokens
+            measurement.tokens_out = output_tokens or 0
+        
+        usage = _llm_usage.get()
+        if usage is not None:
+            usage.append({
+                "call": call,
+                "model": model.model_name,
+                "prompt_tokens": prompt_tokens,
+                "output_tokens": output_tokens or 0,
+                "estimated": estimated
+            })
+        return response
+
+    async def process_file(
+        self,
+        file: Dict[str, Any],
+        reprocess: bool = False,
+        download: Optional[DownloadResult] = None
+    ) -> Dict[str, Any]:
+        """
+        Process a single file from Google Drive, re-analyzing it if reprocess is set.
+        
+        A download prefetched by DownloadManager.download_many can be passed in;
+        otherwise the file is downloaded here. Files whose bytes (md5/SHA-256) or
+        text (MinHash) match an already processed document are linked to it and
+        returned with status "duplicate" instead of being analyzed again.
+        
+        The steps are also available separately (find_duplicate_before_download,
+        prepare_document, analyze_prepared) for the pipelined ingest engine.
+        """
         try:
+            # Drive calls, the download and text extraction block, so they run in
+            # the default executor and other requests and job workers keep going
+            loop = asyncio.get_running_loop()
+            duplicate = await loop.run_in_executor(None, self.find_duplicate_before_download, file, reprocess)
+            if duplicate:
+                if download is not None:
+                    download.cleanup()
+                return duplicate
+
             # Download file regardless of processing status
-            temp_path = f"temp/{file['id']}.pdf"
-            os.makedirs("temp", exist_ok=True)
+            if download is None:
+                download = await loop.run_in_executor(None, self.downloader.download, file, False)
+
+            prepared = await loop.run_in_executor(None, self.prepare_document, file, download, reprocess)
+            if prepared["status"] != "ready":
+                return prepared
+            return await self.analyze_prepared(file, prepared)
             
-            request = self.drive_service.files().get_media(fileId=file['id'])
-            with open(temp_path, 'wb') as f:
-                downloader = MediaIoBaseDownload(f, request)
-                done = False
-                while done is False:
-                    status, done = downloader.next_chunk()
+        except Exception as e:
+            logger.error(f"Error processing {file['name']}: {str(e)}")
+            return {"status": "error", "file": file['name'], "error": str(e)}
+
+    def find_duplicate_before_download(self, file: Dict[str, Any], reprocess: bool = False) -> Optional[Dict[str, Any]]:
+        """Recognize exact duplicates from Drive's checksum alone, so they are never downloaded."""
+        if reprocess or is_document_in_db(file['id']):
+            return None
+        return self._find_exact_duplicate(file)
+
+    def prepare_document(
+        self,
+        file: Dict[str, Any],
+        download: DownloadResult,
+        reprocess: bool = False,
+        extract: Callable[[str], Tuple[str, Optional[List[int]]]] = extract_text_and_signature
+    ) -> Dict[str, Any]:
+        """
+        CPU-bound part of processing: write the download to disk, extract its text
+        and check for duplicates.
+        
+        Args:
+            file: Drive file being processed
+            download: Its download
+            reprocess: Re-analyze a file that is already in the database
+            extract: Returns the text and MinHash signature of a PDF path; the
+                ingest pipeline passes one that runs in a worker process
+        
+        Returns:
+            Dict[str, Any]: Result with status "skipped" (already processed, with temp),
+            "duplicate", "error", or "ready" with temp, text and signature for analyze_prepared
+        """
+        temp_path = None
+        try:
+            if download.error:
+                raise IOError(download.error)
             
+            # Compression works on a local file, so in-memory downloads are written out
+            temp_path = download.save_to(os.path.join(self.downloader.temp_dir, f"{file['id']}.pdf"))
             logger.info(f"Downloaded file to {temp_path}")
 
             # Check if already processed
-            if is_document_in_db(file['id']):
+            if not reprocess and is_document_in_db(file['id']):
                 logger.info(f"File {file['name']} already processed, skipping analysis")
                 return {
                     "status": "skipped",
@@ -59,8 +296,46 @@ class DocumentProcessor:
                     "temp": temp_path
                 }
 
-            # If not processed, continue with analysis
-            analysis_result = await self._analyze_document(temp_path, file)
+            # Catch identical bytes under a different checksum source, then re-exports
+            # and new versions whose text is nearly the same
+            with measure("extract", file['id']) as measurement:
+                text_content, signature = extract(temp_path)
+                measurement.bytes = download.size
+            if not reprocess:
+                duplicate = self._find_exact_duplicate(file, sha256=download.sha256) or self._find_near_duplicate(file, signature)
+                if duplicate:
+                    download.cleanup()
+                    return duplicate
+
+            return {
+                "status": "ready",
+                "file": file['name'],
+                "temp": temp_path,
+                "text": text_content,
+                "signature": signature,
+                "md5": download.md5,
+                "sha256": download.sha256
+            }
+
+        except Exception as e:
+            logger.error(f"Error preparing {file['name']}: {str(e)}")
+            self._remove_temp(temp_path)
+            return {"status": "error", "file": file['name'], "error": str(e)}
+
+    async def analyze_prepared(self, file: Dict[str, Any], prepared: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        LLM-bound part of processing: analyze a document returned by prepare_document.
+        
+        Returns:
+            Dict[str, Any]: Result with status "success" (analysis in "file", temp kept
+            for compression) or "error"
+        """
+        temp_path = prepared["temp"]
+        try:
+            analysis_result = await self._analyze_document(temp_path, file, prepared["text"])
+            record_fingerprint(file['id'], md5=prepared["md5"], sha256=prepared["sha256"], signature=prepared["signature"])
+            # Later field backfills read the text from here instead of downloading again
+            cache_text(file['id'], prepared["text"])
             
             return {
                 "status": "success",
@@ -70,121 +345,180 @@ class DocumentProcessor:
             
         except Exception as e:
             logger.error(f"Error processing {file['name']}: {str(e)}")
-            # Clean up temp file on error
-            if temp_path and os.path.exists(temp_path):
-                try:
-                    os.remove(temp_path)
-                    logger.info(f"Cleaned up temp file after error: {temp_path}")
-                except Exception as cleanup_error:
-                    logger.error(f"Error cleaning up temp file: {str(cleanup_error)}")
+            self._remove_temp(temp_path)
             return {"status": "error", "file": file['name'], "error": str(e)}
 
-    async def _analyze_document(self, pdf_path: str, file: Dict[str, Any]) -> Dict[str, Any]:
+    def _remove_temp(self, temp_path: Optional[str]):
+        """Clean up a temp file after an error."""
+        if temp_path and os.path.exists(temp_path):
+            try:
+                os.remove(temp_path)
+                logger.info(f"Cleaned up temp file after error: {temp_path}")
+            except Exception as cleanup_error:
+                logger.error(f"Error cleaning up temp file: {str(cleanup_error)}")
+
+    def _duplicate_result(self, file: Dict[str, Any], canonical_id: str, match_type: str, similarity: float = 1.0) -> Dict[str, Any]:
+        """Link a file to its canonical document and build the processing result."""
+        link_duplicate(file, canonical_id, match_type, similarity)
+        return {
+            "status": "duplicate",
+            "file": file['name'],
+            "canonical_id": canonical_id,
+            "match_type": match_type,
+            "similarity": similarity
+        }
+
+    def _find_exact_duplicate(self, file: Dict[str, Any], sha256: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Check for an already processed document with the same bytes."""
+        known = get_duplicate(file['id'])
+        if known and known['md5'] and known['md5'] == file.get('md5Checksum'):
+            logger.info(f"File {file['name']} is a known duplicate of {known['canonical_id']}, skipping")
+            return self._duplicate_result(file, known['canonical_id'], known['match_type'], known['similarity'])
+
+        canonical_id = find_exact_duplicate(md5=file.get('md5Checksum'), sha256=sha256, exclude_id=file['id'])
+        if canonical_id:
+            logger.info(f"File {file['name']} has the same content as {canonical_id}, skipping")
+            return self._duplicate_result(file, canonical_id, "sha256" if sha256 else "md5")
+        return None
+
+    def _find_near_duplicate(self, file: Dict[str, Any], signature: Optional[List[int]]) -> Optional[Dict[str, Any]]:
+        """Check for an already processed document with nearly identical text."""
+        match = find_near_duplicate(signature, exclude_id=file['id'])
+        if match:
+            canonical_id, similarity = match
+            logger.info(f"File {file['name']} is a near duplicate of {canonical_id} ({similarity:.2f}), skipping")
+            return self._duplicate_result(file, canonical_id, "minhash", similarity)
+        return None
+
+    async def _analyze_document(self, pdf_path: str, file: Dict[str, Any], text_content: Optional[str] = None) -> Dict[str, Any]:
         """Perform comprehensive document analysis."""
-        # Extract text content
-        text_content = extract_text_from_pdf(pdf_path)
+        with document_scope(file['id']), _llm_usage_scope() as usage:
+            # Extract text content
+            if text_content is None:
+                text_content = extract_text_from_pdf(pdf_path)
+            
+            # Generate analysis, summary, and extract metadata
+            analysis = await self._generate_analysis(text_content)
+            summary = await self._generate_summary(analysis.text)
+            authors = await self._extract_authors(text_content)
+            affiliations = await self._extract_affiliations(text_content)
+            metadata = extract_pdf_metadata(pdf_path)
+            
+            # Extract title using AI prompt
+            extracted_title = await self._extract_title(text_content)
+            title = extracted_title or file['name']  # Fall back to file name if extraction fails
+            
+            # Classify document type, defaulting to 'other' if classification fails
+            classified_type = await self._classify_document(text_content)
+            document_type = classified_type or 'other'
+            
+            # Generate tags
+            tags = await self._generate_tags(analysis.text)
+            
+            result = {
+                "id": file['id'],
+                "title": title,
+                "authors": authors,
+                "name": file['name'],
+                "drive_link": file.get('webViewLink', ''),
+                "created_date": metadata['created_date'],
+                "added_date": file.get('createdTime'),
+                "processed_date": datetime.now().isoformat(),
+                "affiliations": affiliations,
+                "document_type": document_type,
+                "summary": summary.text,
+                "analysis": analysis.text,
+                "tags": tags,
+                # Fallbacks stored for failed prompts aren't recorded, so they count as stale
+                "provenance": self.field_provenance(field for field, value in (
+                    ("analysis", analysis.text),
+                    ("summary", summary.text),
+                    ("title", extracted_title),
+                    ("authors", authors),
+                    ("affiliations", affiliations),
+                    ("tags", tags),
+                    ("document_type", classified_type)
+                ) if value),
+                "token_usage": {
+                    "prompt_tokens": sum(entry["prompt_tokens"] for entry in usage),
+                    "output_tokens": sum(entry["output_tokens"] for entry in usage),
+                    "calls": len(usage)
+                }
+            }
+
+            # Save to database
+            with measure("db_write"):
+                save_document_to_db(result)
+            record_llm_usage(file['id'], usage)
+            return result
+
+    async def _generate_analysis(self, text_content: str):
+        """Generate document analysis using Gemini; long documents are analyzed in chunks first."""
+        if estimate_tokens(text_content) <= LONG_DOCUMENT_TOKENS:
+            return await self._generate("analysis", ANALYSIS_PROMPT.format(source="Document text", text_content=text_content))
         
-        # Generate analysis, summary, and extract metadata
-        analysis = await self._generate_analysis(text_content)
-        summary = await self._generate_summary(analysis.text)
-        authors = await self._extract_authors(text_content)
-        affiliations = await self._extract_affiliations(text_content)
-        metadata = extract_pdf_metadata(pdf_path)
+        # Map: condense chunks into notes; reduce: write the analysis from the notes
+        notes = await self._analyze_chunks(text_content)
+        return await self._generate("analysis-reduce", ANALYSIS_PROMPT.format(
+            source="Notes taken on consecutive parts of a long document, in order",
+            text_content=notes
+        ))
+
+    async def _analyze_chunks(self, text_content: str) -> str:
+        """
+        Condense a long document into notes, one chunk per flash-lite call.
         
-        # Extract title using AI prompt
-        extracted_title = await self._extract_title(text_content)
-        title = extracted_title or file['name']  # Fall back to file name if extraction fails
+        Chunks follow page and section boundaries; when the whole document would
+        exceed ANALYSIS_TOKEN_BUDGET, an even sample of chunks is analyzed instead.
+        """
+        chunks = split_text(text_content, ANALYSIS_CHUNK_TOKENS)
+        selected = select_within_budget(chunks, ANALYSIS_TOKEN_BUDGET)
+        logger.info(f"Analyzing long document in {len(selected)} of {len(chunks)} chunks")
         
-        # Classify document type
-        document_type = await self._classify_document(text_content)
+        semaphore = asyncio.Semaphore(ANALYSIS_CHUNK_CONCURRENCY)
         
-        # Generate tags
-        tags = await self._generate_tags(analysis.text)
+        async def analyze_chunk(index: int):
+            async with semaphore:
+                response = await self._generate(
+                    "analysis-chunk",
+                    ANALYSIS_CHUNK_PROMPT.format(index=index + 1, count=len(chunks), chunk=chunks[index]),
+                    model=self.chunk_model,
+                    generation_config={"max_output_tokens": ANALYSIS_NOTES_TOKENS}
+                )
+                return f"## Part {index + 1} of {len(chunks)}\n{response.text.strip()}"
         
-        result = {
-            "id": file['id'],
-            "title": title,
-            "authors": authors,
-            "name": file['name'],
-            "drive_link": file.get('webViewLink', ''),
-            "created_date": metadata['created_date'],
-            "added_date": file.get('createdTime'),
-            "processed_date": datetime.now().isoformat(),
-            "affiliations": affiliations,
-            "document_type": document_type,
-            "summary": summary.text,
-            "analysis": analysis.text,
-            "tags": tags
-        }
-
-        # Save to database
-        save_document_to_db(result)
-        return result
-
-    async def _generate_analysis(self, text_content: str):
-        """Generate document analysis using Gemini."""
-        prompt = """Provide a comprehensive yet concise summary of this document with the following structure in Markdown format:
-
-1. Key Findings: 4-5 bullet points on the most significant discoveries or contributions
-2. Technical Innovation: Identify novel methodologies, algorithms, or frameworks introduced
-3. Market Applications: Potential commercial applications and relevant industry sectors
-4. Competitive Landscape: How this research positions against existing solutions mentioned in the document
-5. Technical Limitations: Critical constraints or weaknesses in the approach
-6. Investment Relevance: Alignment with emerging technology trends and investment thesis
-7. Diligence Questions: 3 technical questions to probe with founders claiming to implement this research
-
-Document text:
-{text_content}"""
+        notes = await asyncio.gather(
+            *(analyze_chunk(index) for index in selected),
+            return_exceptions=True
+        )
         
-        return self.model.generate_content(prompt.format(text_content=text_content))
+        failed = [note for note in notes if isinstance(note, Exception)]
+        if len(failed) == len(notes):
+            raise RuntimeError(f"Chunked analysis failed: {str(failed[0])}")
+        if failed:
+            logger.warning(f"{len(failed)} of {len(notes)} chunks could not be analyzed")
+        return "\n\n".join(note for note in notes if not isinstance(note, Exception))
 
     async def _generate_summary(self, analysis: str):
         """Generate executive summary from analysis."""
-        prompt = """Distill the core value of this document analysis in 3-4 sentences addressing:
-
-1. The fundamental innovation or insight presented
-2. Its practical market application and potential impact
-3. If applicable, the key differentiator from existing approaches
-4. The most relevant consideration for investment decision-making
-
-Analysis:
-{analysis}"""
-        
-        return self.model.generate_content(prompt.format(analysis=analysis))
+        return await self._generate("summary", SUMMARY_PROMPT.format(analysis=analysis))
 
     async def _extract_authors(self, text_content: str):
         """Extract author names from document."""
-        prompt = """Extract all author names from this document text. Return only a comma-separated list of full names.
-
-Document text:
-{text_content}"""
-        
-        response = self.model.generate_content(prompt.format(text_content=text_content[:2000]))
+        response = await self._generate("authors", AUTHORS_PROMPT.format(text_content=text_content[:2000]))
         author_text = response.text.strip('"\'')
         return [name.strip() for name in author_text.split(',') if name.strip()]
 
     async def _extract_affiliations(self, text_content: str):
         """Extract institutional affiliations from document."""
-        prompt = """Extract all institutional affiliations from this document text. Return only a comma-separated list of affiliations.
-
-Document text:
-{text_content}"""
-        
-        response = self.model.generate_content(prompt.format(text_content=text_content[:2000]))
+        response = await self._generate("affiliations", AFFILIATIONS_PROMPT.format(text_content=text_content[:2000]))
         affiliation_text = response.text.strip('"\'')
         return list(dict.fromkeys([aff.strip() for aff in affiliation_text.split(',') if aff.strip()]))
 
     async def _generate_tags(self, analysis: str):
         """Generate tags from document analysis."""
-        prompt = """Based on the document analysis, generate 10-20 specific, hyphenated keyword tags that accurately represent the key concepts, technologies, and applications discussed.
-
-Format the tags as a comma-separated list of lowercase, hyphenated terms (e.g., machine-learning, neural-networks).
-
-Analysis:
-{analysis}"""
-        
         try:
-            response = self.model.generate_content(prompt.format(analysis=analysis))
+            response = await self._generate("tags", TAGS_PROMPT.format(analysis=analysis))
             tag_text = response.text.strip('"\'')
             return [tag.strip() for tag in tag_text.split(',') if tag.strip()]
         except Exception as e:
@@ -211,79 +545,49 @@ Analysis:
 
     async def _extract_title(self, text_content: str) -> str:
         """Extract document title using Gemini."""
-        prompt = """Extract the formal title of this document. Return ONLY the title as a single string, with no additional text, quotes, or formatting. If you cannot determine a clear title, extract what appears to be the main heading or subject.
-
-Document text:
-{text_content}"""
-        
         try:
             # Only use the first 1000 characters where titles typically appear
-            response = self.model.generate_content(prompt.format(text_content=text_content[:1000]))
+            response = await self._generate("title", TITLE_PROMPT.format(text_content=text_content[:1000]))
             title = self._clean_title(response.text)
             return title
         except Exception as e:
             logger.error(f"Error extracting title: {str(e)}")
             return ""
 
+    def field_provenance(self, fields) -> Dict[str, Dict[str, str]]:
+        """Prompt version and model to record for newly generated values of fields."""
+        generated_at = datetime.now().isoformat()
+        return {
+            field: {"prompt_hash": PROMPT_VERSIONS[field], "model": self.model.model_name, "generated_at": generated_at}
+            for field in fields
+        }
+
+    @property
+    def reprocessor(self):
+        """Engine that re-runs selected prompts on processed documents (retitle and reclassify use it)."""
+        if self._reprocessor is None:
+            from agents.reprocessor import Reprocessor
+            self._reprocessor = Reprocessor(self)
+        return self._reprocessor
+
+    def _retitle_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Shape a reprocessing result as a retitle result."""
+        if result.get("error"):
+            return {"id": result["id"], "error": result["error"]}
+        return {
+            "id": result["id"],
+            "old_title": result["old"]["title"],
+            "new_title": result["new"]["title"],
+            "updated": result["updated"]
+        }
+
     async def retitle_document(self, doc_id: str) -> Dict[str, Any]:
         """Retitle a single document that has already been processed."""
         try:
-            # Get the document from database
-            doc_data = get_document_from_db(doc_id)
-            if not doc_data:
-                return {"status": "error", "message": f"Document {doc_id} not found in database"}
-            
-            # Get the file from Google Drive
-            file = self.drive_service.files().get(fileId=doc_id, fields="id,name,webViewLink").execute()
-            
-            # Download the file
-            temp_path = f"temp/{doc_id}.pdf"
-            os.makedirs("temp", exist_ok=True)
-            
-            request = self.drive_service.files().get_media(fileId=doc_id)
-            with open(temp_path, 'wb') as f:
-                downloader = MediaIoBaseDownload(f, request)
-                done = False
-                while done is False:
-                    status, done = downloader.next_chunk()
-            
-            logger.info(f"Downloaded file to {temp_path} for retitling")
-            
-            # Extract text content
-            text_content = extract_text_from_pdf(temp_path)
-            
-            # Extract new title
-            new_title = await self._extract_title(text_content)
-            old_title = doc_data.get('title', '')
-            
-            # Update the document data
-            if new_title:
-                doc_data['title'] = new_title
-                logger.info(f"Updated title from '{old_title}' to '{new_title}'")
-                
-                # Save updated document to database
-                save_document_to_db(doc_data)
-            else:
-                logger.warning(f"Could not extract new title for {doc_id}, keeping existing title")
-            
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-                logger.info(f"Cleaned up temp file: {temp_path}")
-                
-            return {
-                "id": doc_id,
-                "old_title": old_title,
-                "new_title": new_title if new_title else old_title,
-                "updated": bool(new_title)
-            }
-            
-        except Exception as e:
-            logger.error(f"Error retitling document {doc_id}: {str(e)}")
-            return {
-                "id": doc_id,
-                "error": str(e)
-            }
+            results = [result async for result in self.reprocessor.iter_reprocess(["title"], document_ids=[doc_id])]
+            return self._retitle_result(results[0])
+        except LookupError:
+            return {"status": "error", "message": f"Document {doc_id} not found in database"}
 
     async def retitle_latest_document(self) -> Dict[str, Any]:
         """Retitle the most recent document in the database."""
@@ -306,21 +610,85 @@ Document text:
             logger.error(f"Error retitling latest document: {str(e)}")
             return {"status": "error", "message": str(e)}
 
+    def _download_documents(self, doc_ids: List[str]):
+        """
+        Fetch metadata for documents in batched calls, then download them concurrently.
+        
+        Returns:
+            Tuple of (results for documents missing from Drive, iterator of DownloadResult)
+        """
+        files = batch_get_files(doc_ids, fields=('id', 'name', 'size', 'md5Checksum'), service=self.drive_service)
+        missing = [
+            {"id": doc_id, "error": "File not found in Google Drive"}
+            for doc_id in doc_ids if doc_id not in files
+        ]
+        return missing, self.downloader.download_many(files[doc_id] for doc_id in doc_ids if doc_id in files)
+
+    def backfill_fingerprints(self, batch_size: int = 25) -> Dict[str, Any]:
+        """
+        Fingerprint documents processed before deduplication existed, so new
+        copies of them are linked instead of analyzed again.
+
+        Each document is downloaded again for its content hashes; its text comes
+        from the text cache when present and is extracted (and cached) otherwise.
+        Blocking; run it in an executor from async code.
+
+        Returns:
+            Dict[str, Any]: Status, fingerprinted and total counts, and the errors by document ID
+        """
+        try:
+            doc_ids = unfingerprinted_documents()
+            fingerprinted, errors = 0, {}
+            for start in range(0, len(doc_ids), batch_size):
+                batch = doc_ids[start:start + batch_size]
+                texts = get_cached_texts(batch)
+                missing, downloads = self._download_documents(batch)
+                for result in missing:
+                    errors[result["id"]] = result["error"]
+                for download in downloads:
+                    doc_id = download.file['id']
+                    try:
+                        if download.error:
+                            raise IOError(download.error)
+                        text = texts.get(doc_id)
+                        if text is None:
+                            text = extract_text_from_pdf(download.source())
+                            cache_text(doc_id, text)
+                        if not record_fingerprint(doc_id, md5=download.md5, sha256=download.sha256, signature=minhash_signature(text)):
+                            raise IOError("Could not store the fingerprint")
+                        fingerprinted += 1
+                    except Exception as e:
+                        logger.error(f"Error fingerprinting {doc_id}: {str(e)}")
+                        errors[doc_id] = str(e)
+                    finally:
+                        download.cleanup()
+
+            logger.info(f"Fingerprinted {fingerprinted} of {len(doc_ids)} documents without fingerprints")
+            return {
+                "status": "success",
+                "fingerprinted_count": fingerprinted,
+                "total_count": len(doc_ids),
+                "errors": errors
+            }
+
+        except Exception as e:
+            logger.error(f"Error backfilling fingerprints: {str(e)}")
+            return {"status": "error", "message": str(e)}
+
+    async def iter_retitle_all_documents(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Retitle all documents in the database, yielding each result as soon as it's ready.
+        
+        Raises:
+            LookupError: If there are no documents in the database
+        """
+        async for result in self.reprocessor.iter_reprocess(["title"]):
+            yield self._retitle_result(result)
+
     async def retitle_all_documents(self) -> Dict[str, Any]:
         """Retitle all documents in the database."""
         try:
-            # Get all document IDs
-            doc_ids = get_all_document_ids()
-            
-            if not doc_ids:
-                return {"status": "error", "message": "No documents found in database"}
-            
-            results = []
-            
-            # Process each document
-            for doc_id in doc_ids:
-                result = await self.retitle_document(doc_id)
-                results.append(result)
+            results = [result async for result in self.iter_retitle_all_documents()]
             
             return {
                 "status": "success",
@@ -329,50 +697,28 @@ Document text:
                 "results": results
             }
             
+        except LookupError as e:
+            return {"status": "error", "message": str(e)}
         except Exception as e:
             logger.error(f"Error retitling all documents: {str(e)}")
             return {"status": "error", "message": str(e)}
 
     async def _classify_document(self, text_content: str) -> str:
-        """Classify document into a specific document type category."""
+        """Classify document into a specific document type category ("" if it couldn't be classified)."""
         try:
             if not text_content or not text_content.strip():
                 logger.warning("Empty text content provided for classification")
-                return "other"
+                return ""
                 
             # Use a representative sample of the document for classification
             # We'll use more text than for title extraction but less than full document
             sample_text = text_content[:5000]  # First 5000 chars should be enough for classification
             
-            prompt = """Classify this document into exactly ONE of the following categories based on its content, structure, and style:
-
-- academic-paper: Research papers, scholarly articles, conference proceedings
-- equity-research-report: Financial analysis, stock reports, investment research
-- article: News articles, magazine pieces, journalistic content
-- blog-post: Blog entries, opinion pieces, informal web content
-- book-chapter: Book excerpts, textbook sections, monograph chapters
-- presentation: Slide decks, talks, conference presentations
-- technical-report: White papers, industry reports, technical documentation
-- legal-document: Contracts, patents, legal filings, regulations
-- social-media: Tweets, social media posts, short-form content
-- other: Documents that don't fit other categories
-
-Return ONLY the category name as a single word or hyphenated phrase, with no additional text.
-
-Document text:
-{text_content}"""
-            
-            response = self.model.generate_content(prompt.format(text_content=sample_text))
+            response = await self._generate("classification", CLASSIFICATION_PROMPT.format(text_content=sample_text))
             document_type = response.text.strip().lower()
             
             # Validate the response is one of our expected categories
-            valid_categories = [
-                'academic-paper', 'equity-research-report', 'article', 'blog-post', 
-                'book-chapter', 'presentation', 'technical-report', 'legal-document',
-                'social-media', 'other'
-            ]
-            
-            if document_type not in valid_categories:
+            if document_type not in DOCUMENT_TYPES:
                 logger.warning(f"Unexpected document type: {document_type}, defaulting to 'other'")
                 document_type = 'other'
             
@@ -381,87 +727,44 @@ Document text:
             
         except Exception as e:
             logger.error(f"Error classifying document: {str(e)}")
-            return "other"  # Default to 'other' if classification fails
+            return ""
+
+    def _reclassify_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Shape a reprocessing result as a reclassification result."""
+        if result.get("error"):
+            return {"id": result["id"], "error": result["error"]}
+        return {
+            "id": result["id"],
+            "name": result["name"],
+            "old_type": result["old"]["document_type"],
+            "new_type": result["new"]["document_type"],
+            "updated": result["updated"]
+        }
+
+    async def iter_reclassify_all_documents(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Reclassify all documents in the database, yielding each result as soon as it's ready.
+        
+        Raises:
+            LookupError: If there are no documents in the database
+        """
+        async for result in self.reprocessor.iter_reprocess(["document_type"]):
+            yield self._reclassify_result(result)
 
     async def reclassify_all_documents(self) -> Dict[str, Any]:
         """Reclassify all documents in the database."""
         try:
-            # Get all document IDs
-            doc_ids = get_all_document_ids()
-            
-            if not doc_ids:
-                return {"status": "error", "message": "No documents found in database"}
-            
-            results = []
-            updated_count = 0
-            
-            # Process each document
-            for doc_id in doc_ids:
-                try:
-                    # Get document from database
-                    doc_data = get_document_from_db(doc_id)
-                    if not doc_data:
-                        results.append({
-                            "id": doc_id,
-                            "error": "Document not found in database"
-                        })
-                        continue
-                    
-                    # Get the file from Google Drive
-                    file = self.drive_service.files().get(fileId=doc_id, fields="id,name").execute()
-                    
-                    # Download and process the file
-                    temp_path = f"temp/{doc_id}.pdf"
-                    os.makedirs("temp", exist_ok=True)
-                    
-                    request = self.drive_service.files().get_media(fileId=doc_id)
-                    with open(temp_path, 'wb') as f:
-                        downloader = MediaIoBaseDownload(f, request)
-                        done = False
-                        while done is False:
-                            status, done = downloader.next_chunk()
-                    
-                    # Extract text and classify
-                    text_content = extract_text_from_pdf(temp_path)
-                    old_type = doc_data.get('document_type', 'unknown')
-                    new_type = await self._classify_document(text_content)
-                    
-                    # Update document data
-                    doc_data['document_type'] = new_type
-                    
-                    # Save updated document to database
-                    if old_type != new_type:
-                        save_document_to_db(doc_data)
-                        updated_count += 1
-                    
-                    result = {
-                        "id": doc_id,
-                        "name": doc_data.get('name', file['name']),
-                        "old_type": old_type,
-                        "new_type": new_type,
-                        "updated": old_type != new_type
-                    }
-                    
-                    results.append(result)
-                    
-                    # Clean up temp file
-                    if os.path.exists(temp_path):
-                        os.remove(temp_path)
-                        
-                except Exception as e:
-                    logger.error(f"Error reclassifying document {doc_id}: {str(e)}")
-                    results.append({
-                        "id": doc_id,
-                        "error": str(e)
-                    })
+            results = [result async for result in self.iter_reclassify_all_documents()]
             
             return {
                 "status": "success",
-                "updated_count": updated_count,
+                "updated_count": sum(1 for r in results if r.get('updated', False)),
                 "total_count": len(results),
                 "results": results
             }
             
+        except LookupError as e:
+            return {"status": "error", "message": str(e)}
         except Exception as e:
             logger.error(f"Error reclassifying documents: {str(e)}")
-            return {"status": "error", "message": str(e)} 
\ No newline at end of file
+            return {"status": "error", "message": str(e)}
@@ -0,0 +1,331 @@
+import os
+import asyncio
+import sqlite3
+import logging
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
+
+from agents.document_processor import _llm_usage_scope, PROMPT_VERSIONS
+from utils.text_extraction import extract_text_from_pdf
+from utils.text_cache import cache_text, get_cached_texts
+from utils.metrics import measure, document_scope
+from utils.faceted_search import matching_document_ids
+from utils.provenance import stale_fields_by_document
+from utils.tag_canonicalization import canonicalize_tags, load_tag_aliases
+from utils.db_operations import get_document_from_db, update_document_fields, record_llm_usage
+
+logger = logging.getLogger(__name__)
+
+# Documents reprocessed at once (each runs the prompts for all requested fields concurrently)
+REPROCESS_CONCURRENCY = int(os.getenv('REPROCESS_CONCURRENCY', '4'))
+
+# Documents whose new values are written per transaction
+REPROCESS_BATCH_SIZE = int(os.getenv('REPROCESS_BATCH_SIZE', '25'))
+
+# Field -> what its prompt reads: the document text, or the document's analysis
+# (the new one when analysis is regenerated in the same run)
+FIELDS = {
+    "analysis": "text",
+    "title": "text",
+    "document_type": "text",
+    "authors": "text",
+    "affiliations": "text",
+    "summary": "analysis",
+    "tags": "analysis"
+}
+
+def select_documents(
+    db_path: str = "data/documents.db",
+    document_ids: Optional[List[str]] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    processed_before: Optional[str] = None
+) -> List[str]:
+    """
+    Pick the documents to reprocess; all given conditions must hold.
+
+    Args:
+        db_path: Path to the SQLite database
+        document_ids: Only these documents
+        filters: faceted_search filters (tags, any_tags, authors, affiliations,
+            document_types, date_from, date_to)
+        processed_before: Only documents processed before this ISO date or timestamp
+
+    Returns:
+        List[str]: Document IDs, least recently processed first
+    """
+    if not os.path.exists(db_path):
+        return []
+    conditions, params = [], []
+    if document_ids is not None:
+        if not document_ids:
+            return []
+        conditions.append(f"id IN ({','.join('?' * len(document_ids))})")
+        params.extend(document_ids)
+    if processed_before:
+        conditions.append("processed_date < ?")
+        params.append(processed_before)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        doc_ids = [doc_id for doc_id, in conn.execute(
+            "SELECT id FROM documents" + (" WHERE " + " AND ".join(conditions) if conditions else "") + " ORDER BY processed_date, id",
+            params
+        )]
+    finally:
+        conn.close()
+
+    if filters:
+        matching = set(matching_document_ids(db_path, **filters))
+        doc_ids = [doc_id for doc_id in doc_ids if doc_id in matching]
+    return doc_ids
+
+class Reprocessor:
+    def __init__(
+        self,
+        processor,
+        db_path: str = "data/documents.db",
+        concurrency: int = REPROCESS_CONCURRENCY,
+        batch_size: int = REPROCESS_BATCH_SIZE
+    ):
+        """
+        Re-run some of the analysis prompts on documents that were already processed.
+
+        Only the prompts for the requested fields are called. Fields derived from
+        the document text use the text cached at ingest, so documents are only
+        downloaded again when their text isn't cached; summary and tags are
+        derived from the stored analysis and never need the PDF. The prompt
+        version and model of every regenerated value are recorded with it.
+
+        Args:
+            processor: DocumentProcessor whose prompts and Drive client are used
+            db_path: Path to the SQLite database
+            concurrency: Default number of documents reprocessed at once
+            batch_size: Documents written per transaction
+        """
+        self.processor = processor
+        self.db_path = db_path
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+
+    async def _generate_field(self, field: str, text: Optional[str], analysis: str) -> Any:
+        """Run the prompt for one field."""
+        if field == "analysis":
+            return (await self.processor._generate_analysis(text)).text
+        if field == "title":
+            return await self.processor._extract_title(text)
+        if field == "document_type":
+            return await self.processor._classify_document(text)
+        if field == "authors":
+            return await self.processor._extract_authors(text)
+        if field == "affiliations":
+            return await self.processor._extract_affiliations(text)
+        if field == "summary":
+            return (await self.processor._generate_summary(analysis)).text
+        return await self.processor._generate_tags(analysis)
+
+    def _fetch_texts(self, doc_ids: List[str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """Download and extract documents whose text isn't cached, caching it; returns (texts, errors) by ID."""
+        texts, errors = {}, {}
+        missing, downloads = self.processor._download_documents(doc_ids)
+        for result in missing:
+            errors[result["id"]] = result["error"]
+        for download in downloads:
+            doc_id = download.file['id']
+            try:
+                if download.error:
+                    raise IOError(download.error)
+                with measure("extract", doc_id) as measurement:
+                    texts[doc_id] = extract_text_from_pdf(download.source())
+                    measurement.bytes = download.size
+                cache_text(doc_id, texts[doc_id])
+            except Exception as e:
+                logger.error(f"Error extracting text of {doc_id} for reprocessing: {str(e)}")
+                errors[doc_id] = str(e)
+            finally:
+                download.cleanup()
+        return texts, errors
+
+    async def _load_texts(self, doc_ids: List[str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """Texts of a batch: from the cache, downloading only the rest."""
+        texts = get_cached_texts(doc_ids)
+        uncached = [doc_id for doc_id in doc_ids if doc_id not in texts]
+        errors = {}
+        if uncached:
+            logger.info(f"Downloading {len(uncached)} of {len(doc_ids)} documents whose text isn't cached")
+            fetched, errors = await asyncio.get_running_loop().run_in_executor(None, self._fetch_texts, uncached)
+            texts.update(fetched)
+        return texts, errors
+
+    async def _reprocess_document(
+        self,
+        doc_id: str,
+        fields: List[str],
+        text: Optional[str],
+        error: Optional[str],
+        aliases: Optional[Dict[str, str]] = None
+    ) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """
+        Generate new values for one document.
+
+        New tags are compared in canonical form (aliases from load_tag_aliases),
+        the form they are stored in. Provenance is recorded for every field that
+        got an answer, changed or not, so it no longer counts as stale.
+
+        Returns:
+            Tuple of the result and the update to write (None when there is nothing to write)
+        """
+        try:
+            document = get_document_from_db(doc_id, self.db_path)
+            if not document:
+                return {"id": doc_id, "error": "Document not found in database"}, None
+            if error:
+                raise IOError(error)
+            if text is None and any(FIELDS[field] == "text" for field in fields):
+                raise IOError("Document text is not available")
+            analysis = document.get('analysis') or ''
+            if not analysis and "analysis" not in fields and any(FIELDS[field] == "analysis" for field in fields):
+                raise ValueError("Document has no analysis to derive summary or tags from")
+
+            with document_scope(doc_id), _llm_usage_scope() as usage:
+                # Summary and tags are derived from the analysis, so a new one is generated first
+                values = {}
+                if "analysis" in fields:
+                    values["analysis"] = await self._generate_field("analysis", text, analysis)
+                    analysis = values["analysis"] or analysis
+                rest = [field for field in fields if field != "analysis"]
+                values.update(zip(rest, await asyncio.gather(*(self._generate_field(field, text, analysis) for field in rest))))
+            record_llm_usage(doc_id, usage, self.db_path)
+
+            old, new, update = {}, {}, {"id": doc_id}
+            for field in fields:
+                value = values[field]
+                old[field] = document.get(field)
+                if field == "tags":
+                    value = canonicalize_tags(value, aliases or {})
+                # An empty answer keeps the current value
+                new[field] = value if value else old[field]
+                changed = set(new[field]) != set(old[field] or []) if field == "tags" else new[field] != old[field]
+                if changed:
+                    update[field] = new[field]
+
+            updated_fields = [field for field in fields if field in update]
+            generated = [field for field in fields if values[field]]
+            if generated:
+                update["provenance"] = self.processor.field_provenance(generated)
+            return {
+                "id": doc_id,
+                "name": document.get('name', ''),
+                "fields": fields,
+                "old": old,
+                "new": new,
+                "updated_fields": updated_fields,
+                "updated": bool(updated_fields)
+            }, update if updated_fields or generated else None
+
+        except Exception as e:
+            logger.error(f"Error reprocessing document {doc_id}: {str(e)}")
+            return {"id": doc_id, "error": str(e)}, None
+
+    async def iter_reprocess(
+        self,
+        fields: List[str],
+        document_ids: Optional[List[str]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        processed_before: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        stale_only: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Regenerate fields of the selected documents, yielding each batch of results once it's saved.
+
+        The texts of the next batch are loaded (from the cache, or downloaded)
+        while the current batch is with Gemini.
+
+        Args:
+            fields: Fields to regenerate (see FIELDS)
+            document_ids, filters, processed_before: Document selection (see select_documents)
+            concurrency: Documents reprocessed at once (default REPROCESS_CONCURRENCY)
+            stale_only: Of the selected documents, regenerate only the fields that
+                weren't generated with the current prompt and model (see
+                utils.provenance), skipping documents with none
+
+        Raises:
+            ValueError: If no fields or an unknown field is requested
+            LookupError: If no documents match the selection
+        """
+        unknown = [field for field in fields if field not in FIELDS]
+        if unknown or not fields:
+            raise ValueError(f"Fields must be one or more of {', '.join(FIELDS)}")
+        fields = list(dict.fromkeys(fields))
+
+        doc_ids = select_documents(self.db_path, document_ids, filters, processed_before)
+        if not doc_ids:
+            raise LookupError("No documents found in database")
+        doc_fields = {doc_id: fields for doc_id in doc_ids}
+        if stale_only:
+            stale = stale_fields_by_document(
+                {field: PROMPT_VERSIONS[field] for field in fields},
+                self.processor.model.model_name,
+                self.db_path
+            )
+            doc_fields = {doc_id: stale[doc_id] for doc_id in doc_ids if doc_id in stale}
+            doc_ids = list(doc_fields)
+            if not doc_ids:
+                raise LookupError(f"No documents have stale {', '.join(fields)}")
+        logger.info(f"Reprocessing {', '.join(fields)} for {len(doc_ids)} documents{' (stale fields only)' if stale_only else ''}")
+
+        aliases = load_tag_aliases(self.db_path) if "tags" in fields else None
+        semaphore = asyncio.Semaphore(concurrency or self.concurrency)
+
+        async def reprocess(doc_id: str, text: Optional[str], error: Optional[str]):
+            async with semaphore:
+                return await self._reprocess_document(doc_id, doc_fields[doc_id], text, error, aliases)
+
+        async def load(batch: List[str]):
+            # Only documents with a text-derived field to regenerate need their text
+            needs_text = [doc_id for doc_id in batch if any(FIELDS[field] == "text" for field in doc_fields[doc_id])]
+            return await self._load_texts(needs_text) if needs_text else ({}, {})
+
+        batches = [doc_ids[start:start + self.batch_size] for start in range(0, len(doc_ids), self.batch_size)]
+        pending = asyncio.ensure_future(load(batches[0]))
+        try:
+            for index, batch in enumerate(batches):
+                texts, errors = await pending
+                if index + 1 < len(batches):
+                    pending = asyncio.ensure_future(load(batches[index + 1]))
+
+                outcomes = await asyncio.gather(*(reprocess(doc_id, texts.get(doc_id), errors.get(doc_id)) for doc_id in batch))
+                updates = [update for _, update in outcomes if update]
+                with measure("db_write"):
+                    saved = update_document_fields(updates, self.db_path)
+                for result, update in outcomes:
+                    if update and not saved:
+                        result = {"id": result["id"], "error": "Could not save the new values"}
+                    yield result
+        finally:
+            pending.cancel()
+
+    async def reprocess(
+        self,
+        fields: List[str],
+        document_ids: Optional[List[str]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        processed_before: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        stale_only: bool = False
+    ) -> Dict[str, Any]:
+        """Regenerate fields of the selected documents (see iter_reprocess) and collect the results."""
+        try:
+            results = [result async for result in self.iter_reprocess(fields, document_ids, filters, processed_before, concurrency, stale_only)]
+            return {
+                "status": "success",
+                "fields": list(dict.fromkeys(fields)),
+                "updated_count": sum(1 for r in results if r.get('updated', False)),
+                "error_count": sum(1 for r in results if r.get('error')),
+                "total_count": len(results),
+                "results": results
+            }
+        except (LookupError, ValueError) as e:
+            return {"status": "error", "message": str(e)}
+        except Exception as e:
+            logger.error(f"Error reprocessing documents: {str(e)}")
+            return {"status": "error", "message": str(e)}
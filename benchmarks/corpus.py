@@ -0,0 +1,154 @@
+import os
+import json
+import zlib
+import random
+import logging
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Shapes of synthetic documents: pages, words of body text per page, and
+# images (noise, so they behave like photos under recompression) per page
+PROFILES = {
+    "small": {"pages": 2, "words_per_page": 300, "images_per_page": 0, "image_size": 0},
+    "text_only": {"pages": 20, "words_per_page": 500, "images_per_page": 0, "image_size": 0},
+    "large": {"pages": 150, "words_per_page": 600, "images_per_page": 0, "image_size": 0},
+    "image_heavy": {"pages": 8, "words_per_page": 80, "images_per_page": 2, "image_size": 400}
+}
+
+# Share of each profile in a generated corpus
+DEFAULT_MIX = {"small": 0.4, "text_only": 0.3, "image_heavy": 0.2, "large": 0.1}
+
+_VOCABULARY = (
+    "model training inference latency throughput neural network transformer attention "
+    "dataset benchmark evaluation accuracy robustness retrieval embedding vector index "
+    "sparse dense gradient optimizer convergence distributed cluster accelerator memory "
+    "bandwidth compiler kernel quantization pruning distillation agent planning reward "
+    "policy simulation market revenue adoption enterprise deployment cost efficiency "
+    "protein molecule battery grid semiconductor lithography photonic quantum sensor"
+).split()
+
+_SECTIONS = ["Introduction", "Related Work", "Method", "Results", "Discussion", "Conclusion"]
+
+_AUTHORS = ["Ada Chen", "Rahul Iyer", "Maria Lopez", "Tom Becker", "Yuki Sato", "Nadia Haddad"]
+
+_LINE_WORDS = 12
+_LINES_PER_PAGE = 55
+
+def _escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_VOCABULARY) for _ in range(words))
+
+def _page_lines(rng: random.Random, page: int, pages: int, words: int, title: str) -> List[str]:
+    lines = []
+    if page == 0:
+        lines += [title, ", ".join(rng.sample(_AUTHORS, 3)), "", "Abstract"]
+    # Spread the section headings over the document
+    section = page * len(_SECTIONS) // pages
+    if page == 0 or section != (page - 1) * len(_SECTIONS) // pages:
+        lines += ["", f"{section + 1}. {_SECTIONS[section]}"]
+    while words > 0 and len(lines) < _LINES_PER_PAGE:
+        count = min(_LINE_WORDS, words)
+        lines.append(_sentence(rng, count))
+        words -= count
+    return lines
+
+def build_pdf(rng: random.Random, title: str, pages: int, words_per_page: int, images_per_page: int, image_size: int) -> bytes:
+    """
+    Build a PDF with text pages and optional images, without any PDF library.
+
+    Text is real Helvetica text that pypdf can extract; images are Flate-encoded
+    RGB noise.
+    """
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(b"")
+    kids = []
+    for page in range(pages):
+        resources = b"/Font << /F1 %d 0 R >>" % font
+        drawings = b""
+        if images_per_page:
+            names = []
+            for index in range(images_per_page):
+                data = zlib.compress(rng.randbytes(image_size * image_size * 3), 1)
+                image = add(
+                    b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB "
+                    b"/BitsPerComponent 8 /Filter /FlateDecode /Length %d >>\nstream\n" % (image_size, image_size, len(data))
+                    + data + b"\nendstream"
+                )
+                names.append(b"/Im%d %d 0 R" % (index, image))
+                drawings += b" q 240 0 0 240 %d 80 cm /Im%d Do Q" % (60 + index * 250, index)
+            resources += b" /XObject << " + b" ".join(names) + b" >>"
+
+        lines = _page_lines(rng, page, pages, words_per_page, title)
+        text = b"BT /F1 10 Tf 12 TL 50 760 Td " + b" ".join(
+            b"(%s) Tj T*" % _escape(line).encode('latin-1') for line in lines
+        ) + b" ET"
+        stream = text + drawings
+        contents = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Resources << %s >> /Contents %d 0 R >>"
+            % (pages_id, resources, contents)
+        ))
+
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % kid for kid in kids), len(kids))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+    info = add(b"<< /Title (%s) /CreationDate (D:20240101000000Z) >>" % _escape(title).encode('latin-1'))
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, info, xref)
+    return bytes(output)
+
+def generate_corpus(directory: str, count: int = 20, mix: Optional[Dict[str, float]] = None, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Write a deterministic corpus of synthetic PDFs and a manifest.json describing it.
+
+    Args:
+        directory: Where the PDFs are written
+        count: Number of documents
+        mix: Share of each profile in PROFILES (default DEFAULT_MIX)
+        seed: Random seed; the same seed always produces the same bytes
+
+    Returns:
+        List[Dict[str, Any]]: One entry per document with name, path, profile, pages and size
+    """
+    mix = mix or DEFAULT_MIX
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+
+    # Exact counts per profile rather than sampling, so small corpora keep the mix
+    profiles = []
+    for profile, share in mix.items():
+        profiles += [profile] * round(count * share)
+    profiles = (profiles + list(mix))[:count] if len(profiles) < count else profiles[:count]
+    rng.shuffle(profiles)
+
+    corpus = []
+    for index, profile in enumerate(profiles):
+        shape = PROFILES[profile]
+        title = f"{_sentence(rng, 5).title()} ({profile} {index})"
+        data = build_pdf(rng, title, **shape)
+        name = f"{index:04d}_{profile}.pdf"
+        path = os.path.join(directory, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        corpus.append({"name": name, "path": path, "profile": profile, "pages": shape["pages"], "size": len(data)})
+
+    with open(os.path.join(directory, "manifest.json"), 'w') as f:
+        json.dump({"seed": seed, "documents": corpus}, f, indent=2)
+    logger.info(f"Generated {len(corpus)} synthetic PDFs ({sum(doc['size'] for doc in corpus)} bytes) in {directory}")
+    return corpus
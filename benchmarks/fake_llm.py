@@ -0,0 +1,161 @@
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from types import SimpleNamespace
+from typing import Optional
+
+from google.api_core.exceptions import ResourceExhausted
+
+from utils.chunking import estimate_tokens
+
+TAGS = (
+    "machine-learning large-language-models retrieval-augmented-generation inference-optimization "
+    "distributed-training quantization model-compression computer-vision robotics reinforcement-learning "
+    "semiconductors photonics quantum-computing energy-storage drug-discovery protein-design "
+    "climate-tech cybersecurity edge-computing developer-tools data-infrastructure vector-databases"
+).split()
+
+AUTHORS = ["Ada Chen", "Rahul Iyer", "Maria Lopez", "Tom Becker", "Yuki Sato", "Nadia Haddad"]
+
+AFFILIATIONS = ["Stanford University", "MIT", "ETH Zurich", "Google DeepMind", "Tsinghua University", "Meta AI"]
+
+_ANALYSIS = """## Key Findings
+- {a} improves {b} by a wide margin on standard benchmarks
+- The approach scales to larger {c} workloads
+- Results hold across several datasets
+- Ablations isolate the contribution of {a}
+
+## Technical Innovation
+A new {a} formulation for {b}.
+
+## Market Applications
+Enterprise {c} platforms and infrastructure vendors.
+
+## Competitive Landscape
+Outperforms prior {b} baselines reported in the document.
+
+## Technical Limitations
+Evaluated only at moderate scale.
+
+## Investment Relevance
+Aligned with demand for efficient {c}.
+
+## Diligence Questions
+1. How does {a} behave at production scale?
+2. What data is required to reproduce the results?
+3. Which parts of {b} are proprietary?"""
+
+class _RateLimiter:
+    """Generic cell rate algorithm: requests_per_minute sustained, with bursts of up to burst requests."""
+
+    def __init__(self, requests_per_minute: float, burst: int):
+        self.interval = 60.0 / requests_per_minute
+        self.tolerance = self.interval * (max(1, burst) - 1)
+        self._theoretical_arrival = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, wait: bool) -> float:
+        """Reserve a request slot; returns the seconds to wait (raises if wait is False and the limit is hit)."""
+        with self._lock:
+            now = time.monotonic()
+            arrival = max(self._theoretical_arrival, now)
+            delay = max(0.0, arrival - now - self.tolerance)
+            if delay > 0 and not wait:
+                raise ResourceExhausted("Simulated rate limit exceeded")
+            self._theoretical_arrival = arrival + self.interval
+            return delay
+
+class FakeGenerativeModel:
+    """
+    Offline stand-in for genai.GenerativeModel with deterministic outputs.
+
+    The answer is chosen from the prompt (analysis, notes, summary, authors,
+    affiliations, tags, title or classification) and seeded by its hash, so the
+    same document always gets the same result. Each call takes latency seconds
+    (plus up to jitter of it, also derived from the prompt) and
+    latency_per_1k_tokens per thousand prompt tokens. With requests_per_minute
+    set, calls beyond the limit either wait for a slot or raise
+    ResourceExhausted like the real API, depending on rate_limit_mode.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "fake-gemini",
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        latency_per_1k_tokens: float = 0.0,
+        requests_per_minute: Optional[float] = None,
+        burst: int = 1,
+        rate_limit_mode: str = "wait"
+    ):
+        self.model_name = model_name
+        self.latency = latency
+        self.jitter = jitter
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        self.rate_limit_mode = rate_limit_mode
+        self._limiter = _RateLimiter(requests_per_minute, burst) if requests_per_minute else None
+        self.calls = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+
+    def _delay(self, prompt: str) -> float:
+        """Rate-limit wait plus simulated latency for a prompt."""
+        with self._lock:
+            self.calls += 1
+        delay = 0.0
+        if self._limiter is not None:
+            try:
+                delay = self._limiter.reserve(wait=self.rate_limit_mode == "wait")
+            except ResourceExhausted:
+                with self._lock:
+                    self.rate_limited += 1
+                raise
+        rng = random.Random(hashlib.md5(prompt.encode()).digest())
+        delay += self.latency * (1 + self.jitter * rng.random())
+        delay += self.latency_per_1k_tokens * estimate_tokens(prompt) / 1000
+        return delay
+
+    def _respond(self, prompt: str) -> SimpleNamespace:
+        rng = random.Random(hashlib.sha256(prompt.encode()).digest())
+        document = prompt.split("Document text:\n", 1)[-1]
+
+        if prompt.startswith("Provide a comprehensive"):
+            a, b, c = rng.sample(TAGS, 3)
+            text = _ANALYSIS.format(a=a, b=b, c=c)
+        elif prompt.startswith("You are reading part"):
+            text = "\n".join(f"- {' '.join(rng.sample(TAGS, 2))}" for _ in range(4))
+        elif prompt.startswith("Distill the core value"):
+            text = f"The document presents {rng.choice(TAGS)} with clear applications in {rng.choice(TAGS)}."
+        elif prompt.startswith("Extract all author names"):
+            text = ", ".join(rng.sample(AUTHORS, 3))
+        elif prompt.startswith("Extract all institutional affiliations"):
+            text = ", ".join(rng.sample(AFFILIATIONS, 2))
+        elif prompt.startswith("Extract the formal title"):
+            lines = [line.strip() for line in document.splitlines() if line.strip()]
+            text = lines[0] if lines else "No clear title found"
+        elif prompt.startswith("Classify this document"):
+            text = "academic-paper"
+        elif "tags" in prompt.split("\n", 1)[0]:
+            text = ", ".join(rng.sample(TAGS, 12))
+        else:
+            text = "OK"
+
+        return SimpleNamespace(
+            text=text,
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=estimate_tokens(prompt),
+                candidates_token_count=estimate_tokens(text)
+            )
+        )
+
+    def generate_content(self, prompt: str, generation_config=None) -> SimpleNamespace:
+        """Blocking call, like GenerativeModel.generate_content."""
+        time.sleep(self._delay(prompt))
+        return self._respond(prompt)
+
+    async def generate_content_async(self, prompt: str, generation_config=None) -> SimpleNamespace:
+        """Async call, like GenerativeModel.generate_content_async."""
+        await asyncio.sleep(self._delay(prompt))
+        return self._respond(prompt)
@@ -0,0 +1,109 @@
+"""
+Offline benchmarks: python -m benchmarks.run [options]
+
+Runs against an in-process fake Drive and fake Gemini model on a generated
+PDF corpus, so results are reproducible without network access or API keys.
+Everything is written under --workdir (a temporary directory by default).
+"""
+import os
+import sys
+import json
+import shutil
+import logging
+import argparse
+import tempfile
+from typing import Dict, Any, List
+
+SUITES = ("extraction", "db_writes", "taxonomy", "ingest")
+
+def _parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Offline Cortex benchmarks")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"Comma-separated subset of {', '.join(SUITES)}")
+    parser.add_argument("--workdir", help="Working directory (default: a new temporary directory)")
+    parser.add_argument("--files", type=int, default=20, help="Documents in the synthetic corpus")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the corpus and synthetic data")
+    parser.add_argument("--db-documents", type=int, default=500, help="Documents written by the db_writes suite")
+    parser.add_argument("--taxonomy-documents", type=int, default=2000, help="Tagged documents for the taxonomy suite")
+    parser.add_argument("--drive-latency", type=float, default=0.05, help="Seconds added to every fake Drive request")
+    parser.add_argument("--drive-bandwidth-mbps", type=float, default=50.0, help="Fake Drive media bandwidth in MB/s (0 = unlimited)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per fake Gemini call")
+    parser.add_argument("--llm-jitter", type=float, default=0.5, help="Extra latency per call, as a fraction of --llm-latency")
+    parser.add_argument("--llm-latency-per-1k-tokens", type=float, default=0.01, help="Seconds per thousand prompt tokens")
+    parser.add_argument("--llm-rpm", type=float, default=0, help="Fake Gemini requests per minute per model (0 = unlimited)")
+    parser.add_argument("--llm-burst", type=int, default=10, help="Requests allowed in a burst under --llm-rpm")
+    parser.add_argument("--llm-rate-limit", choices=("wait", "raise"), default="wait", help="Wait for a slot or fail with 429 when limited")
+    parser.add_argument("--compression", choices=("auto", "on", "off"), default="auto", help="Compress during ingest (auto: if gs is installed)")
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the application's log output")
+    return parser.parse_args(argv)
+
+def _print_table(results: List[Dict[str, Any]]):
+    print(f"{'suite':<12} {'items':>7} {'seconds':>9} {'items/s':>9} {'MB/s':>8} {'p50 ms':>10} {'p95 ms':>10}")
+    for result in results:
+        print(
+            f"{result['suite']:<12} {result['items']:>7} {result['elapsed_seconds']:>9.2f} "
+            f"{result['items_per_second']:>9.2f} {result.get('mb_per_second', ''):>8} "
+            f"{result['p50_ms']:>10.1f} {result['p95_ms']:>10.1f}"
+        )
+        for stage, stats in result.get("stages", {}).items():
+            print(f"  {stage:<24} {stats['runs']:>5} runs {stats['p50_ms']:>10.1f} {stats['p95_ms']:>10.1f}")
+
+def main(argv: List[str] = None) -> List[Dict[str, Any]]:
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    suites = [suite.strip() for suite in args.suites.split(",") if suite.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        raise SystemExit(f"Unknown suites: {', '.join(sorted(unknown))}")
+
+    # Application modules use relative data/ and temp/ paths, so run inside the workdir
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="cortex-bench-"))
+    output = os.path.abspath(args.output) if args.output else None
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    os.makedirs("data", exist_ok=True)
+
+    from benchmarks import suites as bench
+    from benchmarks.corpus import generate_corpus
+
+    # Imported modules configure INFO logging; keep the report readable
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    corpus = []
+    if "extraction" in suites or "ingest" in suites:
+        corpus = generate_corpus(os.path.join(workdir, "corpus"), count=args.files, seed=args.seed)
+
+    results = []
+    for suite in suites:
+        if suite == "extraction":
+            results.append(bench.run_extraction(corpus))
+        elif suite == "db_writes":
+            results.append(bench.run_db_writes(args.db_documents, seed=args.seed))
+        elif suite == "taxonomy":
+            results.append(bench.run_taxonomy(args.taxonomy_documents, seed=args.seed))
+        elif suite == "ingest":
+            compression = args.compression == "on" or (args.compression == "auto" and shutil.which("gs") is not None)
+            results.append(bench.run_ingest(
+                os.path.join(workdir, "corpus"),
+                drive_latency=args.drive_latency,
+                drive_bandwidth=args.drive_bandwidth_mbps * 1024 * 1024,
+                llm_options={
+                    "latency": args.llm_latency,
+                    "jitter": args.llm_jitter,
+                    "latency_per_1k_tokens": args.llm_latency_per_1k_tokens,
+                    "requests_per_minute": args.llm_rpm or None,
+                    "burst": args.llm_burst,
+                    "rate_limit_mode": args.llm_rate_limit
+                },
+                compression=compression
+            ))
+
+    _print_table(results)
+    print(f"\nWorking directory: {workdir}")
+    if output:
+        with open(output, "w") as f:
+            json.dump({"arguments": vars(args), "results": results}, f, indent=2, default=str)
+        print(f"Results written to {output}")
+    return results
+
+if __name__ == "__main__":
+    main()
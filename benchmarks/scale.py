@@ -0,0 +1,361 @@
+"""
+Data-scale benchmarks: python -m benchmarks.scale --sizes 10000,100000,1000000
+
+Generates synthetic document sets with Zipfian tag, author and affiliation
+distributions, loads them through the real storage APIs and times
+save_document_to_db, query_documents, export_to_json and the taxonomy
+generator at each size, with peak RSS and on-disk size. Results are written
+as JSON (--output) and can be compared with an earlier run (--baseline).
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import contextlib
+from typing import Dict, Any, List, Iterator, Optional
+
+import numpy as np
+
+DOCUMENT_TYPES = ["academic-paper", "technical-report", "article", "equity-research-report", "presentation", "other"]
+DOCUMENT_TYPE_WEIGHTS = [0.55, 0.15, 0.12, 0.08, 0.05, 0.05]
+
+# Documents per JSON batch when bulk loading
+LOAD_BATCH = 20000
+
+def zipf_weights(count: int, exponent: float) -> np.ndarray:
+    """Probabilities of ranks 1..count under a Zipf distribution with the given exponent."""
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    return weights / weights.sum()
+
+class CorpusModel:
+    """
+    Shape of a synthetic document set.
+
+    Tags, authors and affiliations are drawn from Zipf distributions, so a few
+    are on most documents and the long tail appears once or twice, like real
+    tagging and authorship.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        tag_vocabulary: Optional[int] = None,
+        tag_exponent: float = 1.0,
+        author_exponent: float = 1.1,
+        analysis_words: int = 150,
+        seed: int = 0
+    ):
+        self.size = size
+        # Vocabulary grows sublinearly with the corpus (Heaps' law), capped so the
+        # taxonomy's dense matrices stay within memory
+        self.tag_vocabulary = tag_vocabulary or int(min(5000, max(200, 20 * np.sqrt(size))))
+        self.author_pool = max(100, size // 2)
+        self.affiliation_pool = max(50, min(5000, size // 20))
+        self.tag_weights = zipf_weights(self.tag_vocabulary, tag_exponent)
+        self.author_weights = zipf_weights(self.author_pool, author_exponent)
+        self.affiliation_weights = zipf_weights(self.affiliation_pool, author_exponent)
+        self.analysis_words = analysis_words
+        self.seed = seed
+
+    def documents(self, start: int, count: int, batch: int = 10000) -> Iterator[Dict[str, Any]]:
+        """Yield documents start..start+count-1; the same index always gives the same document."""
+        words = [f"topic-{index}" for index in range(min(self.tag_vocabulary, 1000))]
+        for batch_start in range(start, start + count, batch):
+            batch_size = min(batch, start + count - batch_start)
+            rng = np.random.default_rng([self.seed, batch_start])
+            tag_counts = rng.integers(5, 16, batch_size)
+            tags = rng.choice(self.tag_vocabulary, size=(batch_size, 20), p=self.tag_weights)
+            author_counts = rng.integers(1, 7, batch_size)
+            authors = rng.choice(self.author_pool, size=(batch_size, 6), p=self.author_weights)
+            affiliation_counts = rng.integers(1, 4, batch_size)
+            affiliations = rng.choice(self.affiliation_pool, size=(batch_size, 3), p=self.affiliation_weights)
+            types = rng.choice(len(DOCUMENT_TYPES), size=batch_size, p=DOCUMENT_TYPE_WEIGHTS)
+            text = rng.integers(0, len(words), size=(batch_size, self.analysis_words))
+
+            for offset in range(batch_size):
+                index = batch_start + offset
+                doc_tags = list(dict.fromkeys(f"topic-{tag}" for tag in tags[offset]))[:tag_counts[offset]]
+                analysis = " ".join(words[word] for word in text[offset])
+                yield {
+                    "id": f"scale-{index:08d}",
+                    "name": f"document-{index}.pdf",
+                    "title": f"Synthetic document {index}",
+                    "drive_link": f"https://drive.google.com/file/d/scale-{index:08d}/view",
+                    "created_date": "2024-01-01T00:00:00",
+                    "added_date": "2024-01-01T00:00:00",
+                    "processed_date": "2024-01-01T00:00:00",
+                    "document_type": DOCUMENT_TYPES[types[offset]],
+                    "authors": list(dict.fromkeys(f"Author {author}" for author in authors[offset]))[:author_counts[offset]],
+                    "affiliations": list(dict.fromkeys(f"Institute {aff}" for aff in affiliations[offset]))[:affiliation_counts[offset]],
+                    "tags": doc_tags,
+                    "summary": analysis[:300],
+                    "analysis": analysis
+                }
+
+def _rss_bytes() -> int:
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        # ru_maxrss is the lifetime peak (kB on Linux, bytes on macOS); the best available fallback
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+class PeakRSS:
+    """Samples RSS on a background thread while the block runs and keeps the peak."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.start = 0
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_bytes())
+
+    def __enter__(self) -> "PeakRSS":
+        self.start = self.peak = _rss_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+        return False
+
+def _disk_size(*paths: str) -> int:
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+def _result(size: int, operation: str, seconds: float, items: int, rss: PeakRSS,
+            latencies: Optional[List[float]] = None, disk_bytes: Optional[int] = None, **extra) -> Dict[str, Any]:
+    result = {
+        "size": size,
+        "operation": operation,
+        "seconds": round(seconds, 4),
+        "items": items,
+        "items_per_second": round(items / seconds, 2) if seconds else None,
+        "peak_rss_mb": round(rss.peak / 1024 / 1024, 1),
+        "rss_growth_mb": round((rss.peak - rss.start) / 1024 / 1024, 1)
+    }
+    if latencies:
+        p50, p95 = np.percentile(latencies, [50, 95])
+        result["p50_ms"] = round(p50 * 1000, 3)
+        result["p95_ms"] = round(p95 * 1000, 3)
+    if disk_bytes is not None:
+        result["disk_mb"] = round(disk_bytes / 1024 / 1024, 2)
+    result.update(extra)
+    return result
+
+def _bulk_load(model: CorpusModel, db_path: str, workdir: str):
+    """Load the corpus with convert_json_to_sqlite, one JSON batch at a time."""
+    from utils.data_handling import convert_json_to_sqlite
+
+    batch_path = os.path.join(workdir, "batch.json")
+    for start in range(0, model.size, LOAD_BATCH):
+        batch = {doc["id"]: doc for doc in model.documents(start, min(LOAD_BATCH, model.size - start))}
+        with open(batch_path, "w") as f:
+            json.dump(batch, f)
+        del batch
+        # The first batch creates the schema, later ones go through the update path
+        with contextlib.redirect_stdout(io.StringIO()):
+            convert_json_to_sqlite(batch_path, db_path, update_existing=start > 0)
+    os.remove(batch_path)
+
+def run_size(model: CorpusModel, workdir: str, samples: int, queries: int, export: bool) -> List[Dict[str, Any]]:
+    """Benchmark every operation at one corpus size."""
+    from utils.db_operations import save_document_to_db
+    from utils.data_handling import query_documents, export_to_json
+    from daemons import tag_taxonomy_generator as taxonomy
+
+    size = model.size
+    db_path = os.path.join(workdir, f"documents_{size}.db")
+    for path in (db_path, db_path + "-wal", db_path + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    results = []
+
+    with PeakRSS() as rss:
+        started = time.perf_counter()
+        _bulk_load(model, db_path, workdir)
+        elapsed = time.perf_counter() - started
+    results.append(_result(size, "bulk_load", elapsed, size, rss, disk_bytes=_disk_size(db_path)))
+
+    # Inserts of new documents into a store of this size
+    latencies = []
+    with PeakRSS() as rss:
+        started = time.perf_counter()
+        for document in model.documents(size, samples):
+            item_started = time.perf_counter()
+            save_document_to_db(document, db_path)
+            latencies.append(time.perf_counter() - item_started)
+        elapsed = time.perf_counter() - started
+    results.append(_result(size, "save_document_insert", elapsed, samples, rss, latencies))
+
+    # Re-saves of existing documents (the reprocessing path), spread over the store
+    rng = np.random.default_rng(model.seed)
+    latencies = []
+    with PeakRSS() as rss:
+        started = time.perf_counter()
+        for index in rng.integers(0, size, samples):
+            document = next(model.documents(int(index), 1))
+            item_started = time.perf_counter()
+            save_document_to_db(document, db_path)
+            latencies.append(time.perf_counter() - item_started)
+        elapsed = time.perf_counter() - started
+    results.append(_result(size, "save_document_update", elapsed, samples, rss, latencies, disk_bytes=_disk_size(db_path)))
+
+    # One page of a type filter at random offsets, as a paginating client would
+    latencies = []
+    with PeakRSS() as rss:
+        started = time.perf_counter()
+        for offset in rng.integers(0, max(1, size // 2), queries):
+            item_started = time.perf_counter()
+            query_documents(db_path, filters={"document_type": "academic-paper"}, limit=50, offset=int(offset))
+            latencies.append(time.perf_counter() - item_started)
+        elapsed = time.perf_counter() - started
+    results.append(_result(size, "query_page", elapsed, queries, rss, latencies))
+
+    latencies = []
+    with PeakRSS() as rss:
+        started = time.perf_counter()
+        for index in rng.integers(0, size, queries):
+            item_started = time.perf_counter()
+            query_documents(db_path, filters={"id": f"scale-{index:08d}"}, limit=1)
+            latencies.append(time.perf_counter() - item_started)
+        elapsed = time.perf_counter() - started
+    results.append(_result(size, "query_by_id", elapsed, queries, rss, latencies))
+
+    if export:
+        export_path = os.path.join(workdir, f"export_{size}.json")
+        with PeakRSS() as rss:
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                export_to_json(db_path, export_path, pretty_print=False)
+            elapsed = time.perf_counter() - started
+        results.append(_result(size, "export_to_json", elapsed, size + samples, rss, disk_bytes=_disk_size(export_path)))
+        os.remove(export_path)
+
+    # Taxonomy over the tags of the whole corpus, in the shape processed_files.json has
+    processed_files = {document["id"]: {"tags": document["tags"]} for document in model.documents(0, size)}
+    with PeakRSS() as rss:
+        started = time.perf_counter()
+        tag_frequency = taxonomy.compute_tag_frequency(taxonomy.extract_all_tags(processed_files))
+        unique_tags = taxonomy.get_unique_tags(tag_frequency)
+        matrix = taxonomy.compute_cooccurrence_matrix(processed_files, unique_tags)
+        elapsed = time.perf_counter() - started
+    results.append(_result(size, "compute_cooccurrence_matrix", elapsed, size, rss, unique_tags=len(unique_tags)))
+    del processed_files
+
+    with PeakRSS() as rss:
+        started = time.perf_counter()
+        timestamp = taxonomy.save_results(unique_tags, tag_frequency, matrix)
+        taxonomy.analyze_tag_relationships(tag_frequency, matrix, unique_tags, timestamp)
+        elapsed = time.perf_counter() - started
+    results.append(_result(size, "analyze_tag_relationships", elapsed, len(unique_tags), rss, unique_tags=len(unique_tags)))
+
+    os.remove(db_path)
+    return results
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _compare(results: List[Dict[str, Any]], baseline_path: str):
+    """Print the change in time and peak RSS against an earlier results file."""
+    with open(baseline_path) as f:
+        baseline = {(entry["size"], entry["operation"]): entry for entry in json.load(f)["results"]}
+    print(f"\nChange against {baseline_path}:")
+    for entry in results:
+        before = baseline.get((entry["size"], entry["operation"]))
+        if not before:
+            continue
+        key = "p95_ms" if "p95_ms" in entry and "p95_ms" in before else "seconds"
+        change = (entry[key] / before[key] - 1) * 100 if before[key] else 0.0
+        print(f"{entry['size']:>9} {entry['operation']:<28} {key} {before[key]:>10} -> {entry[key]:>10} ({change:+.1f}%)  "
+              f"peak RSS {before['peak_rss_mb']} -> {entry['peak_rss_mb']} MB")
+
+def main(argv: List[str] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.scale", description="Data-scale benchmarks for the document store and taxonomy")
+    parser.add_argument("--sizes", default="1000,10000", help="Comma-separated corpus sizes, e.g. 10000,100000,1000000")
+    parser.add_argument("--samples", type=int, default=200, help="Single-document saves timed at each size")
+    parser.add_argument("--queries", type=int, default=50, help="Queries timed per query type at each size")
+    parser.add_argument("--tag-vocabulary", type=int, help="Distinct tags (default grows with the corpus, up to 5000)")
+    parser.add_argument("--tag-exponent", type=float, default=1.0, help="Zipf exponent of tag popularity")
+    parser.add_argument("--author-exponent", type=float, default=1.1, help="Zipf exponent of author and affiliation popularity")
+    parser.add_argument("--analysis-words", type=int, default=150, help="Words of analysis text per document")
+    parser.add_argument("--no-export", action="store_true", help="Skip export_to_json (it holds every document in memory)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="Working directory (default: a new temporary directory, removed afterwards)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run to compare against")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="cortex-scale-"))
+    os.makedirs(os.path.join(workdir, "data"), exist_ok=True)
+    # The taxonomy generator writes its outputs to data/ under the working directory
+    os.chdir(workdir)
+
+    import logging
+    from daemons import tag_taxonomy_generator  # configures INFO logging on import
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = []
+    for size in (int(size) for size in args.sizes.split(",") if size.strip()):
+        model = CorpusModel(
+            size,
+            tag_vocabulary=args.tag_vocabulary,
+            tag_exponent=args.tag_exponent,
+            author_exponent=args.author_exponent,
+            analysis_words=args.analysis_words,
+            seed=args.seed
+        )
+        for result in run_size(model, workdir, args.samples, args.queries, not args.no_export):
+            results.append(result)
+            line = f"{result['size']:>9} {result['operation']:<28} {result['seconds']:>10.3f}s  peak RSS {result['peak_rss_mb']:>8} MB"
+            if "p50_ms" in result:
+                line += f"  p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms"
+            if "disk_mb" in result:
+                line += f"  on disk {result['disk_mb']} MB"
+            print(line, flush=True)
+
+    report = {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "parameters": vars(args),
+        "results": results
+    }
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {output}")
+    if baseline:
+        _compare(results, baseline)
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+if __name__ == "__main__":
+    main()
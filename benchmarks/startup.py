@@ -0,0 +1,159 @@
+"""
+Cold start report: python -m benchmarks.startup [options]
+
+Starts fresh interpreters that import the API module (new_test by default) and
+run its lifespan startup, the way a restarted worker would. Reports the wall
+time until the app is ready and, from python -X importtime, which packages the
+import spends its time in. Placeholder values fill in any required environment
+variables that aren't set, and everything runs in a temporary directory, so no
+credentials or network access are needed.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+import time
+from collections import defaultdict
+from typing import Dict, Any, List
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PLACEHOLDER_ENV = {
+    "GEMINI_API_KEY": "startup-report",
+    "WATCH_FOLDER_ID": "startup-report",
+    "COMPRESSED_FOLDER_ID": "startup-report",
+    "GCP_PROJECT_ID": "startup-report",
+    "GCP_PRIVATE_KEY": "startup-report",
+    "GCP_CLIENT_EMAIL": "startup-report"
+}
+
+# Run in the child interpreter: import the module, then enter and leave its lifespan
+_CHILD = """
+import time, json, asyncio, importlib
+started = time.perf_counter()
+module = importlib.import_module({module!r})
+imported = time.perf_counter()
+
+async def start():
+    async with module.lifespan(module.app):
+        return time.perf_counter(), time.time()
+
+ready, ready_at = asyncio.run(start())
+print(json.dumps({{"import_seconds": imported - started, "lifespan_seconds": ready - imported, "ready_at": ready_at}}))
+"""
+
+def _parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description="Cold start report for the API process")
+    parser.add_argument("--module", default="new_test", help="Module defining app and lifespan")
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts to time")
+    parser.add_argument("--top", type=int, default=15, help="Packages and modules to list")
+    parser.add_argument("--mode", choices=("lazy", "eager"), help="STARTUP_MODE for the child processes (default: from the environment)")
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    return parser.parse_args(argv)
+
+def _child_env(mode: str = None) -> Dict[str, str]:
+    env = {**PLACEHOLDER_ENV, **os.environ}
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [PACKAGE_ROOT, env.get("PYTHONPATH")]))
+    if mode:
+        env["STARTUP_MODE"] = mode
+    return env
+
+def parse_importtime(output: str) -> List[Dict[str, Any]]:
+    """
+    Parse python -X importtime output.
+
+    Returns:
+        List[Dict[str, Any]]: One entry per module with its name, depth in the
+            import tree, and self and cumulative time in seconds
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        stripped = name.lstrip()
+        modules.append({
+            "module": stripped.strip(),
+            "depth": (len(name) - len(stripped) - 1) // 2,
+            "self_seconds": int(self_us) / 1e6,
+            "cumulative_seconds": int(cumulative_us) / 1e6
+        })
+    return modules
+
+def import_profile(module: str, env: Dict[str, str], cwd: str, top: int) -> Dict[str, Any]:
+    """Import module once under -X importtime; group self time by top-level package."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, cwd=cwd, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+    modules = parse_importtime(completed.stderr)
+
+    by_package = defaultdict(float)
+    for entry in modules:
+        by_package[entry["module"].split(".")[0]] += entry["self_seconds"]
+    packages = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    slowest = sorted(modules, key=lambda entry: entry["self_seconds"], reverse=True)[:top]
+    total = next((entry["cumulative_seconds"] for entry in modules if entry["module"] == module), 0.0)
+
+    return {
+        "import_seconds": total,
+        "module_count": len(modules),
+        "packages": [{"package": name, "self_seconds": round(seconds, 4)} for name, seconds in packages],
+        "modules": [{key: entry[key] for key in ("module", "self_seconds", "cumulative_seconds")} for entry in slowest]
+    }
+
+def cold_starts(module: str, env: Dict[str, str], cwd: str, runs: int) -> Dict[str, Any]:
+    """Time fresh interpreters from launch until the lifespan startup has finished."""
+    samples = []
+    for _ in range(runs):
+        # Wall clock on both sides, so the child can report when it became ready
+        launched_at = time.time()
+        completed = subprocess.run(
+            [sys.executable, "-c", _CHILD.format(module=module)],
+            env=env, cwd=cwd, capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            raise SystemExit(f"Starting {module} failed:\n{completed.stderr[-2000:]}")
+        sample = json.loads(completed.stdout.strip().splitlines()[-1])
+        sample["process_seconds"] = sample.pop("ready_at") - launched_at
+        samples.append(sample)
+
+    return {
+        key: round(statistics.median(sample[key] for sample in samples), 4)
+        for key in ("process_seconds", "import_seconds", "lifespan_seconds")
+    }
+
+def main(argv: List[str] = None) -> Dict[str, Any]:
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    env = _child_env(args.mode)
+
+    with tempfile.TemporaryDirectory(prefix="cortex-startup-") as workdir:
+        os.makedirs(os.path.join(workdir, "data"), exist_ok=True)
+        profile = import_profile(args.module, env, workdir, args.top)
+        timings = cold_starts(args.module, env, workdir, args.runs)
+
+    print(f"Cold start of {args.module} (median of {args.runs}, mode {env.get('STARTUP_MODE', 'lazy')}):")
+    print(f"  ready after     {timings['process_seconds'] * 1000:>8.1f} ms (interpreter launch to end of lifespan startup)")
+    print(f"  module import   {timings['import_seconds'] * 1000:>8.1f} ms")
+    print(f"  lifespan        {timings['lifespan_seconds'] * 1000:>8.1f} ms")
+    print(f"\nImport time by package ({profile['module_count']} modules, {profile['import_seconds'] * 1000:.1f} ms under -X importtime):")
+    for entry in profile["packages"]:
+        print(f"  {entry['package']:<32} {entry['self_seconds'] * 1000:>8.1f} ms")
+    print("\nSlowest modules (self time):")
+    for entry in profile["modules"]:
+        print(f"  {entry['module']:<48} {entry['self_seconds'] * 1000:>8.1f} ms")
+
+    report = {"module": args.module, "runs": args.runs, "cold_start": timings, "imports": profile}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import os
+import time
+import random
+import shutil
+import sqlite3
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+import connectors.google_drive as gd
+from connectors.fake_drive import FakeDriveService
+from agents.document_processor import DocumentProcessor
+from daemons.ingest_pipeline import IngestPipeline
+from daemons.compression_daemon import CompressionDaemon
+from daemons import tag_taxonomy_generator as taxonomy
+from utils.text_extraction import extract_text_from_pdf
+from utils.db_operations import save_document_to_db
+from utils.metrics import MetricsRecorder, set_metrics_recorder
+from benchmarks.fake_llm import FakeGenerativeModel, TAGS, AUTHORS, AFFILIATIONS
+
+logger = logging.getLogger(__name__)
+
+# Folder IDs used inside the fake Drive
+FOLDER_ID = "benchmark-folder"
+COMPRESSED_FOLDER_ID = "benchmark-compressed"
+
+def summarize(suite: str, latencies: List[float], elapsed: float, size: int = 0, **extra) -> Dict[str, Any]:
+    """Throughput and latency percentiles of a suite; latencies are per item, in seconds."""
+    p50, p95 = np.percentile(latencies, [50, 95]) if latencies else (0.0, 0.0)
+    result = {
+        "suite": suite,
+        "items": len(latencies),
+        "elapsed_seconds": round(elapsed, 3),
+        "items_per_second": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(p50 * 1000, 2),
+        "p95_ms": round(p95 * 1000, 2)
+    }
+    if size:
+        result["mb_per_second"] = round(size / elapsed / 1024 / 1024, 2) if elapsed else 0.0
+    result.update(extra)
+    return result
+
+def run_extraction(corpus: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Time extract_text_from_pdf on every corpus document."""
+    latencies = []
+    started = time.perf_counter()
+    for document in corpus:
+        item_started = time.perf_counter()
+        extract_text_from_pdf(document["path"])
+        latencies.append(time.perf_counter() - item_started)
+    elapsed = time.perf_counter() - started
+
+    by_profile = defaultdict(list)
+    for document, latency in zip(corpus, latencies):
+        by_profile[document["profile"]].append(latency)
+    profiles = {
+        profile: {"items": len(values), "p50_ms": round(float(np.percentile(values, 50)) * 1000, 2)}
+        for profile, values in sorted(by_profile.items())
+    }
+    return summarize("extraction", latencies, elapsed, size=sum(document["size"] for document in corpus), profiles=profiles)
+
+def _synthetic_document(rng: random.Random, index: int) -> Dict[str, Any]:
+    return {
+        "id": f"benchmark-{index:06d}",
+        "title": f"Synthetic document {index}",
+        "name": f"{index:06d}.pdf",
+        "drive_link": "",
+        "created_date": "2024-01-01T00:00:00",
+        "added_date": "2024-01-01T00:00:00",
+        "processed_date": "2024-01-01T00:00:00",
+        "authors": rng.sample(AUTHORS, 3),
+        "affiliations": rng.sample(AFFILIATIONS, 2),
+        "document_type": "academic-paper",
+        "summary": " ".join(rng.choices(TAGS, k=60)),
+        "analysis": " ".join(rng.choices(TAGS, k=600)),
+        "tags": rng.sample(TAGS, 12)
+    }
+
+def run_db_writes(count: int, seed: int = 0, db_path: str = "data/benchmark_documents.db") -> Dict[str, Any]:
+    """Time save_document_to_db for count synthetic documents in a fresh database."""
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    rng = random.Random(seed)
+    documents = [_synthetic_document(rng, index) for index in range(count)]
+
+    # The first save creates the schema; it isn't a representative write
+    save_document_to_db(documents[0], db_path)
+
+    latencies = []
+    started = time.perf_counter()
+    for document in documents[1:]:
+        item_started = time.perf_counter()
+        save_document_to_db(document, db_path)
+        latencies.append(time.perf_counter() - item_started)
+    return summarize("db_writes", latencies, time.perf_counter() - started)
+
+def run_taxonomy(documents: int, tags_per_document: int = 12, vocabulary: int = 500, repeats: int = 5, seed: int = 0) -> Dict[str, Any]:
+    """Time the tag taxonomy generator's phases on synthetic tagged documents."""
+    rng = random.Random(seed)
+    tags = [f"tag-{index}" for index in range(vocabulary)]
+    processed_files = {
+        f"benchmark-{index:06d}": {"tags": rng.sample(tags, min(tags_per_document, vocabulary))}
+        for index in range(documents)
+    }
+
+    phases = defaultdict(list)
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeats):
+        run_started = time.perf_counter()
+        all_tags = taxonomy.extract_all_tags(processed_files)
+        tag_frequency = taxonomy.compute_tag_frequency(all_tags)
+        unique_tags = taxonomy.get_unique_tags(tag_frequency)
+        phases["frequency"].append(time.perf_counter() - run_started)
+
+        phase_started = time.perf_counter()
+        matrix = taxonomy.compute_cooccurrence_matrix(processed_files, unique_tags)
+        phases["cooccurrence"].append(time.perf_counter() - phase_started)
+
+        phase_started = time.perf_counter()
+        timestamp = taxonomy.save_results(unique_tags, tag_frequency, matrix)
+        taxonomy.analyze_tag_relationships(tag_frequency, matrix, unique_tags, timestamp)
+        phases["relationships"].append(time.perf_counter() - phase_started)
+        latencies.append(time.perf_counter() - run_started)
+    elapsed = time.perf_counter() - started
+
+    return summarize(
+        "taxonomy", latencies, elapsed,
+        documents=documents,
+        unique_tags=len(unique_tags),
+        phases_p50_ms={name: round(float(np.percentile(values, 50)) * 1000, 2) for name, values in phases.items()}
+    )
+
+class _NoCompression:
+    """Compression daemon stand-in for machines without Ghostscript: nothing needs compressing."""
+
+    def needs_compression(self, file: Dict[str, Any]) -> bool:
+        return False
+
+def _stage_latencies(db_path: str) -> Dict[str, Any]:
+    """Per-stage p50/p95 and per-document service time from the metrics recorded during a run."""
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT stage, document_id, wall_seconds FROM stage_metrics").fetchall()
+    conn.close()
+
+    by_stage = defaultdict(list)
+    by_document = defaultdict(float)
+    for stage, document_id, wall_seconds in rows:
+        by_stage[stage].append(wall_seconds)
+        if document_id:
+            by_document[document_id] += wall_seconds
+
+    stages = {}
+    for stage, values in sorted(by_stage.items()):
+        p50, p95 = np.percentile(values, [50, 95])
+        stages[stage] = {"runs": len(values), "p50_ms": round(p50 * 1000, 2), "p95_ms": round(p95 * 1000, 2)}
+    return {"stages": stages, "document_seconds": list(by_document.values())}
+
+def run_ingest(
+    corpus_dir: str,
+    drive_latency: float = 0.0,
+    drive_bandwidth: float = 0.0,
+    llm_options: Optional[Dict[str, Any]] = None,
+    compression: bool = False
+) -> Dict[str, Any]:
+    """
+    Ingest the corpus end to end through IngestPipeline against the fake Drive and LLM.
+
+    Per-document latency is the summed stage time recorded for the document
+    (its service time); throughput is documents per second of wall time.
+    """
+    for path in ("data/documents.db", "data/benchmark_metrics.db"):
+        if os.path.exists(path):
+            os.remove(path)
+    shutil.rmtree("temp", ignore_errors=True)
+    os.makedirs("temp", exist_ok=True)
+
+    drive = FakeDriveService(latency=drive_latency, bandwidth=drive_bandwidth)
+    files = drive.add_directory(corpus_dir, parents=[FOLDER_ID])
+    gd.set_drive_service_factory(lambda: drive)
+    recorder = MetricsRecorder(db_path="data/benchmark_metrics.db")
+    set_metrics_recorder(recorder)
+
+    models = []
+
+    def model_factory(name: str) -> FakeGenerativeModel:
+        model = FakeGenerativeModel(name, **(llm_options or {}))
+        models.append(model)
+        return model
+
+    processor = DocumentProcessor("offline", model_factory=model_factory)
+    if compression:
+        compression_daemon = CompressionDaemon(compressed_folder_id=COMPRESSED_FOLDER_ID)
+    else:
+        compression_daemon = _NoCompression()
+    pipeline = IngestPipeline(processor, compression_daemon)
+
+    async def ingest() -> List[Dict[str, Any]]:
+        listing = gd.list_folder_files(FOLDER_ID, fields=gd.PROCESSING_FILE_FIELDS)
+        return [result async for result in pipeline.run(listing)]
+
+    started = time.perf_counter()
+    results = asyncio.run(ingest())
+    elapsed = time.perf_counter() - started
+
+    if compression:
+        compression_daemon.scheduler.shutdown()
+        compression_daemon.uploader.shutdown()
+
+    recorder.flush()
+    recorded = _stage_latencies("data/benchmark_metrics.db")
+    return summarize(
+        "ingest", recorded["document_seconds"], elapsed,
+        size=sum(int(file['size']) for file in files),
+        documents=len(files),
+        failed=sum(1 for result in results if result.get("status") == "error"),
+        llm_calls=sum(model.calls for model in models),
+        llm_rate_limited=sum(model.rate_limited for model in models),
+        drive_requests=drive.request_count,
+        pipeline=pipeline.last_stats,
+        stages=recorded["stages"]
+    )
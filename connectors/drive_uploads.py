@@ -0,0 +1,376 @@
+import os
+import re
+import json
+import time
+import uuid
+import random
+import socket
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from functools import lru_cache
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from connectors.google_drive import get_drive_service
+from utils.metrics import measure
+
+logger = logging.getLogger(__name__)
+
+# Bytes sent per resumable-upload request (must be a multiple of 256KB)
+UPLOAD_CHUNK_SIZE = int(os.getenv('DRIVE_UPLOAD_CHUNK_MB', '8')) * 1024 * 1024
+
+# Number of files uploaded concurrently
+UPLOAD_WORKERS = int(os.getenv('DRIVE_UPLOAD_WORKERS', '2'))
+
+# Attempts after the first one before an upload is left pending
+UPLOAD_RETRIES = int(os.getenv('DRIVE_UPLOAD_RETRIES', '5'))
+
+# HTTP statuses worth retrying; 404/410 mean the resumable session expired
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+EXPIRED_SESSION_STATUSES = {404, 410}
+
+# Upload states stored in the uploads table
+PENDING = "pending"
+UPLOADED = "uploaded"
+FAILED = "failed"
+
+@lru_cache(maxsize=1)
+def _http_errors() -> Tuple[type, type]:
+    """googleapiclient's HttpError and httplib2's transport error, imported on first use so importing this module stays cheap."""
+    from googleapiclient.errors import HttpError
+    from httplib2 import HttpLib2Error
+    return HttpError, HttpLib2Error
+
+def _is_retryable(error: Exception) -> bool:
+    """Transient network and server errors that a retry may fix."""
+    HttpError, HttpLib2Error = _http_errors()
+    if isinstance(error, HttpError):
+        if error.resp.status in RETRYABLE_STATUSES:
+            return True
+        # Drive reports per-user rate limits as 403
+        return error.resp.status == 403 and b'rateLimitExceeded' in (error.content or b'')
+    return isinstance(error, (ConnectionError, TimeoutError, socket.error, HttpLib2Error))
+
+class UploadStore:
+    """SQLite record of uploads and their resumable sessions, kept across restarts."""
+
+    def __init__(self, db_path: str = "data/uploads.db"):
+        """Open (and create if needed) the uploads database."""
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS uploads (
+                upload_id TEXT PRIMARY KEY,
+                local_path TEXT,
+                metadata TEXT,
+                context TEXT,
+                status TEXT,
+                resumable_uri TEXT,
+                progress INTEGER,
+                drive_id TEXT,
+                attempts INTEGER,
+                error TEXT,
+                created_at TEXT,
+                updated_at TEXT
+            )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_uploads_status ON uploads (status)')
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_uploads_source_id ON uploads (json_extract(context, '$.source_id'))")
+            self._conn.commit()
+
+    def add(self, local_path: str, metadata: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> str:
+        """Record a new upload and return its ID."""
+        upload_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute('''
+            INSERT INTO uploads (
+                upload_id, local_path, metadata, context, status, resumable_uri,
+                progress, drive_id, attempts, error, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, NULL, 0, NULL, 0, NULL, ?, ?)
+            ''', (upload_id, local_path, json.dumps(metadata), json.dumps(context or {}), PENDING, now, now))
+            self._conn.commit()
+        return upload_id
+
+    def update(self, upload_id: str, **fields):
+        """Update columns of an upload row."""
+        fields["updated_at"] = datetime.now().isoformat()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE uploads SET {assignments} WHERE upload_id = ?",
+                (*fields.values(), upload_id)
+            )
+            self._conn.commit()
+
+    def get(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch an upload row with metadata and context decoded."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM uploads WHERE upload_id = ?", (upload_id,)).fetchone()
+        return self._decode(row) if row else None
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """Uploads that haven't been confirmed by Drive yet, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM uploads WHERE status = ? ORDER BY created_at",
+                (PENDING,)
+            ).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def pending_for_source(self, source_id: str) -> List[Dict[str, Any]]:
+        """Unconfirmed uploads whose context names this source file."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM uploads WHERE status = ? AND json_extract(context, '$.source_id') = ? ORDER BY created_at",
+                (PENDING, source_id)
+            ).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def _decode(self, row: sqlite3.Row) -> Dict[str, Any]:
+        upload = dict(row)
+        upload["metadata"] = json.loads(upload["metadata"] or '{}')
+        upload["context"] = json.loads(upload["context"] or '{}')
+        return upload
+
+class UploadManager:
+    """
+    Uploads local files to Drive on a bounded worker pool with resumable sessions.
+
+    Each upload is recorded in SQLite before the first byte is sent, and its
+    resumable session URI and progress are saved after every chunk. Transient
+    errors are retried with exponential backoff from the last confirmed byte;
+    uploads still unfinished after the retries (or when the process exits) stay
+    pending and are picked up again by resume_pending(). Local files are never
+    deleted here, so callers remove them only after an upload is confirmed.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = UPLOAD_CHUNK_SIZE,
+        max_workers: int = UPLOAD_WORKERS,
+        retries: int = UPLOAD_RETRIES,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        db_path: str = "data/uploads.db"
+    ):
+        """Initialize the upload manager with configuration."""
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.store = UploadStore(db_path)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="drive-upload")
+        self._active: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        local_path: str,
+        metadata: Dict[str, Any],
+        context: Optional[Dict[str, Any]] = None,
+        mimetype: str = 'application/pdf',
+        callback: Optional[Callable[[Future], None]] = None
+    ) -> Future:
+        """
+        Queue a file for upload.
+
+        Args:
+            local_path: File to upload; it must stay in place until the upload is confirmed
+            metadata: Drive file metadata (name, parents, appProperties, ...)
+            context: JSON-serializable data returned with the result, also after a restart
+            mimetype: MIME type of the upload
+            callback: Called with the future once the upload has finished or failed
+
+        Returns:
+            Future resolving to a dict whose "status" is "uploaded" (with drive_id) or
+            "failed" (with error); both carry upload_id, local_path and context
+        """
+        metadata = {**metadata, 'mimeType': mimetype} if 'mimeType' not in metadata else metadata
+        upload_id = self.store.add(local_path, metadata, context)
+        return self._schedule(self.store.get(upload_id), callback)
+
+    def resume_pending(self, callback: Optional[Callable[[Future], None]] = None) -> List[Future]:
+        """
+        Restart every upload left pending by an earlier run or failed retries.
+
+        Returns:
+            List of futures, one per resumed upload
+        """
+        futures = []
+        for upload in self.store.pending():
+            with self._lock:
+                if upload["upload_id"] in self._active:
+                    continue
+            futures.append(self._schedule(upload, callback))
+        if futures:
+            logger.info(f"Resuming {len(futures)} pending uploads")
+        return futures
+
+    def pending_for_source(self, source_id: str) -> List[Dict[str, Any]]:
+        """Uploads for a source file (context["source_id"]) that Drive hasn't confirmed yet."""
+        return self.store.pending_for_source(source_id)
+
+    def abandon(self, upload_id: str, reason: str) -> bool:
+        """
+        Mark a pending upload as failed so it is no longer resumed.
+
+        Returns:
+            bool: False if the upload is running right now and was left alone
+        """
+        with self._lock:
+            if upload_id in self._active:
+                return False
+            self.store.update(upload_id, status=FAILED, error=reason)
+        logger.info(f"Abandoned upload {upload_id}: {reason}")
+        return True
+
+    def _schedule(self, upload: Dict[str, Any], callback: Optional[Callable[[Future], None]]) -> Future:
+        future = self._executor.submit(self._measured_run, upload)
+        with self._lock:
+            self._active[upload["upload_id"]] = future
+        future.add_done_callback(lambda f: self._forget(upload["upload_id"]))
+        if callback is not None:
+            future.add_done_callback(callback)
+        return future
+
+    def _forget(self, upload_id: str):
+        with self._lock:
+            self._active.pop(upload_id, None)
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _create_request(self, upload: Dict[str, Any]):
+        """Build the resumable create request (reattach a saved session with _resume_session)."""
+        from googleapiclient.http import MediaFileUpload
+
+        media = MediaFileUpload(
+            upload["local_path"],
+            mimetype=upload["metadata"].get('mimeType', 'application/pdf'),
+            chunksize=self.chunk_size,
+            resumable=True
+        )
+        return get_drive_service().files().create(
+            body=upload["metadata"],
+            media_body=media,
+            fields='id'
+        )
+
+    def _resume_session(self, request, upload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Point a new request at a saved resumable session, starting from the bytes Drive already has.
+
+        Sends the protocol's status query (an empty PUT with "Content-Range: bytes */size").
+
+        Returns:
+            The created file if the session had already completed, else None
+        """
+        size = os.path.getsize(upload["local_path"])
+        response, content = request.http.request(
+            upload["resumable_uri"],
+            "PUT",
+            headers={"Content-Range": f"bytes */{size}", "content-length": "0"}
+        )
+        if response.status in (200, 201):
+            return json.loads(content)
+        if response.status != 308:
+            HttpError, _ = _http_errors()
+            raise HttpError(response, content, uri=upload["resumable_uri"])
+
+        # 308 Resume Incomplete; Range is absent when nothing was stored yet
+        received = re.match(r'bytes=0-(\d+)', response.get('range', ''))
+        request.resumable_uri = upload["resumable_uri"]
+        request.resumable_progress = int(received.group(1)) + 1 if received else 0
+        return None
+
+    def _measured_run(self, upload: Dict[str, Any]) -> Dict[str, Any]:
+        """Run an upload, recording its time and size under the source document."""
+        source_id = (upload.get("context") or {}).get("source_id")
+        with measure("upload", source_id) as measurement:
+            result = self._run(upload)
+            if result["status"] == "uploaded":
+                measurement.bytes = os.path.getsize(upload["local_path"])
+            else:
+                measurement.failed = True
+        return result
+
+    def _run(self, upload: Dict[str, Any]) -> Dict[str, Any]:
+        """Upload one file to completion, retrying transient errors."""
+        upload_id = upload["upload_id"]
+        name = upload["metadata"].get('name', upload["local_path"])
+        result = {"upload_id": upload_id, "local_path": upload["local_path"], "context": upload["context"]}
+
+        if not os.path.exists(upload["local_path"]):
+            error = f"Local file not found: {upload['local_path']}"
+            logger.error(f"Cannot upload {name}: {error}")
+            self.store.update(upload_id, status=FAILED, error=error)
+            return {**result, "status": "failed", "error": error}
+
+        attempts = upload.get("attempts") or 0
+        request = None
+        for attempt in range(self.retries + 1):
+            attempts += 1
+            try:
+                response = None
+                if request is None:
+                    request = self._create_request(upload)
+                    if upload.get("resumable_uri"):
+                        response = self._resume_session(request, upload)
+                while response is None:
+                    status, response = request.next_chunk()
+                    if status is not None:
+                        upload["resumable_uri"] = request.resumable_uri
+                        self.store.update(
+                            upload_id,
+                            resumable_uri=request.resumable_uri,
+                            progress=status.resumable_progress,
+                            attempts=attempts
+                        )
+
+                drive_id = response.get('id')
+                self.store.update(upload_id, status=UPLOADED, drive_id=drive_id, attempts=attempts, error=None)
+                logger.info(f"Uploaded {name} to Drive with ID: {drive_id}")
+                return {**result, "status": "uploaded", "drive_id": drive_id}
+
+            except Exception as e:
+                HttpError, _ = _http_errors()
+                if request is not None and request.resumable_uri != upload.get("resumable_uri"):
+                    # A session opened before the failure is still worth resuming
+                    upload["resumable_uri"] = request.resumable_uri
+                    self.store.update(upload_id, resumable_uri=request.resumable_uri)
+                if isinstance(e, HttpError) and e.resp.status in EXPIRED_SESSION_STATUSES:
+                    # The session is gone; start a new one from the first byte
+                    logger.warning(f"Upload session for {name} expired, restarting")
+                    upload["resumable_uri"] = None
+                    self.store.update(upload_id, resumable_uri=None, progress=0, attempts=attempts)
+                    request = None
+                elif _is_retryable(e):
+                    # Keep the request: after an error next_chunk() re-syncs progress with the server
+                    self.store.update(upload_id, attempts=attempts, error=str(e))
+                else:
+                    logger.error(f"Upload of {name} failed: {str(e)}")
+                    self.store.update(upload_id, status=FAILED, attempts=attempts, error=str(e))
+                    return {**result, "status": "failed", "error": str(e)}
+
+                if attempt < self.retries:
+                    delay = self._backoff(attempt)
+                    logger.warning(f"Upload of {name} interrupted ({str(e)}), retrying in {delay:.1f}s")
+                    time.sleep(delay)
+
+        # Leave it pending with its session so a later resume_pending() continues it
+        error = f"Upload did not complete after {self.retries + 1} attempts"
+        logger.error(f"{error}: {name}")
+        return {**result, "status": "failed", "error": error, "pending": True}
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker pool; unfinished uploads remain pending in the store."""
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,442 @@
+import os
+import re
+import json
+import glob
+import time
+import uuid
+import hashlib
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Iterable
+
+def _now() -> str:
+    """Current time in Drive's RFC 3339 format."""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+def _project(record: Dict[str, Any], fields: Optional[str]) -> Dict[str, Any]:
+    """Apply a Drive-style field projection such as 'id,name' or 'files(id, name)'."""
+    if not fields:
+        return dict(record)
+    match = re.search(r'\(([^()]*)\)', fields)
+    names = match.group(1) if match else fields
+    wanted = [name.strip() for name in names.split(',') if name.strip()]
+    return {name: record[name] for name in wanted if name in record}
+
+class _FakeRequest:
+    """Request object exposing the execute() method of googleapiclient requests."""
+
+    def __init__(self, handler, drive=None):
+        self._handler = handler
+        self._drive = drive
+
+    def execute(self, num_retries: int = 0):
+        if self._drive is not None:
+            self._drive.simulate_network()
+        return self._handler()
+
+class _FakeBatch:
+    """BatchHttpRequest look-alike that runs its sub-requests in order."""
+
+    def __init__(self, drive, callback=None):
+        self._drive = drive
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        request_id = request_id or str(len(self._requests))
+        self._requests.append((request_id, request, callback or self._callback))
+
+    def execute(self):
+        self._drive.batch_count += 1
+        # One round trip for the whole batch
+        self._drive.simulate_network()
+        for request_id, request, callback in self._requests:
+            try:
+                response, exception = request._handler(), None
+            except Exception as e:
+                response, exception = None, e
+            if callback is not None:
+                callback(request_id, response, exception)
+
+class FakeDriveService:
+    """
+    In-process stand-in for the Drive v3 service, for local runs and experiments.
+
+    Install it with connectors.google_drive.set_drive_service_factory(lambda: fake).
+    Every mutation is appended to a change log, and every changes-feed token handed
+    out or consumed is recorded in issued_tokens / requested_tokens. latency and
+    bandwidth simulate the network: every request sleeps for latency seconds, and
+    media transfers additionally for their size divided by bandwidth (bytes/s).
+    """
+
+    def __init__(self, latency: float = 0.0, bandwidth: float = 0.0):
+        self._lock = threading.RLock()
+        self._files: Dict[str, Dict[str, Any]] = {}
+        self._content: Dict[str, bytes] = {}
+        self.change_log: List[Dict[str, Any]] = []
+        self.issued_tokens: List[str] = []
+        self.requested_tokens: List[str] = []
+        self.request_count = 0
+        self.batch_count = 0
+        # Resumable upload sessions by URI, and the number of upcoming chunk
+        # requests that should fail with a connection error
+        self.upload_sessions: Dict[str, Dict[str, Any]] = {}
+        self.fail_upload_chunks = 0
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+    # Fixture helpers
+
+    def add_file(
+        self,
+        name: str,
+        content: bytes = b'%PDF-1.4\n%%EOF\n',
+        parents: Iterable[str] = (),
+        mime_type: str = 'application/pdf',
+        file_id: Optional[str] = None,
+        app_properties: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """Add a file and record an 'added' change."""
+        with self._lock:
+            file_id = file_id or uuid.uuid4().hex
+            timestamp = _now()
+            record = {
+                'id': file_id,
+                'name': name,
+                'mimeType': mime_type,
+                'parents': list(parents),
+                'trashed': False,
+                'createdTime': timestamp,
+                'modifiedTime': timestamp,
+                'webViewLink': f"https://drive.google.com/file/d/{file_id}/view",
+            }
+            if app_properties:
+                record['appProperties'] = dict(app_properties)
+            self._files[file_id] = record
+            self._set_content(file_id, content)
+            self._record_change(file_id)
+            return dict(record)
+
+    def add_directory(self, directory: str, parents: Iterable[str] = (), pattern: str = '*.pdf') -> List[Dict[str, Any]]:
+        """Add every file in a local directory matching pattern, in name order."""
+        added = []
+        for path in sorted(glob.glob(os.path.join(directory, pattern))):
+            with open(path, 'rb') as f:
+                added.append(self.add_file(os.path.basename(path), f.read(), parents=parents))
+        return added
+
+    def rename_file(self, file_id: str, new_name: str):
+        """Rename a file and record the change."""
+        with self._lock:
+            self._files[file_id]['name'] = new_name
+            self._files[file_id]['modifiedTime'] = _now()
+            self._record_change(file_id)
+
+    def update_content(self, file_id: str, content: bytes):
+        """Replace a file's content and record the change."""
+        with self._lock:
+            self._set_content(file_id, content)
+            self._files[file_id]['modifiedTime'] = _now()
+            self._record_change(file_id)
+
+    def trash_file(self, file_id: str):
+        """Move a file to the trash and record the change."""
+        with self._lock:
+            self._files[file_id]['trashed'] = True
+            self._files[file_id]['modifiedTime'] = _now()
+            self._record_change(file_id)
+
+    def delete_file(self, file_id: str):
+        """Permanently delete a file and record a 'removed' change."""
+        with self._lock:
+            self._files.pop(file_id, None)
+            self._content.pop(file_id, None)
+            self._record_change(file_id, removed=True)
+
+    def simulate_network(self, size: int = 0):
+        """Sleep for one request's latency plus the transfer time of size bytes."""
+        delay = self.latency + (size / self.bandwidth if self.bandwidth else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def get_content(self, file_id: str) -> bytes:
+        """Return the stored bytes of a file."""
+        return self._content[file_id]
+
+    def _set_content(self, file_id: str, content: bytes):
+        self._content[file_id] = content
+        self._files[file_id]['size'] = str(len(content))
+        self._files[file_id]['md5Checksum'] = hashlib.md5(content).hexdigest()
+
+    def _record_change(self, file_id: str, removed: bool = False):
+        self.change_log.append({'fileId': file_id, 'removed': removed})
+
+    # Drive v3 resources
+
+    def new_batch_http_request(self, callback=None):
+        return _FakeBatch(self, callback)
+
+    def files(self):
+        return _FakeFilesResource(self)
+
+    def changes(self):
+        return _FakeChangesResource(self)
+
+    # Query evaluation
+
+    def _matches(self, record: Dict[str, Any], query: Optional[str]) -> bool:
+        """Evaluate the subset of the Drive query language used by Cortex."""
+        if not query:
+            return not record['trashed']
+        for clause in re.split(r'\s+and\s+', query.strip()):
+            clause = clause.strip()
+            parents_match = re.fullmatch(r"'((?:[^'\\]|\\.)*)'\s+in\s+parents", clause)
+            field_match = re.fullmatch(r"(\w+)\s*=\s*'((?:[^'\\]|\\.)*)'", clause)
+            trashed_match = re.fullmatch(r"trashed\s*=\s*(true|false)", clause)
+            if parents_match:
+                if _unescape(parents_match.group(1)) not in record['parents']:
+                    return False
+            elif trashed_match:
+                if record['trashed'] != (trashed_match.group(1) == 'true'):
+                    return False
+            elif field_match:
+                if record.get(field_match.group(1)) != _unescape(field_match.group(2)):
+                    return False
+            else:
+                raise ValueError(f"Unsupported query clause for fake Drive: {clause}")
+        return True
+
+def _unescape(value: str) -> str:
+    return re.sub(r'\\(.)', r'\1', value)
+
+class _FakeFilesResource:
+    """files() collection of the fake Drive."""
+
+    def __init__(self, drive: FakeDriveService):
+        self._drive = drive
+
+    def list(self, q=None, fields=None, orderBy=None, pageSize=100, pageToken=None, **kwargs):
+        def handler():
+            with self._drive._lock:
+                self._drive.request_count += 1
+                matches = [f for f in self._drive._files.values() if self._drive._matches(f, q)]
+                if orderBy:
+                    key, _, direction = orderBy.partition(' ')
+                    matches.sort(key=lambda f: f.get(key, ''), reverse=direction == 'desc')
+                start = int(pageToken or 0)
+                page = matches[start:start + pageSize]
+                result = {'files': [_project(f, fields) for f in page]}
+                if start + pageSize < len(matches):
+                    result['nextPageToken'] = str(start + pageSize)
+                return result
+        return _FakeRequest(handler, self._drive)
+
+    def get(self, fileId, fields=None, **kwargs):
+        def handler():
+            with self._drive._lock:
+                self._drive.request_count += 1
+                if fileId not in self._drive._files:
+                    raise FileNotFoundError(f"File not found: {fileId}")
+                return _project(self._drive._files[fileId], fields)
+        return _FakeRequest(handler, self._drive)
+
+    def get_media(self, fileId, **kwargs):
+        return _FakeMediaRequest(self._drive, fileId)
+
+    def create(self, body=None, media_body=None, fields=None, **kwargs):
+        def handler(content=None):
+            body_ = body or {}
+            if content is None:
+                content = _read_media(media_body) if media_body is not None else b''
+            record = self._drive.add_file(
+                name=body_.get('name', 'Untitled'),
+                content=content,
+                parents=body_.get('parents', []),
+                mime_type=body_.get('mimeType', getattr(media_body, 'mimetype', lambda: 'application/pdf')()),
+                app_properties=body_.get('appProperties')
+            )
+            self._drive.request_count += 1
+            return _project(record, fields)
+        if media_body is not None and getattr(media_body, 'resumable', lambda: False)():
+            return _FakeUploadRequest(self._drive, media_body, handler)
+        return _FakeRequest(handler, self._drive)
+
+    def update(self, fileId, body=None, fields=None, **kwargs):
+        def handler():
+            with self._drive._lock:
+                self._drive.request_count += 1
+                record = self._drive._files[fileId]
+                record.update(body or {})
+                record['modifiedTime'] = _now()
+                self._drive._record_change(fileId)
+                return _project(record, fields)
+        return _FakeRequest(handler, self._drive)
+
+class _FakeResponse(dict):
+    """httplib2.Response look-alike: a header dict with a status attribute."""
+
+    def __init__(self, status: int, headers: Dict[str, str]):
+        super().__init__(headers)
+        self.status = status
+
+class _FakeMediaHttp:
+    """Serves ranged GETs for one file, as MediaIoBaseDownload expects."""
+
+    def __init__(self, drive: FakeDriveService, file_id: str):
+        self._drive = drive
+        self._file_id = file_id
+
+    def request(self, uri, method='GET', headers=None, **kwargs):
+        with self._drive._lock:
+            self._drive.request_count += 1
+            if self._file_id not in self._drive._content:
+                return _FakeResponse(404, {}), b''
+            content = self._drive._content[self._file_id]
+
+        total = len(content)
+        match = re.match(r'bytes=(\d+)-(\d+)', (headers or {}).get('range', ''))
+        start, end = (int(match.group(1)), int(match.group(2))) if match else (0, total - 1)
+        chunk = content[start:end + 1]
+        self._drive.simulate_network(len(chunk))
+        return _FakeResponse(206, {'content-range': f"bytes {start}-{start + len(chunk) - 1}/{total}"}), chunk
+
+class _FakeMediaRequest:
+    """Media request for files().get_media(), usable with MediaIoBaseDownload."""
+
+    def __init__(self, drive: FakeDriveService, file_id: str):
+        self.uri = f"fake://drive/v3/files/{file_id}?alt=media"
+        self.headers = {}
+        self.http = _FakeMediaHttp(drive, file_id)
+        self._drive = drive
+        self._file_id = file_id
+
+    def execute(self, num_retries: int = 0):
+        with self._drive._lock:
+            self._drive.request_count += 1
+            content = self._drive._content[self._file_id]
+        self._drive.simulate_network(len(content))
+        return content
+
+class _FakeUploadProgress:
+    """MediaUploadProgress look-alike."""
+
+    def __init__(self, resumable_progress: int, total_size: int):
+        self.resumable_progress = resumable_progress
+        self.total_size = total_size
+
+    def progress(self) -> float:
+        return self.resumable_progress / self.total_size if self.total_size else 0.0
+
+class _FakeUploadHttp:
+    """Answers the resumable-upload status query (an empty PUT to the session URI)."""
+
+    def __init__(self, drive: FakeDriveService):
+        self._drive = drive
+
+    def request(self, uri, method='GET', headers=None, **kwargs):
+        with self._drive._lock:
+            self._drive.request_count += 1
+            session = self._drive.upload_sessions.get(uri)
+            if session is None:
+                return _FakeResponse(404, {}), b''
+            if session["response"] is not None:
+                return _FakeResponse(200, {}), json.dumps(session["response"]).encode('utf-8')
+            received = len(session["received"])
+        return _FakeResponse(308, {'range': f"bytes=0-{received - 1}"} if received else {}), b''
+
+class _FakeUploadRequest(_FakeRequest):
+    """
+    Resumable upload request mirroring HttpRequest.next_chunk().
+
+    Sessions live on the fake service, so a new request given an earlier
+    resumable_uri and the progress reported by its status query (through
+    request.http) continues where the old one stopped.
+    """
+
+    def __init__(self, drive: FakeDriveService, media_body, handler):
+        super().__init__(lambda: handler(), drive)
+        self._drive = drive
+        self.http = _FakeUploadHttp(drive)
+        self._media = media_body
+        self._finish = handler
+        self.resumable = media_body
+        self.resumable_uri = None
+        self.resumable_progress = 0
+        self._in_error_state = False
+
+    def next_chunk(self, http=None, num_retries: int = 0):
+        drive = self._drive
+        drive.simulate_network(min(self._media.chunksize(), self._media.size() - self.resumable_progress))
+        with drive._lock:
+            drive.request_count += 1
+            if self.resumable_uri is None:
+                self.resumable_uri = f"fake://upload/{uuid.uuid4().hex}"
+                drive.upload_sessions[self.resumable_uri] = {"received": b"", "response": None}
+            session = drive.upload_sessions.get(self.resumable_uri)
+            if session is None:
+                raise ConnectionError("Upload session not found")
+            if self._in_error_state:
+                self._in_error_state = False
+                if session["response"] is not None:
+                    return None, session["response"]
+                self.resumable_progress = len(session["received"])
+            if drive.fail_upload_chunks > 0:
+                drive.fail_upload_chunks -= 1
+                self._in_error_state = True
+                raise ConnectionError("Simulated connection reset during upload")
+
+            size = self._media.size()
+            chunk = self._media.getbytes(self.resumable_progress, self._media.chunksize())
+            session["received"] = session["received"][:self.resumable_progress] + chunk
+            self.resumable_progress = len(session["received"])
+            if self.resumable_progress < size:
+                return _FakeUploadProgress(self.resumable_progress, size), None
+
+        session["response"] = self._finish(session["received"])
+        return None, session["response"]
+
+def _read_media(media_body) -> bytes:
+    """Read the bytes behind a MediaUpload-like object."""
+    size = media_body.size()
+    return media_body.getbytes(0, size) if size else b''
+
+class _FakeChangesResource:
+    """changes() collection of the fake Drive; tokens are positions in the change log."""
+
+    def __init__(self, drive: FakeDriveService):
+        self._drive = drive
+
+    def getStartPageToken(self, **kwargs):
+        def handler():
+            with self._drive._lock:
+                self._drive.request_count += 1
+                token = str(len(self._drive.change_log))
+                self._drive.issued_tokens.append(token)
+                return {'startPageToken': token}
+        return _FakeRequest(handler, self._drive)
+
+    def list(self, pageToken, pageSize=100, fields=None, includeRemoved=True, **kwargs):
+        def handler():
+            with self._drive._lock:
+                self._drive.request_count += 1
+                self._drive.requested_tokens.append(pageToken)
+                start = int(pageToken)
+                entries = self._drive.change_log[start:start + pageSize]
+                changes = []
+                for entry in entries:
+                    change = {'fileId': entry['fileId'], 'removed': entry['removed']}
+                    record = self._drive._files.get(entry['fileId'])
+                    if record is not None and not entry['removed']:
+                        change['file'] = dict(record)
+                    elif not includeRemoved:
+                        continue
+                    changes.append(change)
+                result = {'changes': changes}
+                end = start + len(entries)
+                if end < len(self._drive.change_log):
+                    result['nextPageToken'] = str(end)
+                else:
+                    result['newStartPageToken'] = str(end)
+                    self._drive.issued_tokens.append(str(end))
+                return result
+        return _FakeRequest(handler, self._drive)
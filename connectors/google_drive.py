@@ -1,10 +1,10 @@
 import os
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import threading
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Iterator, Iterable, Tuple
 
 from utils.db_operations import is_document_in_db
+from utils.metrics import measure
 
 logger = logging.getLogger(__name__)
 
@@ -14,34 +14,341 @@ SCOPES = [
     'https://www.googleapis.com/auth/drive.file'       # For creating/writing files
 ]
 
+# Files per page for folder listings (Drive's maximum)
+LIST_PAGE_SIZE = 1000
+
+# Field projections for folder listings; request only what the caller uses
+DEFAULT_FILE_FIELDS = ('id', 'name', 'webViewLink', 'createdTime')
+PROCESSING_FILE_FIELDS = DEFAULT_FILE_FIELDS + ('md5Checksum', 'size', 'modifiedTime')
+
+# File fields requested for each entry of the changes feed
+CHANGE_FILE_FIELDS = PROCESSING_FILE_FIELDS + ('parents', 'mimeType', 'trashed')
+
+# Maximum sub-requests Drive accepts in one batch call
+BATCH_LIMIT = 100
+
+# Socket timeout (seconds) for the per-thread HTTP connections
+DRIVE_HTTP_TIMEOUT = int(os.getenv('DRIVE_HTTP_TIMEOUT', '120'))
+
+# Process-wide client state. Credentials and the discovery document are shared by
+# every thread; httplib2.Http is not thread-safe, so each thread gets its own
+# connection (and therefore its own service object) via _thread_local.
+_client_lock = threading.RLock()
+_credentials = None
+_discovery_document = None
+_service_factory: Optional[Callable[[], Any]] = None
+_http_factory: Optional[Callable[[], Any]] = None
+_thread_local = threading.local()
+_client_generation = 0
+
+def _get_credentials():
+    """Build the service-account credentials once and reuse them (and their token)."""
+    global _credentials
+    if _credentials is None:
+        with _client_lock:
+            if _credentials is None:
+                from google.oauth2 import service_account
+
+                # Create credentials dict from environment variables
+                credentials_dict = {
+                    "type": "service_account",
+                    "project_id": os.getenv("GCP_PROJECT_ID"),
+                    "private_key_id": os.getenv("GCP_PRIVATE_KEY_ID"),
+                    "private_key": os.getenv("GCP_PRIVATE_KEY"),
+                    "client_email": os.getenv("GCP_CLIENT_EMAIL"),
+                    "client_id": os.getenv("GCP_CLIENT_ID"),
+                    "auth_uri": os.getenv("GCP_AUTH_URI"),
+                    "token_uri": os.getenv("GCP_TOKEN_URI"),
+                    "auth_provider_x509_cert_url": os.getenv("GCP_AUTH_PROVIDER_CERT_URL"),
+                    "client_x509_cert_url": os.getenv("GCP_CLIENT_CERT_URL")
+                }
+
+                _credentials = service_account.Credentials.from_service_account_info(
+                    credentials_dict,
+                    scopes=SCOPES
+                )
+    return _credentials
+
+def _get_discovery_document():
+    """Load the Drive v3 discovery document once per process."""
+    global _discovery_document
+    if _discovery_document is None:
+        with _client_lock:
+            if _discovery_document is None:
+                try:
+                    # googleapiclient ships static discovery documents, no network needed
+                    from googleapiclient.discovery_cache import get_static_doc
+                    _discovery_document = get_static_doc('drive', 'v3')
+                except ImportError:
+                    _discovery_document = None
+
+                if _discovery_document is None:
+                    # Older client libraries: fetch once and keep the parsed document
+                    from googleapiclient.discovery import build
+                    service = build('drive', 'v3', credentials=_get_credentials(), cache_discovery=False)
+                    _discovery_document = service._rootDesc
+                    logger.info("Fetched Drive discovery document")
+    return _discovery_document
+
+def _build_http():
+    """Create an authorized, keep-alive HTTP connection for the current thread."""
+    if _http_factory is not None:
+        return _http_factory()
+
+    import httplib2
+    import google_auth_httplib2
+
+    # AuthorizedHttp refreshes the shared credentials' token when it expires
+    return google_auth_httplib2.AuthorizedHttp(
+        _get_credentials(),
+        http=httplib2.Http(timeout=DRIVE_HTTP_TIMEOUT)
+    )
+
+def set_drive_service_factory(factory: Optional[Callable[[], Any]]):
+    """
+    Replace how Drive service objects are created, e.g. to inject a local fake Drive.
+    
+    Args:
+        factory: Zero-argument callable returning a Drive-compatible service object,
+            or None to restore the real Google Drive client
+    """
+    global _service_factory
+    _service_factory = factory
+    reset_drive_service()
+
+def set_drive_http_factory(factory: Optional[Callable[[], Any]]):
+    """
+    Replace the HTTP transport used by the real Drive client (e.g. googleapiclient.http.HttpMock).
+    
+    Args:
+        factory: Zero-argument callable returning an httplib2-compatible object,
+            or None to restore the default authorized keep-alive transport
+    """
+    global _http_factory
+    _http_factory = factory
+    reset_drive_service()
+
+def reset_drive_service():
+    """Drop cached per-thread service objects so they are rebuilt on next use."""
+    global _client_generation
+    with _client_lock:
+        _client_generation += 1
+
 def get_drive_service():
-    """Get authenticated Google Drive service using environment variables."""
+    """
+    Get the authenticated Google Drive service for the current thread.
+    
+    The service is built once per thread from a process-wide discovery document
+    and credentials, so repeated calls are cheap and reuse the open connection.
+    """
+    service = getattr(_thread_local, 'service', None)
+    if service is not None and getattr(_thread_local, 'generation', None) == _client_generation:
+        return service
+
     try:
-        # Create credentials dict from environment variables
-        credentials_dict = {
-            "type": "service_account",
-            "project_id": os.getenv("GCP_PROJECT_ID"),
-            "private_key_id": os.getenv("GCP_PRIVATE_KEY_ID"),
-            "private_key": os.getenv("GCP_PRIVATE_KEY"),
-            "client_email": os.getenv("GCP_CLIENT_EMAIL"),
-            "client_id": os.getenv("GCP_CLIENT_ID"),
-            "auth_uri": os.getenv("GCP_AUTH_URI"),
-            "token_uri": os.getenv("GCP_TOKEN_URI"),
-            "auth_provider_x509_cert_url": os.getenv("GCP_AUTH_PROVIDER_CERT_URL"),
-            "client_x509_cert_url": os.getenv("GCP_CLIENT_CERT_URL")
-        }
-
-        # Create credentials object
-        credentials = service_account.Credentials.from_service_account_info(
-            credentials_dict,
-            scopes=SCOPES
-        )
-        
-        return build('drive', 'v3', credentials=credentials)
+        if _service_factory is not None:
+            service = _service_factory()
+        else:
+            # The client library is imported on first use to keep process startup fast
+            from googleapiclient.discovery import build_from_document
+            service = build_from_document(_get_discovery_document(), http=_build_http())
+
+        _thread_local.service = service
+        _thread_local.generation = _client_generation
+        return service
     except Exception as e:
         logger.error(f"Failed to initialize Drive service: {str(e)}")
         raise
 
+def escape_query_value(value: str) -> str:
+    """Escape a string for use inside a quoted Drive query literal."""
+    return value.replace('\\', '\\\\').replace("'", "\\'")
+
+def iter_folder_pages(
+    folder_id: str,
+    fields: Iterable[str] = DEFAULT_FILE_FIELDS,
+    mime_type: Optional[str] = 'application/pdf',
+    order_by: Optional[str] = 'createdTime desc',
+    page_size: int = LIST_PAGE_SIZE,
+    service=None
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield pages of files in a Google Drive folder, following nextPageToken.
+    
+    Each page is fetched only when the previous one has been consumed, so callers
+    can start working on the first files while the listing is still in progress.
+    
+    Args:
+        folder_id: ID of the Google Drive folder
+        fields: File fields to request for each file
+        mime_type: Only list files of this MIME type (None for all types)
+        order_by: Drive orderBy clause (None for Drive's default order)
+        page_size: Number of files to request per page
+        service: Drive service to use (defaults to the calling thread's service)
+        
+    Yields:
+        List of file dictionaries for each page
+    """
+    service = service or get_drive_service()
+
+    query = f"'{escape_query_value(folder_id)}' in parents and trashed = false"
+    if mime_type:
+        query += f" and mimeType='{mime_type}'"
+
+    params = {
+        'q': query,
+        'fields': f"nextPageToken, files({', '.join(fields)})",
+        'pageSize': page_size
+    }
+    if order_by:
+        params['orderBy'] = order_by
+
+    page_token = None
+    page_count = 0
+    while True:
+        if page_token:
+            params['pageToken'] = page_token
+
+        with measure("list"):
+            results = service.files().list(**params).execute()
+        page_count += 1
+
+        files = results.get('files', [])
+        logger.info(f"Listed page {page_count} of folder {folder_id} ({len(files)} files)")
+        if files:
+            yield files
+
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break
+
+def list_folder_files(
+    folder_id: str,
+    fields: Iterable[str] = DEFAULT_FILE_FIELDS,
+    mime_type: Optional[str] = 'application/pdf',
+    order_by: Optional[str] = 'createdTime desc',
+    page_size: int = LIST_PAGE_SIZE,
+    service=None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield every file in a Google Drive folder, streaming page by page.
+    
+    Args:
+        folder_id: ID of the Google Drive folder
+        fields: File fields to request for each file
+        mime_type: Only list files of this MIME type (None for all types)
+        order_by: Drive orderBy clause (None for Drive's default order)
+        page_size: Number of files to request per page
+        service: Drive service to use (defaults to the calling thread's service)
+        
+    Yields:
+        Dictionary of file information for each file
+    """
+    for page in iter_folder_pages(folder_id, fields, mime_type, order_by, page_size, service):
+        yield from page
+
+def execute_batch(requests: List[Tuple[str, Any]], service=None) -> Dict[str, Tuple[Any, Optional[Exception]]]:
+    """
+    Execute Drive API requests through the batch endpoint, BATCH_LIMIT at a time.
+    
+    Args:
+        requests: List of (key, unexecuted request) pairs; keys must be unique
+        service: Drive service to use (defaults to the calling thread's service)
+        
+    Returns:
+        Dict mapping each key to a (response, exception) tuple
+    """
+    service = service or get_drive_service()
+    results = {}
+
+    for start in range(0, len(requests), BATCH_LIMIT):
+        chunk = requests[start:start + BATCH_LIMIT]
+        keys = {str(i): key for i, (key, _) in enumerate(chunk)}
+
+        def callback(request_id, response, exception):
+            results[keys[request_id]] = (response, exception)
+
+        batch = service.new_batch_http_request(callback=callback)
+        for i, (_, request) in enumerate(chunk):
+            batch.add(request, request_id=str(i))
+        batch.execute()
+
+    logger.info(f"Executed {len(requests)} Drive requests in {(len(requests) + BATCH_LIMIT - 1) // BATCH_LIMIT} batch calls")
+    return results
+
+def batch_get_files(
+    file_ids: Iterable[str],
+    fields: Iterable[str] = ('id', 'name'),
+    service=None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Get metadata for many files with batched files().get calls.
+    
+    Args:
+        file_ids: IDs of the files to look up
+        fields: File fields to request
+        service: Drive service to use (defaults to the calling thread's service)
+        
+    Returns:
+        Dict mapping file ID to file metadata; files that could not be fetched are omitted
+    """
+    service = service or get_drive_service()
+    field_list = ','.join(fields)
+    requests = [
+        (file_id, service.files().get(fileId=file_id, fields=field_list))
+        for file_id in dict.fromkeys(file_ids)
+    ]
+
+    files = {}
+    for file_id, (response, exception) in execute_batch(requests, service).items():
+        if exception is not None:
+            logger.error(f"Error getting metadata for {file_id}: {str(exception)}")
+        else:
+            files[file_id] = response
+    return files
+
+def get_start_page_token(service=None) -> str:
+    """Get the changes-feed token that marks the current state of the Drive."""
+    service = service or get_drive_service()
+    response = service.changes().getStartPageToken().execute()
+    return response['startPageToken']
+
+def list_changes(
+    page_token: str,
+    fields: Iterable[str] = CHANGE_FILE_FIELDS,
+    page_size: int = LIST_PAGE_SIZE,
+    service=None
+) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Get all changes recorded since a changes-feed token.
+    
+    Args:
+        page_token: Token from get_start_page_token or a previous list_changes call
+        fields: File fields to request for each changed file
+        page_size: Number of changes to request per page
+        service: Drive service to use (defaults to the calling thread's service)
+        
+    Returns:
+        Tuple of (list of change dictionaries, token to use for the next call)
+    """
+    service = service or get_drive_service()
+
+    changes = []
+    while True:
+        results = service.changes().list(
+            pageToken=page_token,
+            pageSize=page_size,
+            spaces='drive',
+            includeRemoved=True,
+            fields=f"nextPageToken, newStartPageToken, changes(fileId, removed, file({', '.join(fields)}))"
+        ).execute()
+
+        changes.extend(results.get('changes', []))
+
+        if 'newStartPageToken' in results:
+            return changes, results['newStartPageToken']
+        page_token = results['nextPageToken']
+
 def get_latest_file(folder_id: str) -> Optional[Dict[str, Any]]:
     """
     Get the most recent file from a Google Drive folder.
@@ -53,17 +360,9 @@ def get_latest_file(folder_id: str) -> Optional[Dict[str, Any]]:
         Dict containing file information or None if no files found
     """
     try:
-        service = get_drive_service()
-        
-        # List files in the folder, ordered by most recent first
-        results = service.files().list(
-            q=f"'{folder_id}' in parents and mimeType='application/pdf'",
-            fields="files(id, name, webViewLink, createdTime)",
-            orderBy="createdTime desc",
-            pageSize=1
-        ).execute()
-        
-        files = results.get('files', [])
+        # Only the first page is needed, ordered by most recent first
+        pages = iter_folder_pages(folder_id, fields=PROCESSING_FILE_FIELDS, page_size=1)
+        files = next(pages, [])
         if not files:
             return None
             
@@ -83,21 +382,9 @@ def get_unprocessed_files(folder_id: str) -> List[Dict[str, Any]]:
         List of dictionaries containing file information
     """
     try:
-        service = get_drive_service()
-        
-        # List all files in the folder
-        results = service.files().list(
-            q=f"'{folder_id}' in parents and mimeType='application/pdf'",
-            fields="files(id, name, webViewLink, createdTime)",
-            orderBy="createdTime desc",
-            pageSize=50  # Get more than we need to filter
-        ).execute()
-        
-        files = results.get('files', [])
-        
-        # Filter out files that have already been processed
+        # Filter out files that have already been processed, across all pages
         unprocessed_files = []
-        for file in files:
+        for file in list_folder_files(folder_id):
             if not is_document_in_db(file['id']):
                 unprocessed_files.append(file)
                     
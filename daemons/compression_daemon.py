@@ -1,23 +1,87 @@
 import os
+import json
+import uuid
 import logging
-from typing import Optional, Tuple
+import threading
+from typing import Optional, Tuple, Dict, Any, Callable
 import subprocess
 from pathlib import Path
-from googleapiclient.http import MediaFileUpload
+from concurrent.futures import Future, ThreadPoolExecutor
 from connectors.google_drive import get_drive_service
+from connectors.drive_uploads import UploadManager
+from daemons.compression_scheduler import CompressionScheduler
+from daemons.compression_profiles import PROFILES, DEFAULT_PROFILE, ghostscript_args, select_profiles
+from utils.pdf_tools import analyze_pdf_composition
+from utils.metrics import record as record_metric
+from daemons.compression_manifest import (
+    CompressionManifest,
+    compressed_name_for,
+    SOURCE_ID_PROPERTY,
+    SOURCE_HASH_PROPERTY,
+    ORIGINAL_SIZE_PROPERTY,
+    SETTINGS_PROPERTY
+)
 
 logger = logging.getLogger(__name__)
 
+# Files predicted to shrink by less than this fraction are not compressed at all
+MIN_PREDICTED_REDUCTION = float(os.getenv('COMPRESSION_MIN_PREDICTED_REDUCTION', '0.10'))
+
+# Compressed outputs that saved less than this fraction are not uploaded
+MIN_REDUCTION = float(os.getenv('COMPRESSION_MIN_REDUCTION', '0.05'))
+
+# Run two candidate profiles in parallel and keep the smaller output
+TRY_ALTERNATIVE_PROFILES = os.getenv('COMPRESSION_TRY_ALTERNATIVES', 'false').lower() == 'true'
+
+# Expected fraction saved by /ebook-style recompression, per image filter: raw and
+# Flate images become JPEGs, existing JPEGs are downsampled, bilevel scans barely change
+IMAGE_SAVINGS_BY_FILTER = {
+    '/None': 0.85,
+    '/FlateDecode': 0.75,
+    '/LZWDecode': 0.75,
+    '/RunLengthDecode': 0.75,
+    '/DCTDecode': 0.45,
+    '/JPXDecode': 0.30,
+    '/CCITTFaxDecode': 0.0,
+    '/JBIG2Decode': 0.0
+}
+
+# Expected fraction saved on embedded fonts (subsetting) and everything else
+FONT_SAVINGS = 0.30
+OTHER_SAVINGS = 0.05
+
 class CompressionDaemon:
-    def __init__(self, compression_level: int = 3, compressed_folder_id: str = "1IAnpWPKBxfWklXYUxooRqSNMc7-Jg_ZG"):
+    def __init__(
+        self,
+        compression_level: int = 3,
+        compressed_folder_id: str = "1IAnpWPKBxfWklXYUxooRqSNMc7-Jg_ZG",
+        manifest_path: str = "data/compression_manifest.db",
+        scheduler: Optional[CompressionScheduler] = None,
+        uploader: Optional[UploadManager] = None,
+        min_predicted_reduction: float = MIN_PREDICTED_REDUCTION,
+        min_reduction: float = MIN_REDUCTION,
+        try_alternatives: bool = TRY_ALTERNATIVE_PROFILES
+    ):
         """Initialize the compression daemon with configuration."""
         self.compression_level = compression_level
         self.compressed_folder_id = compressed_folder_id
-        self.drive_service = get_drive_service()
+        self.min_predicted_reduction = min_predicted_reduction
+        self.min_reduction = min_reduction
+        self.try_alternatives = try_alternatives
+        self._candidates_lock = threading.Lock()
+        self.manifest = CompressionManifest(manifest_path)
+        self.scheduler = scheduler or CompressionScheduler()
+        self.uploader = uploader or UploadManager()
+        self._finish_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="compression-finish")
         self._verify_ghostscript()
         logger.info(f"Compression daemon initialized with level {compression_level}")
         logger.info(f"Using compressed folder ID: {compressed_folder_id}")
 
+    @property
+    def drive_service(self):
+        """Drive client for the calling thread (cached process-wide by the connector)."""
+        return get_drive_service()
+
     def _verify_ghostscript(self):
         """Verify Ghostscript is installed."""
         try:
@@ -27,19 +91,76 @@ class CompressionDaemon:
             logger.error("Ghostscript not found. Please install Ghostscript.")
             raise RuntimeError("Ghostscript is required but not installed")
 
-    def is_already_compressed(self, filename: str) -> bool:
-        """Check if a compressed version of the file already exists in the compressed folder."""
+    def _ensure_manifest(self):
+        """Build the local manifest from the compressed folder on first use."""
+        if not self.manifest.is_bootstrapped(self.compressed_folder_id):
+            self.manifest.bootstrap(self.compressed_folder_id)
+
+    def rebuild_manifest(self) -> int:
+        """Re-index the compressed folder, e.g. after files were changed outside Cortex."""
+        return self.manifest.bootstrap(self.compressed_folder_id)
+
+    def needs_compression(self, file: Dict[str, Any]) -> bool:
+        """
+        Check the local manifest for a compressed copy of a Drive file.
+        
+        Args:
+            file: Drive file dictionary (id, name and, if available, md5Checksum)
+            
+        Returns:
+            bool: True if no compressed copy is known or waiting to be uploaded
+        """
         try:
-            # Query Drive for file with same name in compressed folder
-            query = f"name = '{filename}' and '{self.compressed_folder_id}' in parents"
-            results = self.drive_service.files().list(
-                q=query,
-                fields="files(id, name)",
-                spaces='drive'
-            ).execute()
+            self._ensure_manifest()
+            entry = self.manifest.lookup(
+                source_id=file.get('id'),
+                content_hash=file.get('md5Checksum'),
+                name=file.get('name')
+            )
+            if entry:
+                logger.info(f"Found existing compressed version of {file.get('name')}: {entry['compressed_id']}")
+                return False
+            
+            if file.get('id') and self._has_pending_upload(file):
+                return False
             
-            files = results.get('files', [])
-            if files:
+            skip = self.manifest.lookup_skip(file.get('id'), file.get('md5Checksum')) if file.get('id') else None
+            if skip:
+                logger.info(f"Compression previously skipped for {file.get('name')}: {skip['reason']}")
+                return False
+            return True
+        except Exception as e:
+            logger.error(f"Error checking for existing compressed file: {str(e)}")
+            return True
+
+    def _has_pending_upload(self, file: Dict[str, Any]) -> bool:
+        """
+        Check for a compressed copy of a file that is still waiting to be uploaded.
+        
+        Pending uploads are retried by resume_uploads, so compressing the file
+        again would only upload a second copy. A pending copy of older content
+        (the file changed in Drive since) is abandoned and its output removed.
+        """
+        content_hash = file.get('md5Checksum')
+        pending = False
+        for upload in self.uploader.pending_for_source(file['id']):
+            pending_hash = upload["context"].get("content_hash")
+            if not content_hash or not pending_hash or pending_hash == content_hash:
+                logger.info(f"Compressed copy of {file.get('name')} is waiting to be uploaded")
+                pending = True
+            elif self.uploader.abandon(upload["upload_id"], "Source file changed before the upload completed"):
+                if os.path.exists(upload["local_path"]):
+                    os.remove(upload["local_path"])
+            else:
+                # Running right now; let it finish rather than racing it
+                pending = True
+        return pending
+
+    def is_already_compressed(self, filename: str) -> bool:
+        """Check if a compressed file with the same name exists in the compressed folder."""
+        try:
+            self._ensure_manifest()
+            if self.manifest.has_name(filename):
                 logger.info(f"Found existing compressed version of {filename}")
                 return True
             return False
@@ -47,132 +168,446 @@ class CompressionDaemon:
             logger.error(f"Error checking for existing compressed file: {str(e)}")
             return False
 
-    def compress_pdf(self, input_path: str, original_filename: str) -> Optional[Tuple[str, int, str]]:
-        """
-        Compress PDF file using Ghostscript and upload to Drive.
-        Returns tuple of (output_path, compressed_size, drive_id) or None if compression fails.
-        """
+    def _ghostscript_command(self, input_path: str, output_path: str, profile: str = DEFAULT_PROFILE) -> list:
+        """Build the Ghostscript command line for a compression job."""
+        return [
+            'gs',
+            '-sDEVICE=pdfwrite',
+            '-dCompatibilityLevel=1.4',
+            *ghostscript_args(profile, self.compression_level),
+            '-dNOPAUSE',
+            '-dQUIET',
+            '-dBATCH',
+            f'-sOutputFile={output_path}',
+            input_path
+        ]
+
+    def _is_valid_pdf(self, path: str, original_filename: str) -> bool:
+        """Check that a file starts with a PDF header."""
         try:
-            if not os.path.exists(input_path):
-                logger.error(f"Input file not found: {input_path}")
-                return None
+            with open(path, 'rb') as f:
+                header = f.read(1024)
+            if not header.startswith(b'%PDF-'):
+                logger.error(f"Invalid PDF file (wrong header): {original_filename}")
+                return False
+            return True
+        except Exception as e:
+            logger.error(f"Error reading PDF file {original_filename}: {str(e)}")
+            return False
 
-            # Verify PDF is valid before attempting compression
-            try:
-                with open(input_path, 'rb') as f:
-                    header = f.read(1024)
-                    if not header.startswith(b'%PDF-'):
-                        logger.error(f"Invalid PDF file (wrong header): {original_filename}")
-                        return None
-            except Exception as e:
-                logger.error(f"Error reading PDF file {original_filename}: {str(e)}")
-                return None
+    def _analyze(self, input_path: str) -> Optional[Dict[str, Any]]:
+        """Sample a PDF's composition, or None if it can't be parsed."""
+        try:
+            return analyze_pdf_composition(input_path)
+        except Exception as e:
+            logger.warning(f"Could not analyze {input_path} for compression: {str(e)}")
+            return None
 
-            original_size = os.path.getsize(input_path)
-            logger.info(f"Original file size: {original_size/1024/1024:.2f}MB")
+    def predict_reduction(self, input_path: str, composition: Optional[Dict[str, Any]] = None) -> Optional[float]:
+        """
+        Predict the fraction of a PDF's size that Ghostscript would save.
+        
+        Samples the document's image and font streams (see analyze_pdf_composition)
+        and applies the expected savings for each kind of content.
+        
+        Returns:
+            Optional[float]: Predicted reduction between 0 and 1, or None if the PDF can't be analyzed
+        """
+        composition = composition or self._analyze(input_path)
+        if composition is None:
+            return None
+        
+        file_size = composition["file_size"]
+        if not file_size:
+            return 0.0
+        
+        image_savings = sum(
+            size * IMAGE_SAVINGS_BY_FILTER.get(name, 0.5)
+            for name, size in composition["image_bytes_by_filter"].items()
+        )
+        font_bytes = composition["font_bytes"]
+        other_bytes = max(0, file_size - composition["image_bytes"] - font_bytes)
+        savings = image_savings + font_bytes * FONT_SAVINGS + other_bytes * OTHER_SAVINGS
+        
+        predicted = min(1.0, savings / file_size)
+        logger.info(
+            f"Predicted reduction {predicted * 100:.1f}% for {input_path} "
+            f"({composition['image_count']} images, {composition['image_bytes']/1024/1024:.2f}MB of image data)"
+        )
+        return predicted
 
-            # Create output path in compressed directory
-            os.makedirs("compressed", exist_ok=True)
-            
-            # Use original filename for the compressed version
-            filename_stem = Path(original_filename).stem
-            compressed_filename = f"{filename_stem}.pdf"
-            output_path = str(Path("compressed") / compressed_filename)
-
-            logger.info(f"Compressing {original_filename} to {compressed_filename}")
-
-            # Ghostscript compression command
-            gs_command = [
-                'gs',
-                '-sDEVICE=pdfwrite',
-                '-dCompatibilityLevel=1.4',
-                '-dPDFSETTINGS=/ebook',  # Balance between size and quality
-                f'-dCompressLevel={self.compression_level}',
-                '-dNOPAUSE',
-                '-dQUIET',
-                '-dBATCH',
-                f'-sOutputFile={output_path}',
-                input_path
-            ]
-
-            # Run compression with timeout
-            try:
-                result = subprocess.run(
-                    gs_command, 
-                    capture_output=True, 
-                    text=True,
-                    timeout=300  # 5 minute timeout
-                )
-            except subprocess.TimeoutExpired:
-                logger.error(f"Compression timed out for {original_filename}")
-                return None
+    def _skip(
+        self,
+        source_file: Dict[str, Any],
+        original_filename: str,
+        reason: str,
+        predicted_reduction: Optional[float] = None,
+        actual_reduction: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Record a skip decision in the manifest and build the matching result."""
+        logger.info(f"Skipping compression of {original_filename}: {reason}")
+        if source_file.get('id'):
+            self.manifest.record_skip(
+                source_id=source_file['id'],
+                source_name=original_filename,
+                content_hash=source_file.get('md5Checksum'),
+                reason=reason,
+                predicted_reduction=predicted_reduction,
+                actual_reduction=actual_reduction
+            )
+        return {
+            "status": "skipped",
+            "reason": reason,
+            "predicted_reduction": predicted_reduction,
+            "actual_reduction": actual_reduction
+        }
+
+    def submit_compression(
+        self,
+        input_path: str,
+        original_filename: str,
+        source_file: Optional[Dict[str, Any]] = None,
+        callback: Optional[Callable[[Future], None]] = None,
+        document_type: Optional[str] = None
+    ) -> Future:
+        """
+        Queue a PDF for compression and upload without blocking the caller.
+        
+        Files predicted to shrink by less than min_predicted_reduction are skipped
+        without running Ghostscript, and outputs that saved less than min_reduction
+        are not uploaded. Ghostscript settings are chosen per document from its
+        composition and document_type; with try_alternatives set, two profiles run
+        in parallel and the smaller valid output wins. Smaller files are compressed first.
+        
+        Args:
+            input_path: Local path of the original PDF
+            original_filename: Drive name of the original file
+            source_file: Original Drive file, linking the upload to its source in the manifest
+            callback: Called with the future once compression and upload have finished
+            document_type: Classification of the document, used to pick the profile
             
-            if result.returncode != 0:
-                logger.error(f"Compression failed for {original_filename}: {result.stderr}")
-                return None
+        Returns:
+            Future resolving to a dict whose "status" is "compressed" (with output_path,
+            original_size, compressed_size, drive_id and profile), "skipped" (with reason)
+            or "failed" (with error)
+        """
+        source_file = source_file or {}
+        result = Future()
+        if callback is not None:
+            result.add_done_callback(callback)
+        result.set_running_or_notify_cancel()
+        result.gs_futures = []
+
+        if not os.path.exists(input_path):
+            logger.error(f"Input file not found: {input_path}")
+            result.set_result({"status": "failed", "error": f"Input file not found: {input_path}"})
+            return result
+
+        # Verify PDF is valid before attempting compression
+        if not self._is_valid_pdf(input_path, original_filename):
+            result.set_result({"status": "failed", "error": "Invalid PDF file"})
+            return result
+
+        original_size = os.path.getsize(input_path)
+        logger.info(f"Original file size: {original_size/1024/1024:.2f}MB")
 
-            # Verify the compressed file is valid
+        # Skip files whose content can't shrink meaningfully (e.g. text-only papers)
+        composition = self._analyze(input_path)
+        predicted_reduction = self.predict_reduction(input_path, composition)
+        if predicted_reduction is not None and predicted_reduction < self.min_predicted_reduction:
+            result.set_result(self._skip(
+                source_file, original_filename,
+                f"predicted reduction {predicted_reduction * 100:.1f}% is below threshold",
+                predicted_reduction=predicted_reduction
+            ))
+            return result
+
+        profiles = select_profiles(composition, document_type, max_candidates=2 if self.try_alternatives else 1)
+
+        # Create output paths in compressed directory; the Drive name stays the original's
+        os.makedirs("compressed", exist_ok=True)
+        compressed_filename = compressed_name_for(original_filename)
+        output_prefix = source_file.get('id') or uuid.uuid4().hex
+
+        candidates = {}
+        for profile in profiles:
+            output_path = str(Path("compressed") / f"{output_prefix}_{profile}_{compressed_filename}")
+            logger.info(f"Compressing {original_filename} to {compressed_filename} with profile {profile}")
+            candidates[profile] = (
+                self.scheduler.submit(
+                    self._ghostscript_command(input_path, output_path, profile),
+                    priority=original_size,
+                    label=f"{original_filename} ({profile})"
+                ),
+                output_path
+            )
+            result.gs_futures.append(candidates[profile][0])
+
+        context = {
+            "original_filename": original_filename,
+            "compressed_filename": compressed_filename,
+            "original_size": original_size,
+            "source_file": source_file,
+            "document_type": document_type,
+            "predicted_reduction": predicted_reduction
+        }
+        remaining = [len(candidates)]
+
+        def on_compressed(finished: Future):
+            # Continue once every candidate profile has finished
+            with self._candidates_lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            self._finish_executor.submit(self._finish_compression, candidates, result, context)
+
+        for gs_future, _ in candidates.values():
+            gs_future.add_done_callback(on_compressed)
+        return result
+
+    def _select_candidate(self, candidates: Dict[str, Tuple[Future, str]], context: Dict[str, Any]) -> Optional[Tuple[str, str, int]]:
+        """
+        Pick the smallest valid Ghostscript output, remove the others and record every run.
+        
+        Returns:
+            Optional[Tuple[str, str, int]]: (profile, output_path, compressed_size) or None if all failed
+        """
+        original_filename = context["original_filename"]
+        original_size = context["original_size"]
+        valid = []
+        runs = []
+
+        for profile, (gs_future, output_path) in candidates.items():
+            run = {"profile": profile, "output_size": None, "elapsed": None, "error": None}
+            gs_result = None
             try:
-                with open(output_path, 'rb') as f:
-                    header = f.read(1024)
-                    if not header.startswith(b'%PDF-'):
-                        logger.error(f"Compression produced invalid PDF for {original_filename}")
-                        os.remove(output_path)
-                        return None
+                gs_result = gs_future.result()
+                run["elapsed"] = gs_result["elapsed"]
+                if gs_result["returncode"] != 0:
+                    raise RuntimeError(gs_result["stderr"])
+                
+                # Verify the compressed file is valid
+                if not self._is_valid_pdf(output_path, original_filename):
+                    raise RuntimeError("Compression produced invalid PDF")
+                
+                run["output_size"] = os.path.getsize(output_path)
+                logger.info(f"Ghostscript time for {profile}: {gs_result['elapsed']:.1f}s (queued {gs_result['queued']:.1f}s)")
+                valid.append((run["output_size"], profile, output_path))
             except Exception as e:
-                logger.error(f"Error verifying compressed PDF {original_filename}: {str(e)}")
-                if os.path.exists(output_path):
-                    os.remove(output_path)
-                return None
+                run["error"] = str(e) or type(e).__name__
+                logger.error(f"Compression with profile {profile} failed for {original_filename}: {run['error']}")
+            runs.append(run)
+            if gs_result is not None:
+                record_metric(
+                    "gs",
+                    context["source_file"].get('id'),
+                    wall_seconds=gs_result["elapsed"],
+                    cpu_seconds=gs_result.get("cpu"),
+                    bytes_count=original_size,
+                    error=run["error"] is not None
+                )
+
+        best = min(valid) if valid else None
+        for _, output_path in candidates.values():
+            if (best is None or output_path != best[2]) and os.path.exists(output_path):
+                os.remove(output_path)
+
+        for run in runs:
+            self.manifest.record_run(
+                source_id=context["source_file"].get('id'),
+                source_name=original_filename,
+                document_type=context["document_type"],
+                profile=run["profile"],
+                candidates=list(candidates),
+                selected=best is not None and run["profile"] == best[1],
+                original_size=original_size,
+                output_size=run["output_size"],
+                elapsed=run["elapsed"],
+                error=run["error"]
+            )
+
+        if best is None:
+            return None
+        compressed_size, profile, output_path = best
+        return profile, output_path, compressed_size
+
+    def _finish_compression(self, candidates: Dict[str, Tuple[Future, str]], result: Future, context: Dict[str, Any]):
+        """Keep the best Ghostscript output and queue its upload; resolves the caller's future."""
+        original_filename = context["original_filename"]
+        compressed_filename = context["compressed_filename"]
+        original_size = context["original_size"]
+        source_file = context["source_file"]
+        predicted_reduction = context["predicted_reduction"]
+        output_path = None
+        try:
+            selected = self._select_candidate(candidates, context)
+            if selected is None:
+                raise RuntimeError(f"Compression failed for {original_filename}")
+            profile, output_path, compressed_size = selected
 
-            compressed_size = os.path.getsize(output_path)
             reduction = (1 - compressed_size/original_size) * 100
             
             logger.info(f"Compression complete:")
             logger.info(f"Original size: {original_size/1024/1024:.2f}MB")
             logger.info(f"Compressed size: {compressed_size/1024/1024:.2f}MB")
-            logger.info(f"Size reduction: {reduction:.1f}%")
+            logger.info(f"Size reduction: {reduction:.1f}% (profile {profile})")
+
+            # Never upload outputs that didn't shrink enough to be worth storing
+            if not self.verify_compression(original_size, compressed_size, self.min_reduction):
+                os.remove(output_path)
+                result.set_result(self._skip(
+                    source_file, original_filename,
+                    f"compression only saved {reduction:.1f}%",
+                    predicted_reduction=predicted_reduction,
+                    actual_reduction=reduction / 100
+                ))
+                return
 
-            # Upload compressed file to Drive
+            # Upload compressed file to Drive; the local copy is kept until Drive confirms it
             logger.info(f"Uploading compressed file to Drive folder {self.compressed_folder_id}")
             
+            settings = {
+                'profile': profile,
+                'pdf_settings': PROFILES[profile]['pdf_settings'],
+                'compression_level': self.compression_level
+            }
+            app_properties = {
+                ORIGINAL_SIZE_PROPERTY: str(original_size),
+                SETTINGS_PROPERTY: json.dumps(settings)
+            }
+            if source_file.get('id'):
+                app_properties[SOURCE_ID_PROPERTY] = source_file['id']
+            if source_file.get('md5Checksum'):
+                app_properties[SOURCE_HASH_PROPERTY] = source_file['md5Checksum']
+            
             file_metadata = {
                 'name': compressed_filename,
-                'parents': [self.compressed_folder_id]
+                'parents': [self.compressed_folder_id],
+                'appProperties': app_properties
             }
-            
-            media = MediaFileUpload(
+
+            # Everything needed to record the upload, even if it completes after a restart
+            upload_context = {
+                "compressed_name": compressed_filename,
+                "source_id": source_file.get('id'),
+                "source_name": original_filename,
+                "content_hash": source_file.get('md5Checksum'),
+                "original_size": original_size,
+                "compressed_size": compressed_size,
+                "settings": settings,
+                "predicted_reduction": predicted_reduction
+            }
+            self.uploader.submit(
                 output_path,
-                mimetype='application/pdf',
-                resumable=True
+                file_metadata,
+                context=upload_context,
+                callback=lambda upload: self._on_uploaded(upload, result)
             )
-            
-            file = self.drive_service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id'
-            ).execute()
-            
-            drive_id = file.get('id')
-            logger.info(f"Compressed file uploaded to Drive with ID: {drive_id}")
-
-            return output_path, compressed_size, drive_id
 
         except Exception as e:
             logger.error(f"Error during compression of {original_filename}: {str(e)}")
             # Clean up any partial output
-            if 'output_path' in locals() and os.path.exists(output_path):
+            if output_path and os.path.exists(output_path):
                 try:
                     os.remove(output_path)
                 except Exception:
                     pass
+            result.set_result({"status": "failed", "error": str(e)})
+
+    def _record_upload(self, upload: Dict[str, Any]) -> Dict[str, Any]:
+        """Add a confirmed upload to the manifest and build the "compressed" outcome."""
+        context = upload["context"]
+        logger.info(f"Compressed file uploaded to Drive with ID: {upload['drive_id']}")
+        self.manifest.record(
+            compressed_id=upload["drive_id"],
+            compressed_name=context["compressed_name"],
+            source_id=context["source_id"],
+            source_name=context["source_name"],
+            content_hash=context["content_hash"],
+            original_size=context["original_size"],
+            compressed_size=context["compressed_size"],
+            settings=context["settings"]
+        )
+        return {
+            "status": "compressed",
+            "output_path": upload["local_path"],
+            "original_size": context["original_size"],
+            "compressed_size": context["compressed_size"],
+            "drive_id": upload["drive_id"],
+            "profile": context["settings"].get("profile"),
+            "predicted_reduction": context.get("predicted_reduction")
+        }
+
+    def _on_uploaded(self, upload_future: Future, result: Future):
+        """Resolve a compression future once its upload finished or gave up."""
+        try:
+            upload = upload_future.result()
+            if upload["status"] != "uploaded":
+                # The compressed file stays on disk and the upload stays pending
+                # (unless it failed permanently), so nothing is recompressed
+                result.set_result({
+                    "status": "failed",
+                    "error": f"Upload failed: {upload['error']}",
+                    "upload_id": upload["upload_id"],
+                    "output_path": upload["local_path"]
+                })
+                return
+            result.set_result(self._record_upload(upload))
+        except Exception as e:
+            logger.error(f"Error recording compressed upload: {str(e)}")
+            result.set_result({"status": "failed", "error": str(e)})
+
+    def resume_uploads(self) -> int:
+        """
+        Restart uploads of compressed files left unfinished by a previous run or
+        by running out of retries; uploads already in progress are left alone.
+        
+        Completed uploads are added to the manifest and their local copies removed.
+        
+        Returns:
+            int: Number of uploads resumed
+        """
+        def on_resumed(upload_future: Future):
+            try:
+                upload = upload_future.result()
+                if upload["status"] == "uploaded":
+                    self._record_upload(upload)
+                    os.remove(upload["local_path"])
+            except Exception as e:
+                logger.error(f"Error finishing resumed upload: {str(e)}")
+
+        return len(self.uploader.resume_pending(callback=on_resumed))
+
+    def compress_pdf(
+        self,
+        input_path: str,
+        original_filename: str,
+        source_file: Optional[Dict[str, Any]] = None
+    ) -> Optional[Tuple[str, int, str]]:
+        """
+        Compress PDF file using Ghostscript and upload to Drive, waiting for the result.
+        source_file (the original Drive file) links the upload to its source in the manifest.
+        Returns tuple of (output_path, compressed_size, drive_id) or None if the file was
+        not compressed (failed or skipped).
+        """
+        outcome = self.submit_compression(input_path, original_filename, source_file).result()
+        if outcome["status"] != "compressed":
             return None
+        return outcome["output_path"], outcome["compressed_size"], outcome["drive_id"]
 
-    def verify_compression(self, original_size: int, compressed_size: int) -> bool:
-        """Verify compression resulted in smaller file size."""
+    def cancel_compression(self, future: Future) -> bool:
+        """Cancel a compression submitted with submit_compression, if it's still running."""
+        cancelled = [self.scheduler.cancel(gs_future) for gs_future in getattr(future, 'gs_futures', [])]
+        return any(cancelled)
+
+    def verify_compression(self, original_size: int, compressed_size: int, min_reduction: float = 0.0) -> bool:
+        """Verify compression resulted in a smaller file, by at least min_reduction of the original."""
         if compressed_size >= original_size:
             logger.warning("Compressed file is larger than original")
             return False
+        if compressed_size > original_size * (1 - min_reduction):
+            logger.warning(f"Compressed file is less than {min_reduction * 100:.0f}% smaller than original")
+            return False
         return True
 
     def cleanup_original(self, file_path: str, compressed_path: str):
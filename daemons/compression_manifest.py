@@ -0,0 +1,335 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional, List
+
+import connectors.google_drive as gd
+
+logger = logging.getLogger(__name__)
+
+# Drive appProperties written on every compressed upload so the manifest can be
+# rebuilt from a listing of the compressed folder alone
+SOURCE_ID_PROPERTY = 'cortexSourceId'
+SOURCE_HASH_PROPERTY = 'cortexSourceMd5'
+ORIGINAL_SIZE_PROPERTY = 'cortexOriginalSize'
+SETTINGS_PROPERTY = 'cortexSettings'
+
+def compressed_name_for(original_filename: str) -> str:
+    """Name given to the compressed copy of a file."""
+    return f"{Path(original_filename).stem}.pdf"
+
+class CompressionManifest:
+    """
+    Local index of compressed outputs, keyed by source Drive ID and content hash.
+
+    Bootstrapped once from a paginated listing of the compressed folder and kept
+    current on each upload, so "does this need compressing?" never hits the network.
+    """
+
+    def __init__(self, db_path: str = "data/compression_manifest.db"):
+        """Open (and create if needed) the manifest database."""
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._create_tables()
+
+    def _create_tables(self):
+        """Create the manifest schema if it doesn't exist."""
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS compressed_files (
+                compressed_id TEXT PRIMARY KEY,
+                compressed_name TEXT,
+                source_id TEXT,
+                source_name TEXT,
+                content_hash TEXT,
+                original_size INTEGER,
+                compressed_size INTEGER,
+                settings TEXT,
+                created_at TEXT
+            )
+            ''')
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS manifest_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+            ''')
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS skipped_files (
+                source_id TEXT PRIMARY KEY,
+                source_name TEXT,
+                content_hash TEXT,
+                reason TEXT,
+                predicted_reduction REAL,
+                actual_reduction REAL,
+                created_at TEXT
+            )
+            ''')
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS compression_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source_id TEXT,
+                source_name TEXT,
+                document_type TEXT,
+                profile TEXT,
+                candidates TEXT,
+                selected INTEGER,
+                original_size INTEGER,
+                output_size INTEGER,
+                ratio REAL,
+                elapsed REAL,
+                error TEXT,
+                created_at TEXT
+            )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_compression_runs_source_id ON compression_runs (source_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_compressed_files_source_id ON compressed_files (source_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_compressed_files_content_hash ON compressed_files (content_hash)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_compressed_files_name ON compressed_files (compressed_name)')
+            self._conn.commit()
+
+    def is_bootstrapped(self, folder_id: str) -> bool:
+        """Check whether the manifest was built from the given compressed folder."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM manifest_state WHERE key = 'bootstrapped_folder'"
+            ).fetchone()
+        return row is not None and row[0] == folder_id
+
+    def bootstrap(self, folder_id: str) -> int:
+        """
+        Rebuild the manifest from a single paginated listing of the compressed folder.
+
+        Args:
+            folder_id: ID of the compressed Google Drive folder
+
+        Returns:
+            int: Number of compressed files indexed
+        """
+        rows = []
+        fields = ('id', 'name', 'size', 'createdTime', 'appProperties')
+        for file in gd.list_folder_files(folder_id, fields=fields, order_by=None):
+            properties = file.get('appProperties', {})
+            original_size = properties.get(ORIGINAL_SIZE_PROPERTY)
+            rows.append((
+                file['id'],
+                file['name'],
+                properties.get(SOURCE_ID_PROPERTY),
+                None,
+                properties.get(SOURCE_HASH_PROPERTY),
+                int(original_size) if original_size else None,
+                int(file['size']) if file.get('size') else None,
+                properties.get(SETTINGS_PROPERTY),
+                file.get('createdTime')
+            ))
+
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("DELETE FROM compressed_files")
+            cursor.executemany('''
+            INSERT OR REPLACE INTO compressed_files (
+                compressed_id, compressed_name, source_id, source_name, content_hash,
+                original_size, compressed_size, settings, created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            cursor.execute(
+                "INSERT OR REPLACE INTO manifest_state (key, value) VALUES ('bootstrapped_folder', ?)",
+                (folder_id,)
+            )
+            self._conn.commit()
+
+        logger.info(f"Compression manifest bootstrapped with {len(rows)} files from folder {folder_id}")
+        return len(rows)
+
+    def record(
+        self,
+        compressed_id: str,
+        compressed_name: str,
+        source_id: Optional[str],
+        source_name: Optional[str],
+        content_hash: Optional[str],
+        original_size: int,
+        compressed_size: int,
+        settings: Optional[Dict[str, Any]] = None
+    ):
+        """Record a newly uploaded compressed file, replacing the copy of the source's earlier content."""
+        with self._lock:
+            if source_id and content_hash:
+                superseded = self._conn.execute(
+                    "SELECT compressed_id FROM compressed_files WHERE source_id = ? AND content_hash IS NOT ? AND compressed_id != ?",
+                    (source_id, content_hash, compressed_id)
+                ).fetchall()
+                if superseded:
+                    logger.info(f"Replacing compressed copies {', '.join(row[0] for row in superseded)} of changed source {source_id}")
+                    self._conn.executemany("DELETE FROM compressed_files WHERE compressed_id = ?", superseded)
+            self._conn.execute('''
+            INSERT OR REPLACE INTO compressed_files (
+                compressed_id, compressed_name, source_id, source_name, content_hash,
+                original_size, compressed_size, settings, created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                compressed_id,
+                compressed_name,
+                source_id,
+                source_name,
+                content_hash,
+                original_size,
+                compressed_size,
+                json.dumps(settings) if settings is not None else None,
+                datetime.now().isoformat()
+            ))
+            self._conn.commit()
+
+    def record_skip(
+        self,
+        source_id: str,
+        source_name: Optional[str],
+        content_hash: Optional[str],
+        reason: str,
+        predicted_reduction: Optional[float] = None,
+        actual_reduction: Optional[float] = None
+    ):
+        """Remember that a source file isn't worth compressing (until its content changes)."""
+        with self._lock:
+            self._conn.execute('''
+            INSERT OR REPLACE INTO skipped_files (
+                source_id, source_name, content_hash, reason,
+                predicted_reduction, actual_reduction, created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                source_id,
+                source_name,
+                content_hash,
+                reason,
+                predicted_reduction,
+                actual_reduction,
+                datetime.now().isoformat()
+            ))
+            self._conn.commit()
+
+    def record_run(
+        self,
+        source_id: Optional[str],
+        source_name: str,
+        document_type: Optional[str],
+        profile: str,
+        candidates: List[str],
+        selected: bool,
+        original_size: int,
+        output_size: Optional[int],
+        elapsed: Optional[float],
+        error: Optional[str] = None
+    ):
+        """Record one Ghostscript run: the profile decision and the ratio it achieved."""
+        ratio = 1 - output_size / original_size if output_size and original_size else None
+        with self._lock:
+            self._conn.execute('''
+            INSERT INTO compression_runs (
+                source_id, source_name, document_type, profile, candidates, selected,
+                original_size, output_size, ratio, elapsed, error, created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                source_id,
+                source_name,
+                document_type,
+                profile,
+                json.dumps(candidates),
+                int(selected),
+                original_size,
+                output_size,
+                ratio,
+                elapsed,
+                error,
+                datetime.now().isoformat()
+            ))
+            self._conn.commit()
+
+    def profile_stats(self) -> List[Dict[str, Any]]:
+        """Average achieved reduction per document type and profile, for tuning selection."""
+        with self._lock:
+            rows = self._conn.execute('''
+            SELECT document_type, profile, COUNT(*) AS runs, SUM(selected) AS selected,
+                   AVG(ratio) AS average_ratio, AVG(elapsed) AS average_elapsed
+            FROM compression_runs
+            WHERE error IS NULL
+            GROUP BY document_type, profile
+            ORDER BY document_type, profile
+            ''').fetchall()
+        return [dict(row) for row in rows]
+
+    def lookup_skip(self, source_id: str, content_hash: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Find a skip decision for a source file whose content hasn't changed since."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM skipped_files WHERE source_id = ?",
+                (source_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        if content_hash and row['content_hash'] and row['content_hash'] != content_hash:
+            return None
+        return dict(row)
+
+    def lookup(
+        self,
+        source_id: Optional[str] = None,
+        content_hash: Optional[str] = None,
+        name: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Find the compressed copy of a source file.
+
+        When the content hash is known, a copy only matches if it was made from
+        that content: by the same source file, or failing that by any file with
+        identical content. A source edited since it was compressed therefore has
+        no copy. Without a hash, the source Drive ID alone matches. Name matching
+        is only used for legacy uploads that carry no source ID or hash.
+
+        Args:
+            source_id: Drive ID of the original file
+            content_hash: MD5 checksum of the original file
+            name: Original file name
+
+        Returns:
+            Optional[Dict[str, Any]]: Manifest entry or None if not compressed yet
+        """
+        queries = []
+        if source_id and content_hash:
+            queries.append((
+                "SELECT * FROM compressed_files WHERE source_id = ? AND content_hash = ? LIMIT 1",
+                (source_id, content_hash)
+            ))
+        elif source_id:
+            queries.append(("SELECT * FROM compressed_files WHERE source_id = ? LIMIT 1", (source_id,)))
+        if content_hash:
+            queries.append(("SELECT * FROM compressed_files WHERE content_hash = ? LIMIT 1", (content_hash,)))
+        if name:
+            queries.append((
+                "SELECT * FROM compressed_files WHERE compressed_name = ? "
+                "AND source_id IS NULL AND content_hash IS NULL LIMIT 1",
+                (compressed_name_for(name),)
+            ))
+
+        with self._lock:
+            for query, params in queries:
+                row = self._conn.execute(query, params).fetchone()
+                if row is not None:
+                    return dict(row)
+        return None
+
+    def has_name(self, filename: str) -> bool:
+        """Check whether any compressed file carries the compressed name for filename."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM compressed_files WHERE compressed_name = ? LIMIT 1",
+                (compressed_name_for(filename),)
+            ).fetchone()
+        return row is not None
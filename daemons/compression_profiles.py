@@ -0,0 +1,137 @@
+import logging
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Ghostscript settings per profile. image_dpi applies to color and grayscale
+# images, mono_dpi to bilevel (scanned text) images.
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "screen": {
+        "pdf_settings": "/screen",
+        "image_dpi": 72,
+        "mono_dpi": 150,
+        "jpeg_quality": 40
+    },
+    "presentation": {
+        "pdf_settings": "/ebook",
+        "image_dpi": 100,
+        "mono_dpi": 200,
+        "jpeg_quality": 55
+    },
+    "ebook": {
+        "pdf_settings": "/ebook",
+        "image_dpi": 150,
+        "mono_dpi": 300,
+        "jpeg_quality": 75
+    },
+    "scan": {
+        "pdf_settings": "/printer",
+        "image_dpi": 200,
+        "mono_dpi": 300,
+        "jpeg_quality": 80
+    },
+    "printer": {
+        "pdf_settings": "/printer",
+        "image_dpi": 300,
+        "mono_dpi": 600,
+        "jpeg_quality": 90
+    }
+}
+
+DEFAULT_PROFILE = "ebook"
+
+# Document types whose slides or figures tolerate aggressive downsampling
+IMAGE_HEAVY_TYPES = {"presentation", "social-media", "blog-post"}
+
+# Document types that are often scans and must stay legible
+SCAN_PRONE_TYPES = {"legal-document", "equity-research-report", "technical-report"}
+
+def ghostscript_args(profile_name: str, compression_level: int) -> List[str]:
+    """
+    Build the Ghostscript options for a profile (without input/output arguments).
+
+    Args:
+        profile_name: Key of PROFILES
+        compression_level: Flate compression level (-dCompressLevel)
+
+    Returns:
+        List of command-line options
+    """
+    profile = PROFILES[profile_name]
+    dpi = profile["image_dpi"]
+    args = [
+        f'-dPDFSETTINGS={profile["pdf_settings"]}',
+        f'-dCompressLevel={compression_level}',
+        '-dDownsampleColorImages=true',
+        '-dDownsampleGrayImages=true',
+        '-dDownsampleMonoImages=true',
+        '-dColorImageDownsampleType=/Bicubic',
+        '-dGrayImageDownsampleType=/Bicubic',
+        f'-dColorImageResolution={dpi}',
+        f'-dGrayImageResolution={dpi}',
+        f'-dMonoImageResolution={profile["mono_dpi"]}',
+        # Re-encode color/gray images as JPEG at the profile's quality
+        '-dAutoFilterColorImages=false',
+        '-dAutoFilterGrayImages=false',
+        '-dColorImageFilter=/DCTEncode',
+        '-dGrayImageFilter=/DCTEncode',
+        f'-dJPEGQ={profile["jpeg_quality"]}',
+        # Embed only the glyphs used, in every profile: full fonts only add size
+        '-dSubsetFonts=true',
+        '-dEmbedAllFonts=true'
+    ]
+    return args
+
+def describe_composition(composition: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """Derive the ratios used for profile selection from analyze_pdf_composition output."""
+    if not composition or not composition.get("file_size"):
+        return {"image_fraction": 0.0, "images_per_page": 0.0, "bilevel_fraction": 0.0}
+
+    image_bytes = composition["image_bytes"]
+    by_filter = composition.get("image_bytes_by_filter", {})
+    bilevel = by_filter.get("/CCITTFaxDecode", 0) + by_filter.get("/JBIG2Decode", 0)
+    pages = composition.get("page_count") or 1
+    return {
+        "image_fraction": image_bytes / composition["file_size"],
+        "images_per_page": composition["image_count"] / pages,
+        "bilevel_fraction": bilevel / image_bytes if image_bytes else 0.0
+    }
+
+def select_profiles(
+    composition: Optional[Dict[str, Any]],
+    document_type: Optional[str] = None,
+    max_candidates: int = 1
+) -> List[str]:
+    """
+    Pick Ghostscript profiles for a document, best guess first.
+
+    Scanned documents (roughly one large image per page, or bilevel images) keep
+    legible resolutions; image-heavy decks and posts are downsampled hard; text
+    documents use the balanced ebook profile.
+
+    Args:
+        composition: Output of utils.pdf_tools.analyze_pdf_composition
+        document_type: Classification from DocumentProcessor, if known
+        max_candidates: Number of profiles to return (2 to try an alternative in parallel)
+
+    Returns:
+        List of profile names
+    """
+    ratios = describe_composition(composition)
+    image_heavy = ratios["image_fraction"] >= 0.5
+
+    if image_heavy and (ratios["bilevel_fraction"] >= 0.5 or 0.8 <= ratios["images_per_page"] <= 1.5):
+        # Looks like a scan: one page-sized image per page
+        candidates = ["scan", "ebook"] if document_type not in IMAGE_HEAVY_TYPES else ["presentation", "scan"]
+    elif document_type in IMAGE_HEAVY_TYPES:
+        candidates = ["presentation", "screen"] if image_heavy else ["presentation", "ebook"]
+    elif image_heavy:
+        candidates = ["ebook", "presentation"]
+    elif document_type in SCAN_PRONE_TYPES:
+        candidates = ["ebook", "scan"]
+    else:
+        candidates = [DEFAULT_PROFILE, "presentation"]
+
+    selected = candidates[:max(1, max_candidates)]
+    logger.info(f"Selected compression profiles {selected} for {document_type or 'unknown'} document ({ratios})")
+    return selected
@@ -0,0 +1,217 @@
+import os
+import time
+import queue
+import logging
+import itertools
+import threading
+import tempfile
+import subprocess
+from concurrent.futures import Future, CancelledError
+from typing import Dict, List, Optional, Callable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Default number of concurrent Ghostscript processes
+COMPRESSION_WORKERS = int(os.getenv('COMPRESSION_WORKERS', '0')) or os.cpu_count() or 1
+
+# Default per-job timeout in seconds
+COMPRESSION_TIMEOUT = int(os.getenv('COMPRESSION_TIMEOUT', '300'))
+
+class _Job:
+    """A queued Ghostscript invocation."""
+
+    def __init__(self, command: List[str], priority: int, timeout: float, label: str):
+        self.command = command
+        self.priority = priority
+        self.timeout = timeout
+        self.label = label
+        self.future: Future = Future()
+        self.process: Optional[subprocess.Popen] = None
+        self.cancel_requested = False
+        self.submitted_at = time.monotonic()
+
+class CompressionScheduler:
+    """
+    Runs Ghostscript jobs on a bounded pool of worker processes.
+
+    Each worker thread supervises one `gs` child process at a time, so up to
+    max_workers compressions run in parallel. Jobs wait in a priority queue
+    (smallest input first), have individual timeouts and can be cancelled while
+    queued or running. Callers get a concurrent.futures.Future.
+    """
+
+    def __init__(self, max_workers: int = COMPRESSION_WORKERS, default_timeout: float = COMPRESSION_TIMEOUT):
+        """Initialize the scheduler; worker threads start on the first submission."""
+        self.max_workers = max_workers
+        self.default_timeout = default_timeout
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._jobs: Dict[Future, _Job] = {}
+        self._lock = threading.Lock()
+        self._workers: List[threading.Thread] = []
+        self._shutdown = False
+
+    def _start_workers(self):
+        """Start the worker threads if they are not running yet."""
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.max_workers):
+                worker = threading.Thread(target=self._worker_loop, name=f"gs-worker-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            logger.info(f"Compression scheduler started with {self.max_workers} workers")
+
+    def submit(
+        self,
+        command: List[str],
+        priority: int = 0,
+        timeout: Optional[float] = None,
+        callback: Optional[Callable[[Future], None]] = None,
+        label: str = ""
+    ) -> Future:
+        """
+        Queue a Ghostscript command.
+
+        Args:
+            command: Full command line, e.g. ['gs', '-sDEVICE=pdfwrite', ...]
+            priority: Lower runs first (callers pass the input size in bytes)
+            timeout: Seconds before the process is killed (default_timeout if None)
+            callback: Called with the future once the job finishes, fails or is cancelled
+            label: Name used in log messages
+
+        Returns:
+            Future resolving to a dict with 'returncode', 'stderr', 'elapsed', 'queued'
+            and 'cpu' (user + system seconds of the gs process, None if unknown);
+            raises TimeoutError if the job timed out
+        """
+        if self._shutdown:
+            raise RuntimeError("Compression scheduler has been shut down")
+
+        job = _Job(command, priority, timeout or self.default_timeout, label)
+        if callback is not None:
+            job.future.add_done_callback(callback)
+
+        with self._lock:
+            self._jobs[job.future] = job
+        job.future.add_done_callback(self._forget)
+
+        self._queue.put((priority, next(self._sequence), job))
+        self._start_workers()
+        logger.info(f"Queued compression of {label} (priority {priority}, {self._queue.qsize()} waiting)")
+        return job.future
+
+    def cancel(self, future: Future) -> bool:
+        """
+        Cancel a queued or running job.
+
+        Returns:
+            bool: True if the job was cancelled, False if it had already finished
+        """
+        if future.cancel():
+            return True
+
+        with self._lock:
+            job = self._jobs.get(future)
+        if job is None or future.done():
+            return False
+
+        job.cancel_requested = True
+        if job.process is not None and job.process.poll() is None:
+            job.process.kill()
+            logger.info(f"Killed running compression of {job.label}")
+        return True
+
+    def pending_count(self) -> int:
+        """Number of jobs waiting for a worker."""
+        return self._queue.qsize()
+
+    def shutdown(self, cancel_pending: bool = False):
+        """Stop accepting jobs; optionally cancel everything still queued."""
+        self._shutdown = True
+        if cancel_pending:
+            with self._lock:
+                futures = list(self._jobs)
+            for future in futures:
+                self.cancel(future)
+        for _ in self._workers:
+            self._queue.put((float('inf'), next(self._sequence), None))
+
+    def _forget(self, future: Future):
+        with self._lock:
+            self._jobs.pop(future, None)
+
+    def _worker_loop(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            self._run(job)
+
+    def _wait(self, job: _Job) -> Tuple[bool, Optional[float]]:
+        """
+        Wait for the job's process, reaping it with wait4 to get its CPU time.
+        
+        Returns:
+            Tuple[bool, Optional[float]]: (exited before the timeout, user + system CPU seconds)
+        """
+        deadline = time.monotonic() + job.timeout
+        delay = 0.01
+        while True:
+            try:
+                pid, status, usage = os.wait4(job.process.pid, os.WNOHANG)
+            except ChildProcessError:
+                # Already reaped elsewhere (e.g. by poll() in cancel)
+                job.process.wait()
+                return True, None
+            if pid:
+                job.process.returncode = os.waitstatus_to_exitcode(status)
+                return True, usage.ru_utime + usage.ru_stime
+            if time.monotonic() >= deadline:
+                return False, None
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+
+    def _run(self, job: _Job):
+        """Run one job to completion, timeout or cancellation."""
+        started = time.monotonic()
+        try:
+            # stderr goes to a file so the process can't block on a full pipe while we poll it
+            with tempfile.TemporaryFile(mode='w+') as stderr_file:
+                job.process = subprocess.Popen(
+                    job.command,
+                    stdout=subprocess.DEVNULL,
+                    stderr=stderr_file,
+                    text=True
+                )
+                if job.cancel_requested:
+                    job.process.kill()
+
+                exited, cpu = self._wait(job)
+                if not exited:
+                    job.process.kill()
+                    job.process.wait()
+                    logger.error(f"Compression timed out for {job.label} after {job.timeout}s")
+                    job.future.set_exception(TimeoutError(f"Compression timed out after {job.timeout}s"))
+                    return
+
+                stderr_file.seek(0)
+                stderr = stderr_file.read()
+
+            if job.cancel_requested:
+                logger.info(f"Compression of {job.label} cancelled")
+                job.future.set_exception(CancelledError(f"Compression of {job.label} cancelled"))
+                return
+
+            job.future.set_result({
+                "returncode": job.process.returncode,
+                "stderr": stderr,
+                "elapsed": time.monotonic() - started,
+                "queued": started - job.submitted_at,
+                "cpu": cpu
+            })
+        except Exception as e:
+            logger.error(f"Error running compression of {job.label}: {str(e)}")
+            job.future.set_exception(e)
@@ -0,0 +1,222 @@
+import os
+import json
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
+
+import connectors.google_drive as gd
+
+logger = logging.getLogger(__name__)
+
+# Event types produced by the folder sync
+ADDED = "added"
+MODIFIED = "modified"
+RENAMED = "renamed"
+TRASHED = "trashed"
+REMOVED = "removed"
+
+class FolderSyncDaemon:
+    """
+    Incremental sync of the watch folder built on the Drive changes feed.
+
+    The changes-feed token and a snapshot of the folder's files are persisted in a
+    JSON state file, so each poll only fetches what changed since the previous one.
+    Events whose handling failed are kept in the state and replayed on the next poll.
+    """
+
+    def __init__(
+        self,
+        folder_id: str,
+        state_path: str = "data/drive_sync_state.json",
+        mime_type: str = "application/pdf"
+    ):
+        """Initialize the sync daemon for a Drive folder."""
+        self.folder_id = folder_id
+        self.state_path = state_path
+        self.mime_type = mime_type
+        self._lock = asyncio.Lock()
+
+    def _load_state(self) -> Dict[str, Any]:
+        """Load the persisted sync state, or an empty state if none exists."""
+        if not os.path.exists(self.state_path):
+            return {"folder_id": self.folder_id, "page_token": None, "files": {}, "failed": {}}
+
+        with open(self.state_path, 'r') as f:
+            state = json.load(f)
+
+        if state.get("folder_id") != self.folder_id:
+            logger.warning(f"Sync state at {self.state_path} belongs to another folder, starting over")
+            return {"folder_id": self.folder_id, "page_token": None, "files": {}, "failed": {}}
+        state.setdefault("failed", {})
+        return state
+
+    def _save_state(self, state: Dict[str, Any]):
+        """Persist the sync state atomically."""
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        temp_path = f"{self.state_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(temp_path, self.state_path)
+
+    def _snapshot(self, file: Dict[str, Any]) -> Dict[str, Any]:
+        """The subset of file fields used to detect modifications and renames."""
+        return {
+            "name": file.get("name"),
+            "md5Checksum": file.get("md5Checksum"),
+            "modifiedTime": file.get("modifiedTime")
+        }
+
+    def _in_folder(self, file: Dict[str, Any]) -> bool:
+        """Check whether a changed file currently belongs to the watch folder."""
+        return (
+            self.folder_id in file.get("parents", [])
+            and not file.get("trashed", False)
+            and (not self.mime_type or file.get("mimeType") == self.mime_type)
+        )
+
+    def _bootstrap(self, state: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Take the initial changes token and a full listing of the folder."""
+        # Take the token first so nothing that happens during the listing is missed
+        state["page_token"] = gd.get_start_page_token()
+        state["files"] = {}
+
+        events = []
+        for file in gd.list_folder_files(self.folder_id, fields=gd.PROCESSING_FILE_FIELDS, mime_type=self.mime_type):
+            state["files"][file["id"]] = self._snapshot(file)
+            events.append({"type": ADDED, "file": file})
+
+        logger.info(f"Bootstrapped sync of folder {self.folder_id} with {len(events)} files")
+        return events
+
+    def _events_from_changes(self, state: Dict[str, Any], changes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Turn raw changes-feed entries into pipeline events, updating the snapshot."""
+        known = state["files"]
+        events = []
+
+        for change in changes:
+            file_id = change["fileId"]
+            file = change.get("file")
+            previous = known.get(file_id)
+
+            if change.get("removed") or file is None:
+                if previous is not None:
+                    del known[file_id]
+                    events.append({"type": REMOVED, "file": {"id": file_id, **previous}})
+                continue
+
+            if not self._in_folder(file):
+                if previous is not None:
+                    del known[file_id]
+                    event_type = TRASHED if file.get("trashed") else REMOVED
+                    events.append({"type": event_type, "file": file, "previous": previous})
+                continue
+
+            current = self._snapshot(file)
+            known[file_id] = current
+
+            if previous is None:
+                events.append({"type": ADDED, "file": file})
+            elif current["md5Checksum"] != previous.get("md5Checksum"):
+                events.append({"type": MODIFIED, "file": file, "previous": previous})
+            elif current["name"] != previous.get("name"):
+                events.append({"type": RENAMED, "file": file, "previous": previous})
+
+        return events
+
+    def _with_failed(self, state: Dict[str, Any], events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Prepend the events that failed last time, merged with any newer event for the same file."""
+        latest = {event["file"]["id"]: event for event in events}
+        replayed = []
+        for file_id, failed in state["failed"].items():
+            event = latest.pop(file_id, None)
+            if event is None:
+                replayed.append(failed)
+            elif event["type"] == RENAMED and failed["type"] in (ADDED, MODIFIED):
+                # The file still has to be processed; it only has a new name now
+                replayed.append({**event, "type": failed["type"]})
+            else:
+                replayed.append(event)
+        return replayed + list(latest.values())
+
+    def collect_events(self) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Compute the events since the last sync without persisting anything.
+
+        Blocking (Drive calls); sync() runs it in an executor.
+
+        Returns:
+            Tuple of (list of events, new state to persist once events are handled)
+        """
+        state = self._load_state()
+
+        if not state.get("page_token"):
+            events = self._bootstrap(state)
+            return self._with_failed(state, events), state
+
+        changes, new_token = gd.list_changes(state["page_token"])
+        events = self._events_from_changes(state, changes)
+        state["page_token"] = new_token
+
+        logger.info(f"Sync found {len(changes)} changes, {len(events)} affecting folder {self.folder_id}")
+        if state["failed"]:
+            logger.info(f"Replaying {len(state['failed'])} events that failed in an earlier sync")
+        return self._with_failed(state, events), state
+
+    async def sync(
+        self,
+        handler: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Run one incremental sync, passing each event to the handler.
+
+        The new token is only persisted after every event has been handled, so a
+        crash mid-sync replays the same changes on the next run. Events whose
+        handler raised or returned {"status": "error"} are kept in the state and
+        replayed on the next sync.
+
+        Args:
+            handler: Async callable invoked with each event dictionary
+
+        Returns:
+            Dictionary with the events, handler results and the IDs of failed files
+        """
+        async with self._lock:
+            events, state = await asyncio.get_running_loop().run_in_executor(None, self.collect_events)
+
+            results = []
+            failed = {}
+            for event in events:
+                if handler is None:
+                    continue
+                try:
+                    result = await handler(event)
+                except Exception as e:
+                    logger.error(f"Error handling {event['type']} event for {event['file']['id']}: {str(e)}")
+                    result = {"event": event["type"], "id": event["file"]["id"], "status": "error", "error": str(e)}
+                results.append(result)
+                if isinstance(result, dict) and result.get("status") == "error":
+                    failed[event["file"]["id"]] = {"type": event["type"], "file": event["file"]}
+
+            state["failed"] = failed
+            self._save_state(state)
+            return {
+                "status": "success",
+                "event_count": len(events),
+                "events": events,
+                "results": results,
+                "failed": list(failed)
+            }
+
+    async def watch(
+        self,
+        handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+        interval: float = 5.0
+    ):
+        """Poll the changes feed forever, handling events as they arrive."""
+        logger.info(f"Watching folder {self.folder_id} every {interval}s")
+        while True:
+            try:
+                await self.sync(handler)
+            except Exception as e:
+                logger.error(f"Error during folder sync: {str(e)}")
+            await asyncio.sleep(interval)
@@ -0,0 +1,333 @@
+import os
+import time
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Iterable, AsyncIterable, AsyncIterator, Tuple, Union
+
+from utils.db_operations import get_document_from_db
+from utils.dedup import extract_text_and_signature
+
+logger = logging.getLogger(__name__)
+
+# Concurrency per ingest stage
+INGEST_DOWNLOAD_WORKERS = int(os.getenv('INGEST_DOWNLOAD_WORKERS', os.getenv('DRIVE_DOWNLOAD_WORKERS', '4')))
+INGEST_EXTRACT_WORKERS = int(os.getenv('INGEST_EXTRACT_WORKERS', '0')) or os.cpu_count() or 1
+INGEST_LLM_WORKERS = int(os.getenv('INGEST_LLM_WORKERS', '4'))
+INGEST_COMPRESS_WORKERS = int(os.getenv('INGEST_COMPRESS_WORKERS', '0')) or os.cpu_count() or 1
+
+# Items allowed to wait in front of each stage; with the worker counts this
+# bounds how many downloaded files exist on disk at once
+INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', '4'))
+
+_DONE = object()
+
+class Stage:
+    """
+    One step of a Pipeline: an async handler with its own concurrency limit and
+    a bounded input queue.
+
+    The handler receives the item dictionary and returns it (possibly updated).
+    Setting item["result"] ends the item's trip early: it skips the remaining
+    stages and is emitted as is.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        workers: int = 1,
+        queue_size: int = INGEST_QUEUE_SIZE
+    ):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.queue: Optional[asyncio.Queue] = None
+
+    def stats(self, elapsed: float) -> Dict[str, Any]:
+        """Throughput and utilization of the stage over a run of `elapsed` seconds."""
+        return {
+            "workers": self.workers,
+            "processed": self.processed,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "utilization": round(self.busy_seconds / (elapsed * self.workers), 3) if elapsed else 0.0
+        }
+
+class Pipeline:
+    """
+    Runs items through stages that all work at the same time.
+
+    Every stage pulls from its own bounded asyncio queue, so a slow stage fills
+    the queue in front of it and blocks the stages (and the source) upstream
+    instead of letting work pile up in memory or on disk. Throughput approaches
+    that of the slowest stage rather than the sum of all stage latencies.
+    """
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = stages
+        self.elapsed = 0.0
+
+    async def run(self, items: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Feed items through the stages, yielding each item's result as it completes.
+
+        Args:
+            items: Item dictionaries, as an async iterable or a (possibly lazy and
+                blocking) iterable such as a paginated Drive listing
+
+        Yields:
+            item["result"] of each item, in completion order
+        """
+        started = time.monotonic()
+        for stage in self.stages:
+            stage.queue = asyncio.Queue(maxsize=stage.queue_size)
+        output: asyncio.Queue = asyncio.Queue(maxsize=self.stages[-1].workers + self.stages[-1].queue_size)
+
+        tasks = [asyncio.create_task(self._feed(items))]
+        for index, stage in enumerate(self.stages):
+            downstream = self.stages[index + 1].queue if index + 1 < len(self.stages) else None
+            tasks.append(asyncio.create_task(self._run_stage(stage, downstream, output)))
+
+        try:
+            finished_stages = 0
+            while finished_stages < len(self.stages):
+                item = await output.get()
+                if item is _DONE:
+                    finished_stages += 1
+                    continue
+                yield item["result"]
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.elapsed = time.monotonic() - started
+
+    async def _feed(self, items: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]]):
+        first = self.stages[0]
+        # Putting blocks while the first stage is saturated, so the source is read lazily
+        if hasattr(items, '__aiter__'):
+            async for item in items:
+                await first.queue.put(item)
+        else:
+            # A lazy listing fetches its next page inside next(), so that runs on a
+            # thread of its own rather than on the event loop
+            loop = asyncio.get_running_loop()
+            iterator = iter(items)
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="pipeline-source") as source:
+                while True:
+                    item = await loop.run_in_executor(source, next, iterator, _DONE)
+                    if item is _DONE:
+                        break
+                    await first.queue.put(item)
+        for _ in range(first.workers):
+            await first.queue.put(_DONE)
+
+    async def _run_stage(self, stage: Stage, downstream: Optional[asyncio.Queue], output: asyncio.Queue):
+        async def worker():
+            while True:
+                item = await stage.queue.get()
+                if item is _DONE:
+                    return
+                started = time.monotonic()
+                try:
+                    item = await stage.handler(item)
+                except Exception as e:
+                    logger.error(f"Stage {stage.name} failed for {item.get('name')}: {str(e)}")
+                    item["result"] = {"status": "error", "file": item.get("name"), "error": str(e)}
+                stage.busy_seconds += time.monotonic() - started
+                stage.processed += 1
+
+                if item.get("result") is not None or downstream is None:
+                    await output.put(item)
+                else:
+                    await downstream.put(item)
+
+        await asyncio.gather(*(worker() for _ in range(stage.workers)))
+
+        # Let the next stage's workers finish once everything upstream is done
+        if downstream is not None:
+            next_workers = self.stages[self.stages.index(stage) + 1].workers
+            for _ in range(next_workers):
+                await downstream.put(_DONE)
+        await output.put(_DONE)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-stage statistics of the last run."""
+        return {
+            "elapsed_seconds": round(self.elapsed, 3),
+            "stages": {stage.name: stage.stats(self.elapsed) for stage in self.stages}
+        }
+
+def apply_compression_outcome(file: Dict[str, Any], result: Dict[str, Any], original_size: int, outcome: Dict[str, Any]):
+    """Add the outcome of CompressionDaemon.submit_compression to a processing result."""
+    if outcome["status"] == "compressed":
+        compressed_size = outcome["compressed_size"]
+        drive_id = outcome["drive_id"]
+        logger.info(f"Compression successful - Drive ID: {drive_id}")
+
+        # Add compression info to result
+        if isinstance(result["file"], dict):
+            result["file"].update({
+                "original_size": original_size,
+                "compressed_size": compressed_size,
+                "compressed_file_id": drive_id,
+                "compression_ratio": f"{(1 - compressed_size/original_size) * 100:.1f}%",
+                "compression_profile": outcome["profile"]
+            })
+
+        _remove_file(outcome["output_path"], f"compressed file for {file['name']}")
+    elif outcome["status"] == "skipped":
+        logger.info(f"Compression skipped for {file['name']}: {outcome['reason']}")
+        if isinstance(result["file"], dict):
+            result["file"]["compression_skipped"] = outcome["reason"]
+    else:
+        logger.error(f"Compression failed for {file['name']}: {outcome.get('error')}")
+
+def _remove_file(path: Optional[str], description: str):
+    """Remove a local file, logging rather than raising on failure."""
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+            logger.info(f"Cleaned up {description}: {path}")
+        except Exception as e:
+            logger.error(f"Error cleaning up temp file: {str(e)}")
+
+class IngestPipeline:
+    """
+    Folder ingest as a pipeline: download -> extract -> analyze -> compress.
+
+    Downloads run on I/O threads; text extraction (pure-Python pypdf and
+    MinHash, which threads can't run in parallel under the GIL) on a pool of
+    worker processes, with the disk writes and duplicate checks around it on
+    threads; Gemini analysis as concurrent async calls (INGEST_LLM_WORKERS
+    bounds the requests in flight); and compression plus upload through the
+    compression daemon's Ghostscript scheduler and upload manager.
+    """
+
+    def __init__(
+        self,
+        document_processor,
+        compression_daemon,
+        download_workers: int = INGEST_DOWNLOAD_WORKERS,
+        extract_workers: int = INGEST_EXTRACT_WORKERS,
+        llm_workers: int = INGEST_LLM_WORKERS,
+        compress_workers: int = INGEST_COMPRESS_WORKERS,
+        queue_size: int = INGEST_QUEUE_SIZE
+    ):
+        """Initialize the ingest pipeline around the existing processing components."""
+        self.document_processor = document_processor
+        self.compression_daemon = compression_daemon
+        self.download_workers = download_workers
+        self.extract_workers = extract_workers
+        self.llm_workers = llm_workers
+        self.compress_workers = compress_workers
+        self.queue_size = queue_size
+        self._download_executor = ThreadPoolExecutor(max_workers=download_workers, thread_name_prefix="ingest-download")
+        self._extract_executor = ThreadPoolExecutor(max_workers=extract_workers, thread_name_prefix="ingest-extract")
+        # Worker processes start on first use; spawned, since forking a process running threads can deadlock
+        self._extract_processes = ProcessPoolExecutor(max_workers=extract_workers, mp_context=multiprocessing.get_context("spawn"))
+        self.last_stats: Optional[Dict[str, Any]] = None
+
+    def _build(self) -> Pipeline:
+        return Pipeline([
+            Stage("download", self._download, self.download_workers, self.queue_size),
+            Stage("extract", self._extract, self.extract_workers, self.queue_size),
+            Stage("analyze", self._analyze, self.llm_workers, self.queue_size),
+            Stage("compress", self._compress, self.compress_workers, self.queue_size)
+        ])
+
+    async def run(self, files: Iterable[Dict[str, Any]], reprocess: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process Drive files through the pipeline.
+
+        Args:
+            files: Drive file dictionaries (may be a streaming listing)
+            reprocess: Re-analyze files that are already in the database
+
+        Yields:
+            Processing result of each file (as returned by process_drive_file), in completion order
+        """
+        pipeline = self._build()
+        items = ({"file": file, "name": file.get('name'), "reprocess": reprocess} for file in files)
+        try:
+            async for result in pipeline.run(items):
+                yield result
+        finally:
+            self.last_stats = pipeline.stats()
+            logger.info(f"Ingest pipeline finished: {self.last_stats}")
+
+    async def _download(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        file = item["file"]
+        loop = asyncio.get_running_loop()
+
+        duplicate = await loop.run_in_executor(
+            self._download_executor, self.document_processor.find_duplicate_before_download, file, item["reprocess"]
+        )
+        if duplicate:
+            item["result"] = duplicate
+            return item
+
+        item["needs_compression"] = await loop.run_in_executor(
+            self._download_executor, self.compression_daemon.needs_compression, file
+        )
+        item["download"] = await loop.run_in_executor(
+            self._download_executor, self.document_processor.downloader.download, file, False
+        )
+        return item
+
+    def _extract_in_process(self, pdf_path: str) -> Tuple[str, Optional[List[int]]]:
+        """Text and MinHash signature of a PDF, computed in a worker process."""
+        return self._extract_processes.submit(extract_text_and_signature, pdf_path).result()
+
+    async def _extract(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        prepared = await asyncio.get_running_loop().run_in_executor(
+            self._extract_executor,
+            self.document_processor.prepare_document, item["file"], item["download"], item["reprocess"], self._extract_in_process
+        )
+        if prepared["status"] == "ready":
+            item["prepared"] = prepared
+        else:
+            item["processed"] = prepared
+            if prepared["status"] != "skipped" or not item["needs_compression"]:
+                self._finish(item)
+        return item
+
+    async def _analyze(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        if "prepared" in item:
+            item["processed"] = await self.document_processor.analyze_prepared(item["file"], item.pop("prepared"))
+            logger.info(f"Document processing complete for {item['name']}")
+            if item["processed"]["status"] != "success" or not item["needs_compression"]:
+                self._finish(item)
+        return item
+
+    async def _compress(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        file = item["file"]
+        result = item["processed"]
+        temp_path = result.get("temp")
+        try:
+            original_size = os.path.getsize(temp_path)
+            document_type = result["file"].get("document_type") if isinstance(result["file"], dict) else None
+            if document_type is None:
+                existing = get_document_from_db(file['id'])
+                document_type = existing.get("document_type") if existing else None
+            # Submitting parses the PDF to pick a profile, which would stall the other stages
+            compression = await asyncio.get_running_loop().run_in_executor(None, lambda: self.compression_daemon.submit_compression(
+                temp_path, file['name'], source_file=file, document_type=document_type
+            ))
+            outcome = await asyncio.wrap_future(compression)
+            apply_compression_outcome(file, result, original_size, outcome)
+        except Exception as e:
+            logger.error(f"Error during compression process: {str(e)}")
+        finally:
+            self._finish(item)
+        return item
+
+    def _finish(self, item: Dict[str, Any]):
+        """Release the item's temp file and mark its result final."""
+        result = item["processed"]
+        _remove_file(result.get("temp"), f"temp file for {item['name']}")
+        item["result"] = result
@@ -0,0 +1,382 @@
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Number of tasks processed concurrently
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+
+# Attempts per task before it is marked failed
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+
+# Base delay in seconds for exponential backoff between attempts
+JOB_RETRY_BACKOFF = float(os.getenv('JOB_RETRY_BACKOFF', '5'))
+
+# Job and task states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+SKIPPED = "skipped"
+COMPLETED = "completed"
+COMPLETED_WITH_ERRORS = "completed_with_errors"
+
+TERMINAL_TASK_STATES = (SUCCEEDED, FAILED, SKIPPED)
+
+class TaskError(Exception):
+    """Raised by task handlers for failures that should be retried."""
+
+class JobQueue:
+    """
+    Durable SQLite-backed queue of jobs made of per-file tasks.
+
+    Jobs and tasks are written to disk before any work starts, so a crash loses
+    nothing: tasks that were running are re-queued when the queue starts again.
+    Workers run in the application's event loop and call the async handler
+    registered for each job kind. Failed tasks are retried with exponential
+    backoff; idempotency keys stop the same job or file from being queued twice.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "data/jobs.db",
+        max_workers: int = JOB_WORKERS,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        retry_backoff: float = JOB_RETRY_BACKOFF,
+        poll_interval: float = 1.0
+    ):
+        """Open (and create if needed) the job database."""
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.poll_interval = poll_interval
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {}
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._create_tables()
+
+    def _create_tables(self):
+        """Create the queue schema if it doesn't exist."""
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT,
+                params TEXT,
+                idempotency_key TEXT UNIQUE,
+                status TEXT,
+                total_tasks INTEGER,
+                created_at TEXT,
+                updated_at TEXT,
+                finished_at TEXT
+            )
+            ''')
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT,
+                idempotency_key TEXT,
+                label TEXT,
+                payload TEXT,
+                status TEXT,
+                attempts INTEGER DEFAULT 0,
+                available_at REAL,
+                result TEXT,
+                error TEXT,
+                created_at TEXT,
+                updated_at TEXT
+            )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_job_id ON tasks (job_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, available_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_idempotency_key ON tasks (idempotency_key)')
+            self._conn.commit()
+
+    def register(self, kind: str, handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]):
+        """
+        Register the async handler that runs the tasks of a job kind.
+
+        The handler receives the task payload and returns a JSON-serializable
+        result; raising (e.g. TaskError) makes the task retry.
+        """
+        self._handlers[kind] = handler
+
+    def enqueue(
+        self,
+        kind: str,
+        tasks: Iterable[Dict[str, Any]],
+        params: Optional[Dict[str, Any]] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Create a job with one task per payload.
+
+        Each task dict has a "payload" and optionally a "label" and an
+        "idempotency_key"; a task whose key already succeeded or is still pending
+        in another job is recorded as skipped.
+
+        Args:
+            kind: Job kind, selecting the registered handler
+            tasks: Task dictionaries; an iterable is read completely before the
+                database lock is taken, so callers on the event loop should pass a
+                list built off the loop rather than a streaming listing
+            params: Parameters of the job, stored for reference
+            idempotency_key: Returns the existing job instead of creating a new one
+
+        Returns:
+            Dict with job_id, task_count and "created" (False for an existing job)
+        """
+        tasks = list(tasks)
+        now = datetime.now().isoformat()
+        with self._lock:
+            if idempotency_key:
+                row = self._conn.execute(
+                    "SELECT job_id, total_tasks FROM jobs WHERE idempotency_key = ?",
+                    (idempotency_key,)
+                ).fetchone()
+                if row:
+                    return {"job_id": row["job_id"], "task_count": row["total_tasks"], "created": False}
+
+            job_id = uuid.uuid4().hex
+            cursor = self._conn.cursor()
+            cursor.execute('''
+            INSERT INTO jobs (job_id, kind, params, idempotency_key, status, total_tasks, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, 0, ?, ?)
+            ''', (job_id, kind, json.dumps(params or {}), idempotency_key, QUEUED, now, now))
+
+            count = 0
+            for task in tasks:
+                key = task.get("idempotency_key")
+                status, result = QUEUED, None
+                if key:
+                    existing = cursor.execute(
+                        "SELECT job_id, task_id, status FROM tasks WHERE idempotency_key = ? "
+                        "AND status IN (?, ?, ?) LIMIT 1",
+                        (key, QUEUED, RUNNING, SUCCEEDED)
+                    ).fetchone()
+                    if existing:
+                        status = SKIPPED
+                        result = json.dumps({"duplicate_of": {"job_id": existing["job_id"], "task_id": existing["task_id"]}})
+                cursor.execute('''
+                INSERT INTO tasks (job_id, idempotency_key, label, payload, status, available_at, result, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (job_id, key, task.get("label"), json.dumps(task["payload"]), status, time.time(), result, now, now))
+                count += 1
+
+            cursor.execute("UPDATE jobs SET total_tasks = ? WHERE job_id = ?", (count, job_id))
+            self._conn.commit()
+
+        self._refresh_job(job_id)
+        logger.info(f"Queued {kind} job {job_id} with {count} tasks")
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return {"job_id": job_id, "task_count": count, "created": True}
+
+    def recover(self) -> int:
+        """Re-queue tasks left running by a previous process; returns how many."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE tasks SET status = ?, available_at = ?, updated_at = ? WHERE status = ?",
+                (QUEUED, time.time(), datetime.now().isoformat(), RUNNING)
+            )
+            self._conn.commit()
+            recovered = cursor.rowcount
+        if recovered:
+            logger.info(f"Recovered {recovered} interrupted tasks")
+        return recovered
+
+    def start(self):
+        """Recover interrupted work and start the workers in the running event loop."""
+        if self._workers:
+            return
+        self.recover()
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker_loop(i)) for i in range(self.max_workers)]
+        logger.info(f"Job queue started with {self.max_workers} workers")
+
+    async def stop(self):
+        """Stop the workers; running tasks are re-queued on the next start."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """Mark the next available task as running and return it."""
+        with self._lock:
+            row = self._conn.execute('''
+            SELECT t.*, j.kind FROM tasks t JOIN jobs j ON j.job_id = t.job_id
+            WHERE t.status = ? AND t.available_at <= ?
+            ORDER BY t.available_at, t.task_id
+            LIMIT 1
+            ''', (QUEUED, time.time())).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE tasks SET status = ?, attempts = attempts + 1, updated_at = ? WHERE task_id = ?",
+                (RUNNING, datetime.now().isoformat(), row["task_id"])
+            )
+            self._conn.commit()
+        task = dict(row)
+        task["attempts"] += 1
+        task["payload"] = json.loads(task["payload"])
+        return task
+
+    async def _worker_loop(self, index: int):
+        while True:
+            task = self._claim()
+            if task is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(task)
+
+    async def _run(self, task: Dict[str, Any]):
+        """Run one task and record its outcome, scheduling a retry on failure."""
+        handler = self._handlers.get(task["kind"])
+        label = task["label"] or task["task_id"]
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler registered for job kind {task['kind']}")
+            result = await handler(task["payload"])
+            self._finish(task, SUCCEEDED, result=result)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if task["attempts"] < self.max_attempts:
+                delay = self.retry_backoff * 2 ** (task["attempts"] - 1) * random.uniform(0.5, 1.5)
+                logger.warning(f"Task {label} failed (attempt {task['attempts']}/{self.max_attempts}), retrying in {delay:.1f}s: {str(e)}")
+                self._finish(task, QUEUED, error=str(e), available_at=time.time() + delay)
+            else:
+                logger.error(f"Task {label} failed after {task['attempts']} attempts: {str(e)}")
+                self._finish(task, FAILED, error=str(e))
+
+    def _finish(
+        self,
+        task: Dict[str, Any],
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+        available_at: Optional[float] = None
+    ):
+        with self._lock:
+            self._conn.execute('''
+            UPDATE tasks SET status = ?, result = ?, error = ?, available_at = COALESCE(?, available_at), updated_at = ?
+            WHERE task_id = ?
+            ''', (
+                status,
+                json.dumps(result) if result is not None else None,
+                error,
+                available_at,
+                datetime.now().isoformat(),
+                task["task_id"]
+            ))
+            self._conn.commit()
+        self._refresh_job(task["job_id"])
+
+    def _refresh_job(self, job_id: str):
+        """Derive a job's status from its tasks."""
+        counts = self._task_counts(job_id)
+        total = sum(counts.values())
+        done = sum(counts.get(state, 0) for state in TERMINAL_TASK_STATES)
+        if done == total:
+            status = COMPLETED_WITH_ERRORS if counts.get(FAILED) else COMPLETED
+        elif counts.get(RUNNING) or done:
+            status = RUNNING
+        else:
+            status = QUEUED
+
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, finished_at = ? WHERE job_id = ?",
+                (status, now, now if done == total else None, job_id)
+            )
+            self._conn.commit()
+
+    def _task_counts(self, job_id: str) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM tasks WHERE job_id = ? GROUP BY status",
+                (job_id,)
+            ).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a job's status and task counts.
+
+        Returns:
+            Optional[Dict[str, Any]]: Job dictionary or None if the job doesn't exist
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"] or '{}')
+        job["tasks"] = self._task_counts(job_id)
+        return job
+
+    def get_progress(self, job_id: str, status: Optional[str] = None, limit: int = 100) -> Optional[Dict[str, Any]]:
+        """
+        Get a job with its per-task results.
+
+        Args:
+            job_id: Job to report on
+            status: Only include tasks in this state
+            limit: Maximum number of tasks returned
+
+        Returns:
+            Optional[Dict[str, Any]]: Job dictionary with a "progress" fraction and
+            "task_results", or None if the job doesn't exist
+        """
+        job = self.get_job(job_id)
+        if job is None:
+            return None
+
+        query = "SELECT task_id, label, status, attempts, result, error, updated_at FROM tasks WHERE job_id = ?"
+        params: List[Any] = [job_id]
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        query += " ORDER BY task_id LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        done = sum(job["tasks"].get(state, 0) for state in TERMINAL_TASK_STATES)
+        job["progress"] = done / job["total_tasks"] if job["total_tasks"] else 1.0
+        job["task_results"] = [
+            {**dict(row), "result": json.loads(row["result"]) if row["result"] else None}
+            for row in rows
+        ]
+        return job
+
+    def list_jobs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent jobs, newest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id FROM jobs ORDER BY created_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [self.get_job(row[0]) for row in rows]
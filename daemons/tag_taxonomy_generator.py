@@ -6,6 +6,8 @@ from pathlib import Path
 import logging
 from datetime import datetime
 
+from utils.tag_canonicalization import canonicalize_tags, load_tag_aliases
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -19,6 +21,14 @@ def load_processed_files():
         logger.error(f"Error loading processed_files.json: {e}")
         return {}
 
+def canonicalize_file_tags(processed_files, db_path="data/documents.db"):
+    """Normalize each file's tags and apply the document store's tag aliases, so variants count as one tag"""
+    aliases = load_tag_aliases(db_path)
+    for file_data in processed_files.values():
+        if "tags" in file_data:
+            file_data["tags"] = canonicalize_tags(file_data["tags"], aliases)
+    return processed_files
+
 def extract_all_tags(processed_files):
     """Extract all tags from the processed files"""
     all_tags = []
@@ -161,6 +171,8 @@ def main():
         logger.error("No processed files found. Exiting.")
         return
     
+    processed_files = canonicalize_file_tags(processed_files)
+    
     # Extract and analyze tags
     all_tags = extract_all_tags(processed_files)
     logger.info(f"Extracted {len(all_tags)} tags in total")
@@ -1,14 +1,29 @@
+import time
+
+# Measured from the first line so the startup report covers every import below
+_import_started = time.perf_counter()
+
 import os
+import asyncio
 import logging
 import json
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
-from googleapiclient.http import MediaIoBaseDownload
 
 from agents.document_processor import DocumentProcessor
 from daemons.compression_daemon import CompressionDaemon
 import connectors.google_drive as gd
 from agents.content_tagger import ContentTagger
+import daemons.folder_sync as folder_sync
+from daemons.job_queue import JobQueue, TaskError
+from daemons.ingest_pipeline import IngestPipeline, apply_compression_outcome
+from utils.db_operations import get_document_from_db, save_document_to_db
+from utils.streaming import MEDIA_TYPES, progress_events, stream_events
+from utils.metrics import get_metrics_recorder
+from utils.startup import lazy, record_phase, startup_report
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -22,12 +37,9 @@ GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 WATCH_FOLDER_ID = os.getenv('WATCH_FOLDER_ID')
 COMPRESSED_FOLDER_ID = os.getenv('COMPRESSED_FOLDER_ID')
 
-# Initialize FastAPI
-app = FastAPI(
-    title="Cortex Research Processor",
-    description="AI-powered research document processing and analysis system",
-    version="1.0.0"
-)
+# "lazy" builds the Gemini, Drive and Ghostscript components on first use;
+# "eager" builds them all before the server accepts requests
+STARTUP_MODE = os.getenv('STARTUP_MODE', 'lazy')
 
 # Validate required environment variables
 required_vars = [
@@ -43,105 +55,195 @@ for var_name, error_msg in required_vars:
     if not os.getenv(var_name):
         raise ValueError(error_msg)
 
-# Initialize core components
-document_processor = DocumentProcessor(api_key=GEMINI_API_KEY)
-compression_daemon = CompressionDaemon(
-    compression_level=int(os.getenv('COMPRESSION_LEVEL', '3')),
-    compressed_folder_id=COMPRESSED_FOLDER_ID
+# Seconds between retries of compressed uploads left pending (interrupted or out of retries)
+UPLOAD_RESUME_INTERVAL = int(os.getenv('DRIVE_UPLOAD_RESUME_INTERVAL', '300'))
+
+# Seconds between polls of the watch folder's changes feed (0 = only sync on /api/sync-folder)
+FOLDER_SYNC_INTERVAL = float(os.getenv('FOLDER_SYNC_INTERVAL', '0'))
+
+if STARTUP_MODE not in ('lazy', 'eager'):
+    raise ValueError("STARTUP_MODE must be 'lazy' or 'eager'")
+
+# Core components, each created on first use (or at startup in eager mode)
+@lazy
+def get_document_processor() -> DocumentProcessor:
+    return DocumentProcessor(api_key=GEMINI_API_KEY)
+
+@lazy
+def get_compression_daemon() -> CompressionDaemon:
+    return CompressionDaemon(
+        compression_level=int(os.getenv('COMPRESSION_LEVEL', '3')),
+        compressed_folder_id=COMPRESSED_FOLDER_ID
+    )
+
+@lazy
+def get_content_tagger() -> ContentTagger:
+    return ContentTagger(api_key=GEMINI_API_KEY)
+
+@lazy
+def get_folder_sync_daemon() -> folder_sync.FolderSyncDaemon:
+    return folder_sync.FolderSyncDaemon(WATCH_FOLDER_ID)
+
+@lazy
+def get_job_queue() -> JobQueue:
+    job_queue = JobQueue()
+    job_queue.register("process-folder", run_process_file_task)
+    return job_queue
+
+@lazy
+def get_ingest_pipeline() -> IngestPipeline:
+    return IngestPipeline(get_document_processor(), get_compression_daemon())
+
+COMPONENTS = (
+    get_document_processor,
+    get_compression_daemon,
+    get_content_tagger,
+    get_folder_sync_daemon,
+    get_job_queue,
+    get_ingest_pipeline
 )
-content_tagger = ContentTagger(api_key=GEMINI_API_KEY)
+
+def resume_compressed_uploads():
+    """Finish uploads of compressed files interrupted by a previous shutdown or left pending after failed retries."""
+    try:
+        resumed = get_compression_daemon().resume_uploads()
+        if resumed:
+            logger.info(f"Resumed {resumed} pending compressed uploads")
+    except Exception as e:
+        logger.error(f"Error resuming compressed uploads: {str(e)}")
+
+async def resume_compressed_uploads_periodically():
+    """Retry pending compressed uploads at startup and then every UPLOAD_RESUME_INTERVAL seconds."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await loop.run_in_executor(None, resume_compressed_uploads)
+        await asyncio.sleep(UPLOAD_RESUME_INTERVAL)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the job queue, the upload retries and the folder watch; stop them on shutdown."""
+    started = time.perf_counter()
+    if STARTUP_MODE == 'eager':
+        for get_component in COMPONENTS:
+            get_component()
+    
+    # Re-queues tasks interrupted by a crash; only touches the local job database
+    get_job_queue().start()
+    
+    # Resuming needs Ghostscript and Drive, so it runs off the startup path
+    background = [asyncio.create_task(resume_compressed_uploads_periodically())]
+    if FOLDER_SYNC_INTERVAL > 0:
+        background.append(asyncio.create_task(get_folder_sync_daemon().watch(handle_sync_event, FOLDER_SYNC_INTERVAL)))
+    record_phase("lifespan", time.perf_counter() - started)
+    
+    yield
+    
+    await get_job_queue().stop()
+    for task in background:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+# Initialize FastAPI
+app = FastAPI(
+    title="Cortex Research Processor",
+    description="AI-powered research document processing and analysis system",
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+def remove_temp_file(path, description):
+    """Remove a temporary file, logging rather than raising on failure."""
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+            logger.info(f"Cleaned up {description}: {path}")
+        except Exception as e:
+            logger.error(f"Error cleaning up temp file: {str(e)}")
+
+async def finish_compression(file, result, temp_path, original_size, compression):
+    """Wait for a background compression and add its outcome to the processing result."""
+    try:
+        outcome = await asyncio.wrap_future(compression)
+        apply_compression_outcome(file, result, original_size, outcome)
+    except Exception as e:
+        logger.error(f"Error during compression process: {str(e)}")
+    finally:
+        remove_temp_file(temp_path, f"temp file for {file['name']}")
+
+async def start_drive_file(file, reprocess: bool = False, download=None):
+    """
+    Analyze a Drive file and queue its compression if no compressed copy exists yet.
+    
+    Returns the processing result and, when compressing, an asyncio task that
+    completes the result once the compressed copy is uploaded.
+    """
+    # First check the local manifest for an existing compressed copy; the first
+    # check lists the compressed folder on Drive, so it runs off the event loop
+    needs_compression = await asyncio.get_running_loop().run_in_executor(None, get_compression_daemon().needs_compression, file)
+    if needs_compression:
+        logger.info(f"No compressed version found for {file['name']}, will compress")
+    
+    # Process the document (this will always download the file)
+    result = await get_document_processor().process_file(file, reprocess=reprocess, download=download)
+    logger.info(f"Document processing complete for {file['name']}")
+    
+    temp_path = result.get("temp")
+    if not temp_path or not os.path.exists(temp_path):
+        if temp_path:
+            logger.error(f"Temp file not found: {temp_path}")
+        return result, None
+    
+    if not needs_compression:
+        # Clean up temp file if we didn't need to compress
+        remove_temp_file(temp_path, f"temp file for already compressed document {file['name']}")
+        return result, None
+    
+    try:
+        original_size = os.path.getsize(temp_path)
+        document_type = result["file"].get("document_type") if isinstance(result["file"], dict) else None
+        if document_type is None:
+            existing = get_document_from_db(file['id'])
+            document_type = existing.get("document_type") if existing else None
+        # Submitting parses the PDF to pick a profile, so it runs off the event loop
+        compression = await asyncio.get_running_loop().run_in_executor(None, lambda: get_compression_daemon().submit_compression(
+            temp_path, file['name'], source_file=file, document_type=document_type
+        ))
+        return result, asyncio.ensure_future(
+            finish_compression(file, result, temp_path, original_size, compression)
+        )
+    except Exception as e:
+        logger.error(f"Error during compression process: {str(e)}")
+        remove_temp_file(temp_path, "temp file after error")
+        return result, None
+
+async def process_drive_file(file, reprocess: bool = False, download=None):
+    """Analyze a Drive file and store a compressed copy if one doesn't exist yet."""
+    result, compression = await start_drive_file(file, reprocess=reprocess, download=download)
+    if compression is not None:
+        await compression
+    return result
 
 @app.get("/api/process-folder")
 async def process_folder():
     """Process all PDF files in the watched folder."""
     try:
-        service = gd.get_drive_service()
-        logger.info("Connected to Drive service")
+        # Stream the folder listing page by page; files enter the pipeline as they arrive
+        files = gd.list_folder_files(WATCH_FOLDER_ID, fields=gd.PROCESSING_FILE_FIELDS)
         
-        # List all files in the folder
-        results = service.files().list(
-            q=f"'{WATCH_FOLDER_ID}' in parents and mimeType='application/pdf'",
-            fields="files(id, name, webViewLink, createdTime)",
-            orderBy="createdTime desc"
-        ).execute()
+        # Download, extraction, analysis and compression of different files overlap
+        processed_results = [result async for result in get_ingest_pipeline().run(files)]
         
-        files = results.get('files', [])
-        if not files:
+        if not processed_results:
             return {"status": "success", "message": "No PDF files found"}
         
-        logger.info(f"Found {len(files)} PDF files to process")
-        
-        # Process all files
-        processed_results = []
-        for file in files:
-            # First check if file needs compression
-            if compression_daemon.is_already_compressed(file['name']):
-                logger.info(f"Compressed version already exists for {file['name']}")
-                needs_compression = False
-            else:
-                logger.info(f"No compressed version found for {file['name']}, will compress")
-                needs_compression = True
-            
-            # Process the document (this will always download the file)
-            result = await document_processor.process_file(file)
-            logger.info(f"Document processing complete for {file['name']}")
-            
-            try:
-                # Handle compression if needed
-                if needs_compression and "temp" in result:
-                    temp_path = result["temp"]
-                    if os.path.exists(temp_path):
-                        original_size = os.path.getsize(temp_path)
-                        compressed = compression_daemon.compress_pdf(temp_path, file['name'])
-                        
-                        if compressed:
-                            compressed_path, compressed_size, drive_id = compressed
-                            logger.info(f"Compression successful - Drive ID: {drive_id}")
-                            
-                            # Add compression info to result
-                            if isinstance(result["file"], dict):
-                                result["file"].update({
-                                    "original_size": original_size,
-                                    "compressed_size": compressed_size,
-                                    "compressed_file_id": drive_id,
-                                    "compression_ratio": f"{(1 - compressed_size/original_size) * 100:.1f}%"
-                                })
-                            
-                            # Clean up temp files
-                            try:
-                                os.remove(temp_path)
-                                os.remove(compressed_path)
-                                logger.info(f"Cleaned up temporary files for {file['name']}")
-                            except Exception as e:
-                                logger.error(f"Error cleaning up temp files: {str(e)}")
-                        else:
-                            logger.error(f"Compression failed for {file['name']}")
-                    else:
-                        logger.error(f"Temp file not found: {temp_path}")
-                else:
-                    # Clean up temp file if we didn't need to compress
-                    if "temp" in result and os.path.exists(result["temp"]):
-                        try:
-                            os.remove(result["temp"])
-                            logger.info(f"Cleaned up temp file for already compressed document: {file['name']}")
-                        except Exception as e:
-                            logger.error(f"Error cleaning up temp file: {str(e)}")
-                
-            except Exception as e:
-                logger.error(f"Error during compression process: {str(e)}")
-                # Ensure temp file cleanup on error
-                if "temp" in result and os.path.exists(result["temp"]):
-                    try:
-                        os.remove(result["temp"])
-                        logger.info(f"Cleaned up temp file after error: {result['temp']}")
-                    except Exception as cleanup_error:
-                        logger.error(f"Error cleaning up temp file: {str(cleanup_error)}")
-            
-            processed_results.append(result)
-        
+        logger.info(f"Processed {len(processed_results)} PDF files")
         return {
             "status": "success",
             "processed_count": len(processed_results),
+            "pipeline": get_ingest_pipeline().last_stats,
             "results": processed_results
         }
         
@@ -149,90 +251,256 @@ async def process_folder():
         logger.error(f"Error processing folder: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def summarize_result(result):
+    """Compact view of a processing result, without the full analysis."""
+    file = result.get("file")
+    summary = {"status": result.get("status")}
+    if isinstance(file, dict):
+        summary.update({
+            "id": file.get("id"),
+            "name": file.get("name"),
+            "title": file.get("title"),
+            "document_type": file.get("document_type"),
+            "compressed_file_id": file.get("compressed_file_id")
+        })
+    else:
+        summary["name"] = file
+    for key in ("canonical_id", "match_type", "error"):
+        if key in result:
+            summary[key] = result[key]
+    return summary
+
+def stream_results(results, stream_format: str, summarize=None, is_success=None):
+    """Stream per-document results as SSE or NDJSON progress events."""
+    if stream_format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(MEDIA_TYPES)}")
+    return stream_events(progress_events(results, summarize, is_success), stream_format)
+
+@app.get("/api/process-folder/stream")
+async def process_folder_stream(format: str = "sse", summary: bool = False):
+    """Process all PDF files in the watched folder, streaming each result as it completes."""
+    files = gd.list_folder_files(WATCH_FOLDER_ID, fields=gd.PROCESSING_FILE_FIELDS)
+    return stream_results(
+        get_ingest_pipeline().run(files),
+        format,
+        summarize=summarize_result if summary else None,
+        is_success=lambda result: result.get("status") != "error"
+    )
+
+async def run_process_file_task(payload):
+    """Job queue handler: process one Drive file and return a compact result."""
+    result = await process_drive_file(payload["file"], reprocess=payload.get("reprocess", False))
+    if result.get("status") == "error":
+        raise TaskError(result.get("error"))
+    return summarize_result(result)
+
+@app.get("/api/jobs/process-folder")
+async def enqueue_process_folder(reprocess: bool = False, idempotency_key: str = None):
+    """Queue every PDF in the watched folder for background processing and return the job ID."""
+    try:
+        # The listing fetches its pages from Drive, so it runs off the event loop
+        files = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: list(gd.list_folder_files(WATCH_FOLDER_ID, fields=gd.PROCESSING_FILE_FIELDS))
+        )
+        tasks = [
+            {
+                "label": file["name"],
+                "payload": {"file": file, "reprocess": reprocess},
+                # The same file content is only queued once, unless reprocessing
+                "idempotency_key": None if reprocess else f"process-file:{file['id']}:{file.get('md5Checksum', '')}"
+            }
+            for file in files
+        ]
+        job = get_job_queue().enqueue(
+            "process-folder",
+            tasks,
+            params={"folder_id": WATCH_FOLDER_ID, "reprocess": reprocess},
+            idempotency_key=idempotency_key
+        )
+        return {"status": "queued" if job["created"] else "existing", **job}
+    except Exception as e:
+        logger.error(f"Error queuing folder processing: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/jobs")
+async def list_jobs(limit: int = 20):
+    """List the most recent background jobs."""
+    return {"status": "success", "jobs": get_job_queue().list_jobs(limit)}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Get the status and task counts of a background job."""
+    job = get_job_queue().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return {"status": "success", "job": job}
+
+@app.get("/api/jobs/{job_id}/progress")
+async def get_job_progress(job_id: str, task_status: str = None, limit: int = 100):
+    """Get the progress of a background job with per-file results."""
+    job = get_job_queue().get_progress(job_id, status=task_status, limit=limit)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return {"status": "success", "job": job}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-stage timing, CPU, byte and token totals in Prometheus text format."""
+    return PlainTextResponse(
+        get_metrics_recorder().render_prometheus(),
+        media_type="text/plain; version=0.0.4"
+    )
+
+@app.get("/api/documents/search")
+async def search_documents(
+    tags: List[str] = Query(None),
+    any_tags: List[str] = Query(None),
+    authors: List[str] = Query(None),
+    affiliations: List[str] = Query(None),
+    document_type: List[str] = Query(None),
+    date_from: str = None,
+    date_to: str = None,
+    sort: str = "created_date",
+    descending: bool = True,
+    limit: int = 50,
+    offset: int = 0,
+    facet_limit: int = 20
+):
+    """Filter documents by tags (all of tags, any of any_tags), authors, affiliations, type and date, with facet counts for drill-down."""
+    from utils.faceted_search import SORT_FIELDS, faceted_search
+    
+    if limit < 1 or offset < 0 or facet_limit < 1:
+        raise HTTPException(status_code=400, detail="limit and facet_limit must be at least 1 and offset at least 0")
+    if sort not in SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORT_FIELDS)}")
+    result = await asyncio.get_running_loop().run_in_executor(None, lambda: faceted_search(
+        "data/documents.db",
+        tags=tags,
+        any_tags=any_tags,
+        authors=authors,
+        affiliations=affiliations,
+        document_types=document_type,
+        date_from=date_from,
+        date_to=date_to,
+        sort=sort,
+        descending=descending,
+        limit=limit,
+        offset=offset,
+        facet_limit=facet_limit
+    ))
+    if result["status"] == "error":
+        raise HTTPException(status_code=500, detail=result["message"])
+    return result
+
+@app.get("/api/documents/{document_id}/timings")
+async def get_document_timings(document_id: str):
+    """Get the per-stage timing breakdown and the Gemini tokens per call recorded while processing a document."""
+    from utils.db_operations import get_llm_usage
+
+    loop = asyncio.get_running_loop()
+    timings = await loop.run_in_executor(None, get_metrics_recorder().document_breakdown, document_id)
+    llm_usage = await loop.run_in_executor(None, get_llm_usage, document_id)
+    if not timings["stages"] and not llm_usage["calls"]:
+        raise HTTPException(status_code=404, detail=f"No timings recorded for document {document_id}")
+    return {"status": "success", "timings": timings, "llm_usage": llm_usage}
+
+@app.get("/api/documents/{document_id}/similar")
+async def get_similar_documents(document_id: str, limit: int = 10):
+    """Find the documents whose title, summary and analysis are closest to a document's."""
+    from utils.similarity import find_similar_documents
+    
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    # The first lookup may backfill the index, which can take a while on a large corpus
+    similar = await asyncio.get_running_loop().run_in_executor(None, find_similar_documents, document_id, limit)
+    if similar is None:
+        raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
+    return {"status": "success", "document_id": document_id, "similar": similar}
+
+@app.get("/api/similarity/rebuild")
+async def rebuild_similarity(partitions: int = None):
+    """Re-embed every document, e.g. after a bulk import; partitions sets the IVF partition count."""
+    from utils.similarity import rebuild_similarity_index
+    
+    result = await asyncio.get_running_loop().run_in_executor(None, rebuild_similarity_index, "data/documents.db", partitions)
+    if result["status"] == "error":
+        raise HTTPException(status_code=500, detail=result["message"])
+    return result
+
+@app.get("/api/tags/canonicalize")
+async def merge_tag_variants(dry_run: bool = True):
+    """Merge tag variants (case, plurals, spelling, acronyms) into canonical tags; reports only unless dry_run=false."""
+    from utils.tag_canonicalization import canonicalize_tag_vocabulary
+    
+    result = await asyncio.get_running_loop().run_in_executor(None, canonicalize_tag_vocabulary, "data/documents.db", dry_run)
+    if result["status"] == "error":
+        raise HTTPException(status_code=500, detail=result["message"])
+    return result
+
+@app.get("/api/entities/{entity_type}")
+async def list_entities(entity_type: str, sort: str = "documents", limit: int = 50, offset: int = 0, name: str = None):
+    """List author or affiliation profiles: document counts, date range and top tags."""
+    from utils.entity_profiles import ENTITY_TYPES, SORT_ORDERS, list_entity_profiles
+
+    if entity_type not in ENTITY_TYPES:
+        raise HTTPException(status_code=404, detail=f"Unknown entity type {entity_type}; use {' or '.join(ENTITY_TYPES)}")
+    if sort not in SORT_ORDERS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORT_ORDERS)}")
+    if limit < 1 or offset < 0:
+        raise HTTPException(status_code=400, detail="limit must be at least 1 and offset at least 0")
+    result = await asyncio.get_running_loop().run_in_executor(None, list_entity_profiles, entity_type, "data/documents.db", sort, limit, offset, name)
+    if result["status"] == "error":
+        raise HTTPException(status_code=500, detail=result["message"])
+    return result
+
+@app.get("/api/entities/{entity_type}/{entity_id}")
+async def get_entity(entity_type: str, entity_id: int, limit: int = 20, offset: int = 0):
+    """Get an author's or affiliation's profile with a page of its co-authors or co-affiliations."""
+    from utils.entity_profiles import ENTITY_TYPES, get_entity_profile
+
+    if entity_type not in ENTITY_TYPES:
+        raise HTTPException(status_code=404, detail=f"Unknown entity type {entity_type}; use {' or '.join(ENTITY_TYPES)}")
+    if limit < 1 or offset < 0:
+        raise HTTPException(status_code=400, detail="limit must be at least 1 and offset at least 0")
+    profile = await asyncio.get_running_loop().run_in_executor(None, get_entity_profile, entity_type, entity_id, "data/documents.db", limit, offset)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"No documents for {entity_type} {entity_id}")
+    return {"status": "success", "entity_type": entity_type, "profile": profile}
+
+@app.get("/api/entities/{entity_type}/{entity_id}/documents")
+async def get_entity_document_page(entity_type: str, entity_id: int, limit: int = 50, offset: int = 0):
+    """Get a page of an author's or affiliation's documents, newest first."""
+    from utils.entity_profiles import ENTITY_TYPES, get_entity_documents
+
+    if entity_type not in ENTITY_TYPES:
+        raise HTTPException(status_code=404, detail=f"Unknown entity type {entity_type}; use {' or '.join(ENTITY_TYPES)}")
+    if limit < 1 or offset < 0:
+        raise HTTPException(status_code=400, detail="limit must be at least 1 and offset at least 0")
+    result = await asyncio.get_running_loop().run_in_executor(None, get_entity_documents, entity_type, entity_id, "data/documents.db", limit, offset)
+    if result["status"] == "error":
+        raise HTTPException(status_code=500, detail=result["message"])
+    return result
+
+@app.get("/api/startup")
+async def get_startup_report():
+    """Get how long this process took to import, start and build each component so far."""
+    return {
+        "status": "success",
+        "mode": STARTUP_MODE,
+        "startup": startup_report(),
+        "initialized": [get_component.__name__.removeprefix('get_') for get_component in COMPONENTS if get_component.is_initialized()]
+    }
+
 @app.get("/api/process-latest")
 async def process_latest():
     """Process only the most recent PDF file in the watched folder."""
     try:
-        service = gd.get_drive_service()
-        logger.info("Connected to Drive service")
-        
-        # List files in the folder, ordered by most recent first
-        results = service.files().list(
-            q=f"'{WATCH_FOLDER_ID}' in parents and mimeType='application/pdf'",
-            fields="files(id, name, webViewLink, createdTime)",
-            orderBy="createdTime desc",
-            pageSize=1
-        ).execute()
-        
-        files = results.get('files', [])
-        if not files:
+        file = gd.get_latest_file(WATCH_FOLDER_ID)
+        if not file:
             return {"status": "success", "message": "No PDF files found"}
             
-        file = files[0]  # Get the most recent file
         logger.info(f"Processing latest file: {file['name']}")
-        
-        # First check if file needs compression
-        if compression_daemon.is_already_compressed(file['name']):
-            logger.info(f"Compressed version already exists for {file['name']}")
-            needs_compression = False
-        else:
-            logger.info(f"No compressed version found for {file['name']}, will compress")
-            needs_compression = True
-        
-        # Process the document (this will always download the file)
-        result = await document_processor.process_file(file)
-        logger.info(f"Document processing complete for {file['name']}")
-        
-        try:
-            # Handle compression if needed
-            if needs_compression and "temp" in result:
-                temp_path = result["temp"]
-                if os.path.exists(temp_path):
-                    original_size = os.path.getsize(temp_path)
-                    compressed = compression_daemon.compress_pdf(temp_path, file['name'])
-                    
-                    if compressed:
-                        compressed_path, compressed_size, drive_id = compressed
-                        logger.info(f"Compression successful - Drive ID: {drive_id}")
-                        
-                        # Add compression info to result
-                        if isinstance(result["file"], dict):
-                            result["file"].update({
-                                "original_size": original_size,
-                                "compressed_size": compressed_size,
-                                "compressed_file_id": drive_id,
-                                "compression_ratio": f"{(1 - compressed_size/original_size) * 100:.1f}%"
-                            })
-                        
-                        # Clean up temp files
-                        try:
-                            os.remove(temp_path)
-                            os.remove(compressed_path)
-                            logger.info(f"Cleaned up temporary files for {file['name']}")
-                        except Exception as e:
-                            logger.error(f"Error cleaning up temp files: {str(e)}")
-                    else:
-                        logger.error(f"Temp file not found: {temp_path}")
-                else:
-                    logger.error(f"No temp file path in result")
-            else:
-                # Clean up temp file if we didn't need to compress
-                if "temp" in result and os.path.exists(result["temp"]):
-                    try:
-                        os.remove(result["temp"])
-                        logger.info(f"Cleaned up temp file for already compressed document: {file['name']}")
-                    except Exception as e:
-                        logger.error(f"Error cleaning up temp file: {str(e)}")
-                
-        except Exception as e:
-            logger.error(f"Error during compression process: {str(e)}")
-            # Ensure temp file cleanup on error
-            if "temp" in result and os.path.exists(result["temp"]):
-                try:
-                    os.remove(result["temp"])
-                    logger.info(f"Cleaned up temp file after error: {result['temp']}")
-                except Exception as cleanup_error:
-                    logger.error(f"Error cleaning up temp file: {str(cleanup_error)}")
+        result = await process_drive_file(file)
         
         return {
             "status": "success",
@@ -243,6 +511,41 @@ async def process_latest():
         logger.error(f"Error processing latest file: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def handle_sync_event(event):
+    """Apply a single folder sync event to the document store."""
+    file = event["file"]
+    event_type = event["type"]
+    
+    if event_type in (folder_sync.ADDED, folder_sync.MODIFIED):
+        result = await process_drive_file(file, reprocess=event_type == folder_sync.MODIFIED)
+        return {"event": event_type, "id": file["id"], "status": result.get("status")}
+    
+    if event_type == folder_sync.RENAMED:
+        doc = get_document_from_db(file["id"])
+        if doc:
+            doc["name"] = file["name"]
+            save_document_to_db(doc)
+        return {"event": event_type, "id": file["id"], "status": "success", "name": file["name"]}
+    
+    # Trashed and removed files keep their analysis; just report them
+    logger.info(f"File {file['id']} was {event_type} from the watch folder")
+    return {"event": event_type, "id": file["id"], "status": "success"}
+
+@app.get("/api/sync-folder")
+async def sync_folder():
+    """Process only what changed in the watched folder since the last sync."""
+    try:
+        result = await get_folder_sync_daemon().sync(handle_sync_event)
+        return {
+            "status": "success",
+            "event_count": result["event_count"],
+            "results": result["results"],
+            "failed": result["failed"]
+        }
+    except Exception as e:
+        logger.error(f"Error syncing folder: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/health")
 async def health_check():
     """Check the health of the service and its dependencies."""
@@ -252,7 +555,7 @@ async def health_check():
         service.files().list(pageSize=1).execute()
         
         # Check Ghostscript
-        compression_daemon._verify_ghostscript()
+        get_compression_daemon()._verify_ghostscript()
         
         return {
             "status": "healthy",
@@ -274,22 +577,38 @@ async def health_check():
 async def generate_tags():
     """Generate tags for all processed documents that don't already have tags."""
     try:
-        results = await content_tagger.process_all_documents(skip_tagged=True)
+        results = await get_content_tagger().process_all_documents(skip_tagged=True)
         return {
             "status": "success",
             "tagged_count": len(results),
-            "skipped_count": content_tagger.skipped_count,
+            "skipped_count": get_content_tagger().skipped_count,
             "results": results
         }
     except Exception as e:
         logger.error(f"Error generating tags: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def summarize_tags(result):
+    """Compact view of a tagging result."""
+    if result.get("skipped"):
+        return {"id": result["id"], "skipped": True}
+    return {"id": result["id"], "tag_count": len(result.get("tags", []))}
+
+@app.get("/api/generate-tags/stream")
+async def generate_tags_stream(format: str = "sse", summary: bool = False):
+    """Generate tags for untagged documents, streaming each document's tags as they are generated."""
+    return stream_results(
+        get_content_tagger().iter_process_all_documents(skip_tagged=True),
+        format,
+        summarize=summarize_tags if summary else None,
+        is_success=lambda result: result.get("skipped") or bool(result.get("tags"))
+    )
+
 @app.get("/api/retitle-latest")
 async def retitle_latest():
     """Retitle the most recent document in the processed files database."""
     try:
-        result = await document_processor.retitle_latest_document()
+        result = await get_document_processor().retitle_latest_document()
         return result
     except Exception as e:
         logger.error(f"Error retitling latest document: {str(e)}")
@@ -299,17 +618,22 @@ async def retitle_latest():
 async def retitle_folder():
     """Retitle all documents in the processed files database."""
     try:
-        result = await document_processor.retitle_all_documents()
+        result = await get_document_processor().retitle_all_documents()
         return result
     except Exception as e:
         logger.error(f"Error retitling all documents: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/retitle-folder/stream")
+async def retitle_folder_stream(format: str = "sse"):
+    """Retitle all documents, streaming each new title as it is extracted."""
+    return stream_results(get_document_processor().iter_retitle_all_documents(), format)
+
 @app.get("/api/reclassify-documents")
 async def reclassify_documents():
     """Reclassify all documents in the processed files database."""
     try:
-        result = await document_processor.reclassify_all_documents()
+        result = await get_document_processor().reclassify_all_documents()
         if result["status"] == "error":
             raise HTTPException(status_code=500, detail=result["message"])
         return result
@@ -317,6 +641,139 @@ async def reclassify_documents():
         logger.error(f"Error reclassifying documents: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/reclassify-documents/stream")
+async def reclassify_documents_stream(format: str = "sse"):
+    """Reclassify all documents, streaming each classification as it is made."""
+    return stream_results(get_document_processor().iter_reclassify_all_documents(), format)
+
+def reprocess_arguments(
+    fields: List[str],
+    ids: List[str],
+    processed_before: str,
+    filters: Dict[str, Any],
+    concurrency: int,
+    stale: bool
+) -> Dict[str, Any]:
+    """Validate reprocessing parameters into Reprocessor.iter_reprocess arguments."""
+    from agents.reprocessor import FIELDS
+
+    if not fields or any(field not in FIELDS for field in fields):
+        raise HTTPException(status_code=400, detail=f"fields must be one or more of {', '.join(FIELDS)}")
+    if concurrency is not None and concurrency < 1:
+        raise HTTPException(status_code=400, detail="concurrency must be at least 1")
+    return {
+        "fields": fields,
+        "document_ids": ids,
+        "filters": {key: value for key, value in filters.items() if value} or None,
+        "processed_before": processed_before,
+        "concurrency": concurrency,
+        "stale_only": stale
+    }
+
+@app.get("/api/reprocess")
+async def reprocess_documents(
+    fields: List[str] = Query(None),
+    ids: List[str] = Query(None),
+    processed_before: str = None,
+    tags: List[str] = Query(None),
+    any_tags: List[str] = Query(None),
+    authors: List[str] = Query(None),
+    affiliations: List[str] = Query(None),
+    document_type: List[str] = Query(None),
+    date_from: str = None,
+    date_to: str = None,
+    concurrency: int = None,
+    stale: bool = False
+):
+    """Regenerate only the given fields (analysis, title, document_type, authors, affiliations, summary, tags) of the selected documents; stale=true limits each document to fields made with an older prompt or model."""
+    arguments = reprocess_arguments(fields, ids, processed_before, {
+        "tags": tags, "any_tags": any_tags, "authors": authors, "affiliations": affiliations,
+        "document_types": document_type, "date_from": date_from, "date_to": date_to
+    }, concurrency, stale)
+    result = await get_document_processor().reprocessor.reprocess(**arguments)
+    if result["status"] == "error":
+        raise HTTPException(status_code=404 if result["message"].startswith("No documents") else 400, detail=result["message"])
+    return result
+
+@app.get("/api/reprocess/stream")
+async def reprocess_documents_stream(
+    fields: List[str] = Query(None),
+    ids: List[str] = Query(None),
+    processed_before: str = None,
+    tags: List[str] = Query(None),
+    any_tags: List[str] = Query(None),
+    authors: List[str] = Query(None),
+    affiliations: List[str] = Query(None),
+    document_type: List[str] = Query(None),
+    date_from: str = None,
+    date_to: str = None,
+    concurrency: int = None,
+    stale: bool = False,
+    format: str = "sse"
+):
+    """Regenerate the given fields of the selected documents, streaming each result once its batch is saved."""
+    arguments = reprocess_arguments(fields, ids, processed_before, {
+        "tags": tags, "any_tags": any_tags, "authors": authors, "affiliations": affiliations,
+        "document_types": document_type, "date_from": date_from, "date_to": date_to
+    }, concurrency, stale)
+    return stream_results(get_document_processor().reprocessor.iter_reprocess(**arguments), format)
+
+@app.get("/api/provenance")
+async def get_provenance_summary():
+    """Current prompt version of each LLM-derived field, the versions documents were generated with, and stale counts."""
+    from agents.document_processor import PROMPT_VERSIONS
+    from utils.provenance import provenance_summary
+
+    result = await asyncio.get_running_loop().run_in_executor(None, provenance_summary, PROMPT_VERSIONS, get_document_processor().model.model_name)
+    if result["status"] == "error":
+        raise HTTPException(status_code=500, detail=result["message"])
+    return result
+
+@app.get("/api/provenance/baseline")
+async def record_baseline_provenance():
+    """Mark fields without recorded provenance as generated by the current prompts and model (for databases built before it was recorded)."""
+    from agents.document_processor import PROMPT_VERSIONS
+    from utils.provenance import baseline_provenance
+
+    stamped = await asyncio.get_running_loop().run_in_executor(None, baseline_provenance, PROMPT_VERSIONS, get_document_processor().model.model_name)
+    if stamped < 0:
+        raise HTTPException(status_code=500, detail="Could not record baseline provenance")
+    return {"status": "success", "stamped_count": stamped}
+
+@app.get("/api/dedup/backfill")
+async def backfill_fingerprints():
+    """Fingerprint documents processed before deduplication existed, so new copies of them are recognized."""
+    result = await asyncio.get_running_loop().run_in_executor(None, get_document_processor().backfill_fingerprints)
+    if result["status"] == "error":
+        raise HTTPException(status_code=500, detail=result["message"])
+    return result
+
+@app.get("/api/documents/{document_id}/duplicates")
+async def get_document_duplicates(document_id: str):
+    """List the Drive files linked to a document as exact or near duplicates instead of being processed."""
+    from utils.db_operations import is_document_in_db
+    from utils.dedup import get_duplicates_of
+
+    loop = asyncio.get_running_loop()
+    if not await loop.run_in_executor(None, is_document_in_db, document_id):
+        raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
+    duplicates = await loop.run_in_executor(None, get_duplicates_of, document_id)
+    return {"status": "success", "document_id": document_id, "duplicates": duplicates}
+
+@app.get("/api/documents/{document_id}/provenance")
+async def get_document_provenance(document_id: str):
+    """Get the prompt version, model and time each LLM-derived field of a document was generated with."""
+    from agents.document_processor import PROMPT_VERSIONS
+    from utils.provenance import get_provenance
+
+    provenance = await asyncio.get_running_loop().run_in_executor(None, get_provenance, document_id)
+    if not provenance:
+        raise HTTPException(status_code=404, detail=f"No provenance recorded for document {document_id}")
+    model = get_document_processor().model.model_name
+    for field, entry in provenance.items():
+        entry["stale"] = entry["prompt_hash"] != PROMPT_VERSIONS.get(field) or entry["model"] != model
+    return {"status": "success", "document_id": document_id, "provenance": provenance}
+
 @app.get("/api/get-latest-drive-file")
 async def get_latest_drive_file():
     """Get the most recent file from the watched folder."""
@@ -350,6 +807,8 @@ async def get_unprocessed_files():
         logger.error(f"Error getting unprocessed files: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+record_phase("import", time.perf_counter() - _import_started)
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -0,0 +1,101 @@
+import re
+import math
+import logging
+from typing import List
+
+from utils.text_extraction import PAGE_BREAK
+
+logger = logging.getLogger(__name__)
+
+# Rough characters per token for English prose with Gemini's tokenizer
+CHARS_PER_TOKEN = 4
+
+# Lines that look like the start of a section: "3. Results", "2.1 Setup", "APPENDIX A", "Introduction"
+_HEADING = re.compile(
+    r'^(?:\d+(?:\.\d+)*\.?\s+[A-Z][^\n]{0,80}|[A-Z][A-Z \-]{3,60}|'
+    r'(?:Abstract|Introduction|Background|Related Work|Method(?:s|ology)?|Results|Discussion|Conclusions?|References|Appendix[^\n]{0,40}))$',
+    re.MULTILINE
+)
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in text without calling the API."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def _split_oversized(text: str, max_tokens: int) -> List[str]:
+    """Split a single page that exceeds max_tokens on sections, then paragraphs, then lines."""
+    for pattern in (_HEADING, re.compile(r'\n\s*\n'), re.compile(r'\n')):
+        boundaries = [match.start() for match in pattern.finditer(text) if match.start() > 0]
+        if not boundaries:
+            continue
+        pieces = [text[start:end] for start, end in zip([0] + boundaries, boundaries + [len(text)])]
+        if all(estimate_tokens(piece) <= max_tokens for piece in pieces):
+            return pieces
+
+    # No usable boundary: cut at the character budget
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+def split_text(text: str, max_tokens: int) -> List[str]:
+    """
+    Split extracted document text into chunks of at most max_tokens (estimated).
+
+    Whole pages are packed together where they fit; a page that is too large by
+    itself is split on section headings, then paragraphs, then lines.
+
+    Args:
+        text: Text from extract_text_from_pdf (pages separated by PAGE_BREAK)
+        max_tokens: Maximum estimated tokens per chunk
+
+    Returns:
+        List[str]: Chunks in document order
+    """
+    units = []
+    for page in text.split(PAGE_BREAK):
+        if not page.strip():
+            continue
+        if estimate_tokens(page) <= max_tokens:
+            units.append(page)
+        else:
+            units.extend(_split_oversized(page, max_tokens))
+
+    chunks = []
+    current = ""
+    for unit in units:
+        if current and estimate_tokens(current) + estimate_tokens(unit) > max_tokens:
+            chunks.append(current)
+            current = ""
+        current += unit
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+def select_within_budget(chunks: List[str], token_budget: int) -> List[int]:
+    """
+    Choose which chunks to analyze when all of them would exceed the token budget.
+
+    The first and last chunks are always kept (they usually hold the abstract,
+    introduction and conclusions); the rest are sampled evenly across the document.
+
+    Args:
+        chunks: Chunks from split_text
+        token_budget: Maximum estimated input tokens to spend on chunks
+
+    Returns:
+        List[int]: Indexes of the selected chunks, in document order
+    """
+    sizes = [estimate_tokens(chunk) for chunk in chunks]
+    if sum(sizes) <= token_budget:
+        return list(range(len(chunks)))
+
+    average = sum(sizes) / len(sizes)
+    count = max(1, min(len(chunks), int(token_budget // average)))
+    if count == 1:
+        return [0]
+
+    step = (len(chunks) - 1) / (count - 1)
+    selected = sorted({round(i * step) for i in range(count)})
+    while len(selected) > 1 and sum(sizes[i] for i in selected) > token_budget:
+        # Drop from the middle, keeping the first and last chunks
+        selected.pop(len(selected) // 2)
+    logger.info(f"Token budget allows {len(selected)} of {len(chunks)} chunks")
+    return selected
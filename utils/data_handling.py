@@ -6,6 +6,10 @@ from typing import Dict, Any, Optional, List, Union
 from pathlib import Path
 import time
 
+from utils.entity_profiles import refresh_entity_profiles
+from utils.tag_canonicalization import canonicalize_tags
+from utils.provenance import record_provenance
+
 def convert_json_to_sqlite(
     json_file_path: Union[str, Path], 
     db_file_path: Union[str, Path],
@@ -151,7 +155,8 @@ def convert_json_to_sqlite(
                 
                 # Process tags
                 if 'tags' in doc and isinstance(doc['tags'], list):
-                    for tag_name in doc['tags']:
+                    # Canonical form, as save_document_to_db stores them
+                    for tag_name in canonicalize_tags(doc['tags'], cursor=cursor):
                         # Insert tag if not exists
                         cursor.execute('INSERT OR IGNORE INTO tags (name) VALUES (?)', (tag_name,))
                         
@@ -164,7 +169,13 @@ def convert_json_to_sqlite(
                         INSERT INTO document_tags (document_id, tag_id)
                         VALUES (?, ?)
                         ''', (doc_id, tag_id))
-            
+
+                # How the LLM-derived fields were generated, when the document carries it
+                record_provenance(cursor, doc_id, doc.get('provenance'))
+
+            # Bring the author and affiliation profiles up to date with the import
+            refresh_entity_profiles(cursor)
+
             # Commit changes and close connection
             conn.commit()
             conn.close()
@@ -325,7 +336,8 @@ def convert_json_to_sqlite(
         
         # Process tags
         if 'tags' in doc and isinstance(doc['tags'], list):
-            for tag_name in doc['tags']:
+            # Canonical form, as save_document_to_db stores them
+            for tag_name in canonicalize_tags(doc['tags'], cursor=cursor):
                 # Insert tag if not exists
                 cursor.execute('INSERT OR IGNORE INTO tags (name) VALUES (?)', (tag_name,))
                 
@@ -338,7 +350,10 @@ def convert_json_to_sqlite(
                 INSERT INTO document_tags (document_id, tag_id)
                 VALUES (?, ?)
                 ''', (doc_id, tag_id))
-    
+
+        # How the LLM-derived fields were generated, when the document carries it
+        record_provenance(cursor, doc_id, doc.get('provenance'))
+
     # Create indexes for better query performance
     cursor.execute('CREATE INDEX idx_document_authors_document_id ON document_authors (document_id)')
     cursor.execute('CREATE INDEX idx_document_authors_author_id ON document_authors (author_id)')
@@ -5,9 +5,18 @@ import sqlite3
 from typing import Dict, Any, List, Optional, Union
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.tag_canonicalization import canonicalize_tags
+from utils.entity_profiles import document_entities, update_entity_profiles
+from utils.provenance import record_provenance
 
 logger = logging.getLogger(__name__)
 
+# Similarity indexing runs on one background thread, in save order, so saves
+# (which run on the API's event loop) don't wait for the embedding
+_similarity_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="similarity-index")
+
 def save_document_to_db(document: Dict[str, Any], db_path: str = "data/documents.db") -> bool:
     """
     Save a processed document to the SQLite database.
@@ -34,6 +43,7 @@ def save_document_to_db(document: Dict[str, Any], db_path: str = "data/documents
                 
             convert_json_to_sqlite(temp_json_path, db_path)
             os.remove(temp_json_path)
+            _update_similarity_index(document["id"], db_path)
             return True
             
         # Connect to the database
@@ -43,8 +53,12 @@ def save_document_to_db(document: Dict[str, Any], db_path: str = "data/documents
         # Check if document already exists
         cursor.execute("SELECT id FROM documents WHERE id = ?", (document["id"],))
         exists = cursor.fetchone() is not None
+        previous_entities = None
         
         if exists:
+            # What the document contributed to the entity profiles before this write
+            previous_entities = document_entities(cursor, document["id"])
+            
             # Update existing document
             cursor.execute('''
             UPDATE documents SET
@@ -99,63 +113,145 @@ def save_document_to_db(document: Dict[str, Any], db_path: str = "data/documents
             
             logger.info(f"Inserted new document {document['id']} into database")
         
-        # Process authors
-        if 'authors' in document and isinstance(document['authors'], list):
-            for i, author_name in enumerate(document['authors']):
-                # Insert author if not exists
-                cursor.execute('INSERT OR IGNORE INTO authors (name) VALUES (?)', (author_name,))
-                
-                # Get author id
-                cursor.execute('SELECT id FROM authors WHERE name = ?', (author_name,))
-                author_id = cursor.fetchone()[0]
-                
-                # Insert document-author relationship
-                cursor.execute('''
-                INSERT INTO document_authors (document_id, author_id, author_order)
-                VALUES (?, ?, ?)
-                ''', (document["id"], author_id, i))
-        
-        # Process affiliations
-        if 'affiliations' in document and isinstance(document['affiliations'], list):
-            for i, affiliation_name in enumerate(document['affiliations']):
-                # Insert affiliation if not exists
-                cursor.execute('INSERT OR IGNORE INTO affiliations (name) VALUES (?)', (affiliation_name,))
-                
-                # Get affiliation id
-                cursor.execute('SELECT id FROM affiliations WHERE name = ?', (affiliation_name,))
-                affiliation_id = cursor.fetchone()[0]
-                
-                # Insert document-affiliation relationship
-                cursor.execute('''
-                INSERT INTO document_affiliations (document_id, affiliation_id, affiliation_order)
-                VALUES (?, ?, ?)
-                ''', (document["id"], affiliation_id, i))
-        
-        # Process tags
-        if 'tags' in document and isinstance(document['tags'], list):
-            for tag_name in document['tags']:
-                # Insert tag if not exists
-                cursor.execute('INSERT OR IGNORE INTO tags (name) VALUES (?)', (tag_name,))
-                
-                # Get tag id
-                cursor.execute('SELECT id FROM tags WHERE name = ?', (tag_name,))
-                tag_id = cursor.fetchone()[0]
-                
-                # Insert document-tag relationship
-                cursor.execute('''
-                INSERT INTO document_tags (document_id, tag_id)
-                VALUES (?, ?)
-                ''', (document["id"], tag_id))
+        _insert_relationships(cursor, document)
+        
+        # Keep the author and affiliation profiles in step, in the same transaction
+        update_entity_profiles(cursor, document["id"], previous_entities)
+        
+        # How the LLM-derived fields were generated, when the document carries it
+        record_provenance(cursor, document["id"], document.get('provenance'))
         
         # Commit changes and close connection
         conn.commit()
         conn.close()
+        _update_similarity_index(document["id"], db_path)
         return True
         
     except Exception as e:
         logger.error(f"Error saving document to database: {str(e)}")
         return False
 
+def _insert_relationships(cursor: sqlite3.Cursor, document: Dict[str, Any]):
+    """Insert the author, affiliation and tag rows for whichever of those lists a document has."""
+    # Process authors
+    if 'authors' in document and isinstance(document['authors'], list):
+        for i, author_name in enumerate(document['authors']):
+            # Insert author if not exists
+            cursor.execute('INSERT OR IGNORE INTO authors (name) VALUES (?)', (author_name,))
+            
+            # Get author id
+            cursor.execute('SELECT id FROM authors WHERE name = ?', (author_name,))
+            author_id = cursor.fetchone()[0]
+            
+            # Insert document-author relationship
+            cursor.execute('''
+            INSERT INTO document_authors (document_id, author_id, author_order)
+            VALUES (?, ?, ?)
+            ''', (document["id"], author_id, i))
+    
+    # Process affiliations
+    if 'affiliations' in document and isinstance(document['affiliations'], list):
+        for i, affiliation_name in enumerate(document['affiliations']):
+            # Insert affiliation if not exists
+            cursor.execute('INSERT OR IGNORE INTO affiliations (name) VALUES (?)', (affiliation_name,))
+            
+            # Get affiliation id
+            cursor.execute('SELECT id FROM affiliations WHERE name = ?', (affiliation_name,))
+            affiliation_id = cursor.fetchone()[0]
+            
+            # Insert document-affiliation relationship
+            cursor.execute('''
+            INSERT INTO document_affiliations (document_id, affiliation_id, affiliation_order)
+            VALUES (?, ?, ?)
+            ''', (document["id"], affiliation_id, i))
+    
+    # Process tags, stored in canonical form so variants don't grow the vocabulary
+    if 'tags' in document and isinstance(document['tags'], list):
+        for tag_name in canonicalize_tags(document['tags'], cursor=cursor):
+            # Insert tag if not exists
+            cursor.execute('INSERT OR IGNORE INTO tags (name) VALUES (?)', (tag_name,))
+            
+            # Get tag id
+            cursor.execute('SELECT id FROM tags WHERE name = ?', (tag_name,))
+            tag_id = cursor.fetchone()[0]
+            
+            # Insert document-tag relationship
+            cursor.execute('''
+            INSERT INTO document_tags (document_id, tag_id)
+            VALUES (?, ?)
+            ''', (document["id"], tag_id))
+
+# Fields update_document_fields can rewrite: documents columns, then relationship lists
+UPDATABLE_COLUMNS = ('title', 'summary', 'analysis', 'document_type')
+RELATIONSHIP_TABLES = {'authors': 'document_authors', 'affiliations': 'document_affiliations', 'tags': 'document_tags'}
+
+def update_document_fields(updates: List[Dict[str, Any]], db_path: str = "data/documents.db") -> bool:
+    """
+    Write new values for some fields of several documents in one transaction.
+
+    Only the fields present in each update are touched; the rest of the
+    document (analysis, dates, other relationships) is left as it is.
+
+    Args:
+        updates: One dictionary per document with its id and any of title,
+            summary, analysis, document_type, authors, affiliations and tags, plus the
+            provenance of regenerated fields (see utils.provenance)
+        db_path: Path to the SQLite database
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    if not updates:
+        return True
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            cursor = conn.cursor()
+            for update in updates:
+                columns = [column for column in UPDATABLE_COLUMNS if column in update]
+                if columns:
+                    cursor.execute(
+                        f"UPDATE documents SET {', '.join(f'{column} = ?' for column in columns)} WHERE id = ?",
+                        [update[column] for column in columns] + [update["id"]]
+                    )
+
+                relationships = [field for field in RELATIONSHIP_TABLES if field in update]
+                if relationships:
+                    previous_entities = document_entities(cursor, update["id"])
+                    for field in relationships:
+                        cursor.execute(f"DELETE FROM {RELATIONSHIP_TABLES[field]} WHERE document_id = ?", (update["id"],))
+                    _insert_relationships(cursor, update)
+                    update_entity_profiles(cursor, update["id"], previous_entities)
+                record_provenance(cursor, update["id"], update.get('provenance'))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        # Title, summary and analysis are what the similarity embedding is made of
+        for update in updates:
+            if 'title' in update or 'summary' in update or 'analysis' in update:
+                _update_similarity_index(update["id"], db_path)
+
+        logger.info(f"Updated fields of {len(updates)} documents in database")
+        return True
+
+    except Exception as e:
+        logger.error(f"Error updating document fields: {str(e)}")
+        return False
+
+def _update_similarity_index(document_id: str, db_path: str):
+    """Queue a saved document for the similarity index; a failure there doesn't fail the save."""
+    _similarity_executor.submit(_index_saved_document, document_id, db_path)
+
+def _index_saved_document(document_id: str, db_path: str):
+    # Imported on the indexing thread so numpy stays out of the API's startup path
+    from utils.similarity import SIMILARITY_INDEX_ENABLED, index_saved_document
+    if SIMILARITY_INDEX_ENABLED:
+        index_saved_document(document_id, db_path)
+
 def is_document_in_db(document_id: str, db_path: str = "data/documents.db") -> bool:
     """
     Check if a document exists in the database.
@@ -302,4 +398,103 @@ def get_all_document_ids(db_path: str = "data/documents.db") -> List[str]:
         
     except Exception as e:
         logger.error(f"Error getting all document IDs: {str(e)}")
-        return [] 
\ No newline at end of file
+        return []
+
+
+def record_llm_usage(document_id: str, usage: List[Dict[str, Any]], db_path: str = "data/documents.db") -> bool:
+    """
+    Record the Gemini calls made for a document and the tokens they used.
+    
+    Args:
+        document_id: Document ID the calls were made for
+        usage: One dictionary per call with call, model, prompt_tokens, output_tokens and estimated
+        db_path: Path to the SQLite database
+        
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        if not os.path.exists(db_path):
+            return False
+            
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS llm_usage (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            document_id TEXT,
+            call TEXT,
+            model TEXT,
+            prompt_tokens INTEGER,
+            output_tokens INTEGER,
+            estimated INTEGER,
+            created_at TEXT
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_usage_document_id ON llm_usage (document_id)')
+        
+        now = datetime.now().isoformat()
+        cursor.executemany('''
+        INSERT INTO llm_usage (document_id, call, model, prompt_tokens, output_tokens, estimated, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (
+                document_id,
+                entry['call'],
+                entry['model'],
+                entry['prompt_tokens'],
+                entry['output_tokens'],
+                int(entry['estimated']),
+                now
+            )
+            for entry in usage
+        ])
+        
+        conn.commit()
+        conn.close()
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error recording LLM usage: {str(e)}")
+        return False
+
+def get_llm_usage(document_id: str, db_path: str = "data/documents.db") -> Dict[str, Any]:
+    """
+    Get the total tokens spent on a document, with a breakdown per call.
+    
+    Args:
+        document_id: Document ID to report on
+        db_path: Path to the SQLite database
+        
+    Returns:
+        Dict[str, Any]: Totals and per-call rows (empty totals if nothing was recorded)
+    """
+    usage = {"document_id": document_id, "prompt_tokens": 0, "output_tokens": 0, "calls": []}
+    try:
+        if not os.path.exists(db_path):
+            return usage
+            
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'llm_usage'")
+        if cursor.fetchone() is None:
+            conn.close()
+            return usage
+        
+        cursor.execute('''
+        SELECT call, model, prompt_tokens, output_tokens, estimated, created_at
+        FROM llm_usage WHERE document_id = ? ORDER BY id
+        ''', (document_id,))
+        usage["calls"] = [dict(row) for row in cursor.fetchall()]
+        usage["prompt_tokens"] = sum(row["prompt_tokens"] for row in usage["calls"])
+        usage["output_tokens"] = sum(row["output_tokens"] for row in usage["calls"])
+        
+        conn.close()
+        return usage
+        
+    except Exception as e:
+        logger.error(f"Error retrieving LLM usage: {str(e)}")
+        return usage
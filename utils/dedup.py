@@ -0,0 +1,427 @@
+import os
+import re
+import hashlib
+import logging
+import sqlite3
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple, TYPE_CHECKING
+
+from utils.text_extraction import extract_text_from_pdf
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# MinHash signature length and LSH banding (32 bands x 4 rows catches pairs
+# above roughly 0.45 Jaccard similarity as candidates)
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32
+ROWS_PER_BAND = NUM_PERMUTATIONS // LSH_BANDS
+
+# Words per shingle
+SHINGLE_SIZE = 5
+
+# Estimated Jaccard similarity at which two texts count as the same document
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv('DEDUP_NEAR_THRESHOLD', '0.9'))
+
+# Texts shorter than this many words are too short to compare reliably
+MIN_WORDS = 50
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+@lru_cache(maxsize=1)
+def _np():
+    """numpy, imported on first use so importing this module stays cheap."""
+    import numpy
+    return numpy
+
+@lru_cache(maxsize=1)
+def _permutations() -> Tuple["np.ndarray", "np.ndarray"]:
+    """MinHash permutation coefficients, built on first use."""
+    np = _np()
+
+    # Fixed seed so signatures stay comparable across runs
+    rng = np.random.RandomState(1)
+    perm_a = rng.randint(1, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+    perm_b = rng.randint(0, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+    return perm_a, perm_b
+
+def _shingles(text: str) -> "np.ndarray":
+    """32-bit hashes of the word shingles of normalized text."""
+    np = _np()
+
+    words = re.findall(r'[a-z0-9]+', text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return np.array([], dtype=np.uint64)
+    hashes = {
+        int.from_bytes(
+            hashlib.blake2b(' '.join(words[i:i + SHINGLE_SIZE]).encode('utf-8'), digest_size=4).digest(),
+            'little'
+        )
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+def minhash_signature(text: str) -> Optional[List[int]]:
+    """
+    Compute the MinHash signature of a document's text.
+
+    Args:
+        text: Extracted document text
+
+    Returns:
+        Optional[List[int]]: NUM_PERMUTATIONS minimum hashes, or None if the text is too short
+    """
+    if len(re.findall(r'[a-z0-9]+', text.lower())) < MIN_WORDS:
+        return None
+    np = _np()
+
+    shingles = _shingles(text)
+    perm_a, perm_b = _permutations()
+    # (a * x + b) mod p for every permutation and shingle; 32-bit inputs keep a * x below 2^64
+    hashed = (np.outer(perm_a, shingles) + perm_b[:, None]) % np.uint64(_MERSENNE_PRIME) & np.uint64(_MAX_HASH)
+    return hashed.min(axis=1).tolist()
+
+def extract_text_and_signature(pdf_path: str) -> Tuple[str, Optional[List[int]]]:
+    """
+    Extract a PDF's text and compute its MinHash signature.
+
+    Both steps are pure-Python CPU work, so the ingest pipeline runs this in a
+    worker process; it only takes and returns picklable values.
+    """
+    text = extract_text_from_pdf(pdf_path)
+    return text, minhash_signature(text)
+
+def estimate_similarity(signature_a: List[int], signature_b: List[int]) -> float:
+    """Estimate the Jaccard similarity of two texts from their MinHash signatures."""
+    np = _np()
+
+    return float(np.mean(np.array(signature_a) == np.array(signature_b)))
+
+def _band_keys(signature: List[int]) -> List[Tuple[int, str]]:
+    """LSH bucket key for each band of a signature."""
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        keys.append((band, hashlib.md5(','.join(map(str, rows)).encode('utf-8')).hexdigest()[:16]))
+    return keys
+
+def _encode_signature(signature: List[int]) -> bytes:
+    np = _np()
+
+    return np.array(signature, dtype=np.uint64).tobytes()
+
+def _decode_signature(blob: bytes) -> List[int]:
+    np = _np()
+
+    return np.frombuffer(blob, dtype=np.uint64).tolist()
+
+def _ensure_tables(cursor: sqlite3.Cursor):
+    """Create the fingerprint and duplicate tables if they don't exist."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS document_fingerprints (
+        document_id TEXT PRIMARY KEY,
+        md5 TEXT,
+        sha256 TEXT,
+        minhash BLOB,
+        created_at TEXT
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS document_minhash_bands (
+        band INTEGER,
+        bucket TEXT,
+        document_id TEXT,
+        PRIMARY KEY (band, bucket, document_id)
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS document_duplicates (
+        file_id TEXT PRIMARY KEY,
+        canonical_id TEXT,
+        name TEXT,
+        drive_link TEXT,
+        md5 TEXT,
+        match_type TEXT,
+        similarity REAL,
+        detected_at TEXT
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_document_fingerprints_md5 ON document_fingerprints (md5)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_document_fingerprints_sha256 ON document_fingerprints (sha256)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_document_minhash_bands_document_id ON document_minhash_bands (document_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_document_duplicates_canonical_id ON document_duplicates (canonical_id)')
+
+def record_fingerprint(
+    document_id: str,
+    md5: Optional[str] = None,
+    sha256: Optional[str] = None,
+    signature: Optional[List[int]] = None,
+    db_path: str = "data/documents.db"
+) -> bool:
+    """
+    Store the content hashes and MinHash signature of a processed (canonical) document.
+
+    Args:
+        document_id: Drive ID of the document
+        md5: MD5 of the PDF (Drive's md5Checksum)
+        sha256: SHA-256 of the PDF computed while downloading
+        signature: MinHash signature of the extracted text
+        db_path: Path to the SQLite database
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        if not os.path.exists(db_path):
+            return False
+
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        _ensure_tables(cursor)
+
+        cursor.execute('''
+        INSERT OR REPLACE INTO document_fingerprints (document_id, md5, sha256, minhash, created_at)
+        VALUES (?, ?, ?, ?, ?)
+        ''', (
+            document_id,
+            md5,
+            sha256,
+            _encode_signature(signature) if signature else None,
+            datetime.now().isoformat()
+        ))
+
+        cursor.execute("DELETE FROM document_minhash_bands WHERE document_id = ?", (document_id,))
+        if signature:
+            cursor.executemany(
+                "INSERT OR IGNORE INTO document_minhash_bands (band, bucket, document_id) VALUES (?, ?, ?)",
+                [(band, bucket, document_id) for band, bucket in _band_keys(signature)]
+            )
+
+        conn.commit()
+        conn.close()
+        return True
+
+    except Exception as e:
+        logger.error(f"Error recording fingerprint for {document_id}: {str(e)}")
+        return False
+
+def unfingerprinted_documents(db_path: str = "data/documents.db") -> List[str]:
+    """
+    Processed documents without a stored fingerprint, e.g. ingested before
+    deduplication existed, so later copies of them aren't recognized.
+
+    Returns:
+        List[str]: Document IDs, oldest processed first (empty on error)
+    """
+    try:
+        if not os.path.exists(db_path):
+            return []
+
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        _ensure_tables(cursor)
+        cursor.execute('''
+        SELECT d.id FROM documents d
+        WHERE NOT EXISTS (SELECT 1 FROM document_fingerprints f WHERE f.document_id = d.id)
+        ORDER BY d.processed_date, d.id
+        ''')
+        document_ids = [row[0] for row in cursor.fetchall()]
+        conn.close()
+        return document_ids
+
+    except Exception as e:
+        logger.error(f"Error listing documents without fingerprints: {str(e)}")
+        return []
+
+def find_exact_duplicate(
+    md5: Optional[str] = None,
+    sha256: Optional[str] = None,
+    exclude_id: Optional[str] = None,
+    db_path: str = "data/documents.db"
+) -> Optional[str]:
+    """
+    Find a processed document with identical bytes.
+
+    Args:
+        md5: MD5 of the candidate PDF
+        sha256: SHA-256 of the candidate PDF
+        exclude_id: Drive ID of the candidate itself
+        db_path: Path to the SQLite database
+
+    Returns:
+        Optional[str]: ID of the canonical document, or None if there is none
+    """
+    try:
+        if not os.path.exists(db_path) or not (md5 or sha256):
+            return None
+
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        _ensure_tables(cursor)
+
+        for column, value in (("sha256", sha256), ("md5", md5)):
+            if not value:
+                continue
+            cursor.execute(
+                f"SELECT document_id FROM document_fingerprints WHERE {column} = ? AND document_id != ? LIMIT 1",
+                (value, exclude_id or '')
+            )
+            row = cursor.fetchone()
+            if row:
+                conn.close()
+                return row[0]
+
+        conn.close()
+        return None
+
+    except Exception as e:
+        logger.error(f"Error looking up duplicate by hash: {str(e)}")
+        return None
+
+def find_near_duplicate(
+    signature: Optional[List[int]],
+    exclude_id: Optional[str] = None,
+    threshold: float = NEAR_DUPLICATE_THRESHOLD,
+    db_path: str = "data/documents.db"
+) -> Optional[Tuple[str, float]]:
+    """
+    Find the processed document whose text is most similar, if above threshold.
+
+    Candidates come from the LSH band index, so only documents sharing at least
+    one band bucket are compared.
+
+    Args:
+        signature: MinHash signature of the candidate's text
+        exclude_id: Drive ID of the candidate itself
+        threshold: Minimum estimated Jaccard similarity
+        db_path: Path to the SQLite database
+
+    Returns:
+        Optional[Tuple[str, float]]: (canonical document ID, similarity) or None
+    """
+    try:
+        if not signature or not os.path.exists(db_path):
+            return None
+
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        _ensure_tables(cursor)
+
+        keys = _band_keys(signature)
+        clauses = " OR ".join(["(b.band = ? AND b.bucket = ?)"] * len(keys))
+        params = [value for key in keys for value in key]
+        cursor.execute(f'''
+        SELECT DISTINCT f.document_id, f.minhash
+        FROM document_minhash_bands b
+        JOIN document_fingerprints f ON f.document_id = b.document_id
+        WHERE ({clauses}) AND b.document_id != ?
+        ''', (*params, exclude_id or ''))
+        candidates = cursor.fetchall()
+        conn.close()
+
+        best = None
+        for document_id, blob in candidates:
+            similarity = estimate_similarity(signature, _decode_signature(blob))
+            if similarity >= threshold and (best is None or similarity > best[1]):
+                best = (document_id, similarity)
+        return best
+
+    except Exception as e:
+        logger.error(f"Error looking up near duplicates: {str(e)}")
+        return None
+
+def link_duplicate(
+    file: Dict[str, Any],
+    canonical_id: str,
+    match_type: str,
+    similarity: float = 1.0,
+    db_path: str = "data/documents.db"
+) -> bool:
+    """
+    Record a Drive file as a duplicate of an already processed document.
+
+    Args:
+        file: Drive file dictionary of the duplicate
+        canonical_id: ID of the document it duplicates
+        match_type: "md5", "sha256" or "minhash"
+        similarity: Estimated similarity (1.0 for exact matches)
+        db_path: Path to the SQLite database
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        _ensure_tables(cursor)
+
+        cursor.execute('''
+        INSERT OR REPLACE INTO document_duplicates (
+            file_id, canonical_id, name, drive_link, md5, match_type, similarity, detected_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            file['id'],
+            canonical_id,
+            file.get('name', ''),
+            file.get('webViewLink', ''),
+            file.get('md5Checksum'),
+            match_type,
+            similarity,
+            datetime.now().isoformat()
+        ))
+
+        conn.commit()
+        conn.close()
+        logger.info(f"Linked {file.get('name', file['id'])} to canonical document {canonical_id} ({match_type}, {similarity:.2f})")
+        return True
+
+    except Exception as e:
+        logger.error(f"Error linking duplicate {file.get('id')}: {str(e)}")
+        return False
+
+def get_duplicate(file_id: str, db_path: str = "data/documents.db") -> Optional[Dict[str, Any]]:
+    """Get the duplicate link of a Drive file, or None if it isn't a known duplicate."""
+    try:
+        if not os.path.exists(db_path):
+            return None
+
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        _ensure_tables(cursor)
+
+        cursor.execute("SELECT * FROM document_duplicates WHERE file_id = ?", (file_id,))
+        row = cursor.fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+    except Exception as e:
+        logger.error(f"Error retrieving duplicate link: {str(e)}")
+        return None
+
+def get_duplicates_of(canonical_id: str, db_path: str = "data/documents.db") -> List[Dict[str, Any]]:
+    """List the Drive files linked to a canonical document."""
+    try:
+        if not os.path.exists(db_path):
+            return []
+
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        _ensure_tables(cursor)
+
+        cursor.execute(
+            "SELECT * FROM document_duplicates WHERE canonical_id = ? ORDER BY detected_at",
+            (canonical_id,)
+        )
+        rows = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return rows
+
+    except Exception as e:
+        logger.error(f"Error listing duplicates: {str(e)}")
+        return []
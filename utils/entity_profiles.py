@@ -0,0 +1,405 @@
+import os
+import json
+import sqlite3
+import logging
+from collections import Counter
+from typing import Dict, Any, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Entity type -> (join table, entity ID column); the entity names live in the table named after the type
+ENTITY_TYPES = {
+    "authors": ("document_authors", "author_id"),
+    "affiliations": ("document_affiliations", "affiliation_id")
+}
+
+# Tags kept on each profile, by how many of the entity's documents carry them
+TOP_TAGS = 10
+
+# Orders for list_entity_profiles
+SORT_ORDERS = {
+    "documents": "p.document_count DESC, p.entity_id",
+    "recent": "p.last_date DESC, p.entity_id",
+    "name": "e.name"
+}
+
+_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS entity_profiles (
+        entity_type TEXT,
+        entity_id INTEGER,
+        document_count INTEGER,
+        first_date TEXT,
+        last_date TEXT,
+        top_tags TEXT DEFAULT '[]',
+        PRIMARY KEY (entity_type, entity_id)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_entity_profiles_document_count ON entity_profiles (entity_type, document_count DESC)',
+    'CREATE INDEX IF NOT EXISTS idx_entity_profiles_last_date ON entity_profiles (entity_type, last_date DESC)',
+    # Co-author / co-affiliation edges, stored in both directions
+    '''
+    CREATE TABLE IF NOT EXISTS entity_edges (
+        entity_type TEXT,
+        entity_id INTEGER,
+        other_id INTEGER,
+        weight INTEGER,
+        PRIMARY KEY (entity_type, entity_id, other_id)
+    ) WITHOUT ROWID
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_entity_edges_weight ON entity_edges (entity_type, entity_id, weight DESC)',
+    '''
+    CREATE TABLE IF NOT EXISTS entity_tag_counts (
+        entity_type TEXT,
+        entity_id INTEGER,
+        tag_id INTEGER,
+        count INTEGER,
+        PRIMARY KEY (entity_type, entity_id, tag_id)
+    ) WITHOUT ROWID
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_entity_tag_counts_count ON entity_tag_counts (entity_type, entity_id, count DESC)'
+)
+
+_TOP_TAGS_SQL = f'''
+    UPDATE entity_profiles SET top_tags = (
+        SELECT json_group_array(json_object('tag', name, 'count', count)) FROM (
+            SELECT t.name, c.count FROM entity_tag_counts c JOIN tags t ON t.id = c.tag_id
+            WHERE c.entity_type = entity_profiles.entity_type AND c.entity_id = entity_profiles.entity_id
+            ORDER BY c.count DESC, t.name LIMIT {TOP_TAGS}
+        )
+    )
+'''
+
+def _profiles_exist(cursor: sqlite3.Cursor) -> bool:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'entity_profiles'")
+    return cursor.fetchone() is not None
+
+def rebuild_entity_profiles(cursor: sqlite3.Cursor):
+    """Recompute every profile, edge and tag count from the join tables (the caller commits)."""
+    for statement in _SCHEMA:
+        cursor.execute(statement)
+    for table in ("entity_profiles", "entity_edges", "entity_tag_counts"):
+        cursor.execute(f"DELETE FROM {table}")
+
+    for entity_type, (join_table, column) in ENTITY_TYPES.items():
+        cursor.execute(f'''
+        INSERT INTO entity_profiles (entity_type, entity_id, document_count, first_date, last_date)
+        SELECT ?, j.{column}, COUNT(DISTINCT j.document_id), MIN(NULLIF(d.created_date, '')), MAX(NULLIF(d.created_date, ''))
+        FROM {join_table} j JOIN documents d ON d.id = j.document_id
+        GROUP BY j.{column}
+        ''', (entity_type,))
+        cursor.execute(f'''
+        INSERT INTO entity_edges (entity_type, entity_id, other_id, weight)
+        SELECT ?, a.{column}, b.{column}, COUNT(DISTINCT a.document_id)
+        FROM {join_table} a JOIN {join_table} b ON b.document_id = a.document_id AND b.{column} != a.{column}
+        JOIN documents d ON d.id = a.document_id
+        GROUP BY a.{column}, b.{column}
+        ''', (entity_type,))
+        cursor.execute(f'''
+        INSERT INTO entity_tag_counts (entity_type, entity_id, tag_id, count)
+        SELECT ?, j.{column}, dt.tag_id, COUNT(DISTINCT j.document_id)
+        FROM {join_table} j JOIN document_tags dt ON dt.document_id = j.document_id
+        JOIN documents d ON d.id = j.document_id
+        GROUP BY j.{column}, dt.tag_id
+        ''', (entity_type,))
+    cursor.execute(_TOP_TAGS_SQL)
+
+def ensure_entity_profiles(cursor: sqlite3.Cursor) -> bool:
+    """
+    Build the profile tables from the existing documents if this database doesn't have them yet.
+
+    Returns:
+        bool: True if the tables were just built
+    """
+    if _profiles_exist(cursor):
+        return False
+    rebuild_entity_profiles(cursor)
+    logger.info("Built author and affiliation profiles")
+    return True
+
+def refresh_entity_profiles(cursor: sqlite3.Cursor):
+    """Rebuild the profiles after a bulk rewrite of the join tables, if this database has them."""
+    if _profiles_exist(cursor):
+        rebuild_entity_profiles(cursor)
+
+def document_entities(cursor: sqlite3.Cursor, document_id: str) -> Dict[str, Any]:
+    """
+    The entities, tags and date a document currently contributes to the profiles.
+
+    Take this before a document's relationships are rewritten and pass it to
+    update_entity_profiles afterwards.
+    """
+    cursor.execute("SELECT created_date FROM documents WHERE id = ?", (document_id,))
+    row = cursor.fetchone()
+    snapshot = {
+        "date": (row[0] or None) if row else None,
+        "tags": {tag_id for tag_id, in cursor.execute("SELECT tag_id FROM document_tags WHERE document_id = ?", (document_id,))}
+    }
+    for entity_type, (join_table, column) in ENTITY_TYPES.items():
+        cursor.execute(f"SELECT {column} FROM {join_table} WHERE document_id = ?", (document_id,))
+        snapshot[entity_type] = {entity_id for entity_id, in cursor.fetchall()}
+    return snapshot
+
+def _contributions(snapshot: Dict[str, Any]):
+    """Profile, edge and tag count increments one document adds."""
+    profiles, edges, tag_counts = Counter(), Counter(), Counter()
+    for entity_type in ENTITY_TYPES:
+        entity_ids = snapshot.get(entity_type, set())
+        for entity_id in entity_ids:
+            profiles[(entity_type, entity_id)] += 1
+            for other_id in entity_ids:
+                if other_id != entity_id:
+                    edges[(entity_type, entity_id, other_id)] += 1
+            for tag_id in snapshot["tags"]:
+                tag_counts[(entity_type, entity_id, tag_id)] += 1
+    return profiles, edges, tag_counts
+
+def _apply_delta(cursor: sqlite3.Cursor, table: str, keys: List[str], value: str, current: Counter, previous: Counter) -> Set[tuple]:
+    """Add current - previous to a counter table, dropping rows that reach zero; returns the changed keys."""
+    delta = Counter(current)
+    delta.subtract(previous)
+    changes = [(*key, change) for key, change in delta.items() if change]
+    if not changes:
+        return set()
+    key_list = ", ".join(keys)
+    cursor.executemany(f'''
+    INSERT INTO {table} ({key_list}, {value}) VALUES ({", ".join("?" * (len(keys) + 1))})
+    ON CONFLICT ({key_list}) DO UPDATE SET {value} = {value} + excluded.{value}
+    ''', changes)
+    cursor.executemany(
+        f"DELETE FROM {table} WHERE {' AND '.join(f'{key} = ?' for key in keys)} AND {value} <= 0",
+        [change[:-1] for change in changes]
+    )
+    return {change[:-1] for change in changes}
+
+def update_entity_profiles(cursor: sqlite3.Cursor, document_id: str, previous: Optional[Dict[str, Any]] = None):
+    """
+    Apply one document write to the profiles, in the caller's transaction.
+
+    Only the difference between the document's previous and current entities
+    is written, so re-saving a document with the same authors, affiliations
+    and tags touches nothing but the affected dates.
+
+    Args:
+        cursor: Cursor on the database the document was just written to
+        document_id: ID of the written document
+        previous: document_entities() from before the write, or None for a new document
+    """
+    if ensure_entity_profiles(cursor):
+        # Built from the join tables, which already hold this write
+        return
+    current = document_entities(cursor, document_id)
+    previous = previous or {"date": None, "tags": set(), **{entity_type: set() for entity_type in ENTITY_TYPES}}
+    current_profiles, current_edges, current_tags = _contributions(current)
+    previous_profiles, previous_edges, previous_tags = _contributions(previous)
+
+    _apply_delta(cursor, "entity_profiles", ["entity_type", "entity_id"], "document_count", current_profiles, previous_profiles)
+    _apply_delta(cursor, "entity_edges", ["entity_type", "entity_id", "other_id"], "weight", current_edges, previous_edges)
+    changed_tags = _apply_delta(cursor, "entity_tag_counts", ["entity_type", "entity_id", "tag_id"], "count", current_tags, previous_tags)
+
+    # A new date can only widen an entity's date range...
+    if current["date"]:
+        cursor.executemany('''
+        UPDATE entity_profiles SET
+            first_date = CASE WHEN first_date IS NULL OR ? < first_date THEN ? ELSE first_date END,
+            last_date = CASE WHEN last_date IS NULL OR ? > last_date THEN ? ELSE last_date END
+        WHERE entity_type = ? AND entity_id = ?
+        ''', [(current["date"],) * 4 + key for key in current_profiles])
+    # ...while a removed one means reading the entity's remaining documents
+    if previous["date"]:
+        for entity_type, entity_id in previous_profiles:
+            if (entity_type, entity_id) in current_profiles and current["date"] == previous["date"]:
+                continue
+            join_table, column = ENTITY_TYPES[entity_type]
+            cursor.execute(f'''
+            UPDATE entity_profiles SET (first_date, last_date) = (
+                SELECT MIN(NULLIF(d.created_date, '')), MAX(NULLIF(d.created_date, ''))
+                FROM {join_table} j JOIN documents d ON d.id = j.document_id WHERE j.{column} = ?
+            ) WHERE entity_type = ? AND entity_id = ?
+            ''', (entity_id, entity_type, entity_id))
+
+    touched = {key[:2] for key in changed_tags}
+    if touched:
+        cursor.executemany(_TOP_TAGS_SQL + " WHERE entity_type = ? AND entity_id = ?", touched)
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    if ensure_entity_profiles(conn.cursor()):
+        conn.commit()
+    return conn
+
+def _profile(row: sqlite3.Row) -> Dict[str, Any]:
+    profile = dict(row)
+    profile["top_tags"] = json.loads(profile["top_tags"] or "[]")
+    return profile
+
+def list_entity_profiles(
+    entity_type: str,
+    db_path: str = "data/documents.db",
+    sort: str = "documents",
+    limit: int = 50,
+    offset: int = 0,
+    name: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Page through author or affiliation profiles.
+
+    Args:
+        entity_type: "authors" or "affiliations"
+        db_path: Path to the SQLite database
+        sort: One of SORT_ORDERS
+        limit: Profiles per page
+        offset: Profiles to skip
+        name: Only the entity with exactly this name
+
+    Returns:
+        Dict[str, Any]: Status, total entity count and the page of profiles
+    """
+    try:
+        if not os.path.exists(db_path):
+            return {"status": "error", "message": f"Database not found: {db_path}"}
+        conn = _connect(db_path)
+        try:
+            where, params = "p.entity_type = ?", [entity_type]
+            if name is not None:
+                where += " AND e.name = ?"
+                params.append(name)
+            total = conn.execute(f'''
+            SELECT COUNT(*) FROM entity_profiles p JOIN {entity_type} e ON e.id = p.entity_id WHERE {where}
+            ''', params).fetchone()[0]
+            rows = conn.execute(f'''
+            SELECT p.entity_id AS id, e.name, p.document_count, p.first_date, p.last_date, p.top_tags
+            FROM entity_profiles p JOIN {entity_type} e ON e.id = p.entity_id
+            WHERE {where} ORDER BY {SORT_ORDERS[sort]} LIMIT ? OFFSET ?
+            ''', params + [limit, offset]).fetchall()
+        finally:
+            conn.close()
+        return {
+            "status": "success",
+            "entity_type": entity_type,
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "entities": [_profile(row) for row in rows]
+        }
+    except Exception as e:
+        logger.error(f"Error listing {entity_type} profiles: {str(e)}")
+        return {"status": "error", "message": str(e)}
+
+def get_entity_profile(
+    entity_type: str,
+    entity_id: int,
+    db_path: str = "data/documents.db",
+    limit: int = 20,
+    offset: int = 0
+) -> Optional[Dict[str, Any]]:
+    """
+    Get one author's or affiliation's profile with a page of its collaborators.
+
+    Collaborators are the co-authors of an author, or the affiliations that
+    appear on the same documents as an affiliation, by shared document count.
+
+    Args:
+        entity_type: "authors" or "affiliations"
+        entity_id: ID in the authors or affiliations table
+        db_path: Path to the SQLite database
+        limit: Collaborators per page
+        offset: Collaborators to skip
+
+    Returns:
+        Optional[Dict[str, Any]]: The profile, or None if the entity has no documents
+    """
+    try:
+        if not os.path.exists(db_path):
+            return None
+        conn = _connect(db_path)
+        try:
+            row = conn.execute(f'''
+            SELECT p.entity_id AS id, e.name, p.document_count, p.first_date, p.last_date, p.top_tags
+            FROM entity_profiles p JOIN {entity_type} e ON e.id = p.entity_id
+            WHERE p.entity_type = ? AND p.entity_id = ?
+            ''', (entity_type, entity_id)).fetchone()
+            if row is None:
+                return None
+            profile = _profile(row)
+            profile["collaborator_count"] = conn.execute(
+                "SELECT COUNT(*) FROM entity_edges WHERE entity_type = ? AND entity_id = ?", (entity_type, entity_id)
+            ).fetchone()[0]
+            profile["collaborators"] = [dict(edge) for edge in conn.execute(f'''
+            SELECT g.other_id AS id, e.name, g.weight AS shared_documents
+            FROM entity_edges g JOIN {entity_type} e ON e.id = g.other_id
+            WHERE g.entity_type = ? AND g.entity_id = ?
+            ORDER BY g.weight DESC, g.other_id LIMIT ? OFFSET ?
+            ''', (entity_type, entity_id, limit, offset))]
+        finally:
+            conn.close()
+        return profile
+    except Exception as e:
+        logger.error(f"Error getting {entity_type} profile {entity_id}: {str(e)}")
+        return None
+
+def get_entity_documents(
+    entity_type: str,
+    entity_id: int,
+    db_path: str = "data/documents.db",
+    limit: int = 50,
+    offset: int = 0
+) -> Dict[str, Any]:
+    """
+    Page through an author's or affiliation's documents, newest first.
+
+    Args:
+        entity_type: "authors" or "affiliations"
+        entity_id: ID in the authors or affiliations table
+        db_path: Path to the SQLite database
+        limit: Documents per page
+        offset: Documents to skip
+
+    Returns:
+        Dict[str, Any]: Status, total document count and the page of documents
+    """
+    try:
+        if not os.path.exists(db_path):
+            return {"status": "error", "message": f"Database not found: {db_path}"}
+        join_table, column = ENTITY_TYPES[entity_type]
+        conn = _connect(db_path)
+        try:
+            row = conn.execute(
+                "SELECT document_count FROM entity_profiles WHERE entity_type = ? AND entity_id = ?", (entity_type, entity_id)
+            ).fetchone()
+            documents = [dict(doc) for doc in conn.execute(f'''
+            SELECT DISTINCT d.id, d.name, d.drive_link, d.created_date, d.title, d.summary, d.document_type
+            FROM {join_table} j JOIN documents d ON d.id = j.document_id
+            WHERE j.{column} = ?
+            ORDER BY d.created_date DESC, d.id LIMIT ? OFFSET ?
+            ''', (entity_id, limit, offset))]
+        finally:
+            conn.close()
+        return {
+            "status": "success",
+            "entity_type": entity_type,
+            "id": entity_id,
+            "total": row[0] if row else 0,
+            "limit": limit,
+            "offset": offset,
+            "documents": documents
+        }
+    except Exception as e:
+        logger.error(f"Error getting documents for {entity_type} {entity_id}: {str(e)}")
+        return {"status": "error", "message": str(e)}
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rebuild the author and affiliation profiles")
+    parser.add_argument("--db", default="data/documents.db", help="Path to the SQLite database")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    rebuild_entity_profiles(conn.cursor())
+    conn.commit()
+    for entity_type in ENTITY_TYPES:
+        count = conn.execute("SELECT COUNT(*) FROM entity_profiles WHERE entity_type = ?", (entity_type,)).fetchone()[0]
+        print(f"{entity_type}: {count} profiles")
+    conn.close()
@@ -0,0 +1,258 @@
+import os
+import sqlite3
+import logging
+import threading
+from datetime import date, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from utils.tag_canonicalization import canonicalize_tags
+
+logger = logging.getLogger(__name__)
+
+# Columns results can be sorted by
+SORT_FIELDS = ("created_date", "processed_date", "added_date", "title")
+
+_indexed_databases = set()
+_indexed_lock = threading.Lock()
+
+def _ensure_indexes(conn: sqlite3.Connection, db_path: str):
+    """Indexes for document filters and sorting (the join tables are indexed when the database is created)."""
+    with _indexed_lock:
+        if db_path in _indexed_databases:
+            return
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_documents_document_type ON documents (document_type)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_documents_created_date ON documents (created_date)')
+        conn.commit()
+        _indexed_databases.add(db_path)
+
+def _date_bound(value: str) -> str:
+    """Exclusive upper bound for a date_to filter; a bare date includes that whole day."""
+    if len(value) == 10:
+        return (date.fromisoformat(value) + timedelta(days=1)).isoformat()
+    return value
+
+def _placeholders(values: List[Any]) -> str:
+    return ",".join("?" * len(values))
+
+def _match_sets(
+    tags: List[str],
+    any_tags: List[str],
+    authors: List[str],
+    affiliations: List[str],
+    document_types: List[str],
+    date_from: Optional[str],
+    date_to: Optional[str]
+) -> Tuple[List[str], List[Any]]:
+    """
+    One SELECT of document IDs per filter; the result set is their INTERSECT.
+
+    Every tag in tags is its own set (AND); any_tags, authors and affiliations
+    each form one set matching any of their values (OR). Each set is read from
+    the tag_id / author_id / affiliation_id index of its join table.
+    """
+    sets, params = [], []
+    for tag in tags:
+        sets.append("SELECT dt.document_id FROM document_tags dt JOIN tags t ON t.id = dt.tag_id WHERE t.name = ?")
+        params.append(tag)
+    if any_tags:
+        sets.append(f"SELECT dt.document_id FROM document_tags dt JOIN tags t ON t.id = dt.tag_id WHERE t.name IN ({_placeholders(any_tags)})")
+        params.extend(any_tags)
+    if authors:
+        sets.append(f"SELECT da.document_id FROM document_authors da JOIN authors a ON a.id = da.author_id WHERE a.name IN ({_placeholders(authors)})")
+        params.extend(authors)
+    if affiliations:
+        sets.append(f"SELECT da.document_id FROM document_affiliations da JOIN affiliations a ON a.id = da.affiliation_id WHERE a.name IN ({_placeholders(affiliations)})")
+        params.extend(affiliations)
+
+    conditions = []
+    if document_types:
+        conditions.append(f"document_type IN ({_placeholders(document_types)})")
+        params.extend(document_types)
+    if date_from:
+        conditions.append("created_date >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append("created_date < ?")
+        params.append(_date_bound(date_to))
+    if conditions or not sets:
+        sets.append("SELECT id FROM documents" + (" WHERE " + " AND ".join(conditions) if conditions else ""))
+    return sets, params
+
+def _facet_counts(cursor: sqlite3.Cursor, facet_limit: int) -> Dict[str, List[Dict[str, Any]]]:
+    """Value counts over the matched documents for every facet."""
+    queries = {
+        "tags": '''
+            SELECT t.name, COUNT(*) AS count FROM facet_matches m
+            JOIN document_tags dt ON dt.document_id = m.id JOIN tags t ON t.id = dt.tag_id
+            GROUP BY dt.tag_id ORDER BY count DESC, t.name LIMIT ?''',
+        "authors": '''
+            SELECT a.name, COUNT(*) AS count FROM facet_matches m
+            JOIN document_authors da ON da.document_id = m.id JOIN authors a ON a.id = da.author_id
+            GROUP BY da.author_id ORDER BY count DESC, a.name LIMIT ?''',
+        "affiliations": '''
+            SELECT a.name, COUNT(*) AS count FROM facet_matches m
+            JOIN document_affiliations da ON da.document_id = m.id JOIN affiliations a ON a.id = da.affiliation_id
+            GROUP BY da.affiliation_id ORDER BY count DESC, a.name LIMIT ?''',
+        "document_type": '''
+            SELECT d.document_type, COUNT(*) AS count FROM facet_matches m JOIN documents d ON d.id = m.id
+            GROUP BY d.document_type ORDER BY count DESC LIMIT ?''',
+        "year": '''
+            SELECT substr(d.created_date, 1, 4) AS year, COUNT(*) AS count FROM facet_matches m JOIN documents d ON d.id = m.id
+            WHERE d.created_date != '' GROUP BY year ORDER BY year DESC LIMIT ?'''
+    }
+    return {
+        facet: [{"value": value, "count": count} for value, count in cursor.execute(query, (facet_limit,))]
+        for facet, query in queries.items()
+    }
+
+def _attach_entities(cursor: sqlite3.Cursor, documents: List[Dict[str, Any]]):
+    """Add authors, affiliations and tags to a page of documents with one query each."""
+    if not documents:
+        return
+    by_id = {doc["id"]: doc for doc in documents}
+    for doc in documents:
+        doc.update(authors=[], affiliations=[], tags=[])
+    ids = list(by_id)
+    in_ids = _placeholders(ids)
+    for document_id, name in cursor.execute(f'''
+        SELECT da.document_id, a.name FROM document_authors da JOIN authors a ON a.id = da.author_id
+        WHERE da.document_id IN ({in_ids}) ORDER BY da.document_id, da.author_order''', ids):
+        by_id[document_id]["authors"].append(name)
+    for document_id, name in cursor.execute(f'''
+        SELECT da.document_id, a.name FROM document_affiliations da JOIN affiliations a ON a.id = da.affiliation_id
+        WHERE da.document_id IN ({in_ids}) ORDER BY da.document_id, da.affiliation_order''', ids):
+        by_id[document_id]["affiliations"].append(name)
+    for document_id, name in cursor.execute(f'''
+        SELECT dt.document_id, t.name FROM document_tags dt JOIN tags t ON t.id = dt.tag_id
+        WHERE dt.document_id IN ({in_ids})''', ids):
+        by_id[document_id]["tags"].append(name)
+
+def faceted_search(
+    db_path: str = "data/documents.db",
+    tags: Optional[List[str]] = None,
+    any_tags: Optional[List[str]] = None,
+    authors: Optional[List[str]] = None,
+    affiliations: Optional[List[str]] = None,
+    document_types: Optional[List[str]] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    sort: str = "created_date",
+    descending: bool = True,
+    limit: int = 50,
+    offset: int = 0,
+    facet_limit: int = 20,
+    include_analysis: bool = False
+) -> Dict[str, Any]:
+    """
+    Filter documents by tags, entities, type and date, with facet counts for the result set.
+
+    The matching document IDs are computed once into a temporary table as the
+    INTERSECT of one indexed lookup per filter; the page, the total and every
+    facet are then read by joining against it on the same connection.
+
+    Args:
+        db_path: Path to the SQLite database
+        tags: Documents must have all of these tags
+        any_tags: Documents must have at least one of these tags
+        authors: Documents by any of these authors
+        affiliations: Documents from any of these affiliations
+        document_types: Documents of any of these types
+        date_from: Earliest created_date (ISO date or timestamp, inclusive)
+        date_to: Latest created_date (a bare date includes the whole day)
+        sort: One of SORT_FIELDS
+        descending: Sort order
+        limit: Documents per page
+        offset: Documents to skip
+        facet_limit: Values returned per facet
+        include_analysis: Include the full analysis text of each document
+
+    Returns:
+        Dict[str, Any]: Status, total match count, the page of documents (with
+            authors, affiliations and tags) and facets with value counts
+    """
+    try:
+        if not os.path.exists(db_path):
+            return {"status": "error", "message": f"Database not found: {db_path}"}
+        if sort not in SORT_FIELDS:
+            return {"status": "error", "message": f"sort must be one of {', '.join(SORT_FIELDS)}"}
+
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            _ensure_indexes(conn, db_path)
+            cursor = conn.cursor()
+
+            # Tags are stored in canonical form, so filter values are too
+            sets, params = _match_sets(
+                canonicalize_tags(tags or [], cursor=cursor),
+                canonicalize_tags(any_tags or [], cursor=cursor),
+                authors or [],
+                affiliations or [],
+                document_types or [],
+                date_from,
+                date_to
+            )
+            cursor.execute("CREATE TEMP TABLE facet_matches (id TEXT PRIMARY KEY)")
+            cursor.execute(f"INSERT INTO facet_matches (id) {' INTERSECT '.join(sets)}", params)
+            total = cursor.execute("SELECT COUNT(*) FROM facet_matches").fetchone()[0]
+
+            columns = "d.*" if include_analysis else "d.id, d.name, d.drive_link, d.created_date, d.added_date, d.processed_date, d.title, d.summary, d.document_type"
+            documents = [dict(row) for row in cursor.execute(f'''
+                SELECT {columns} FROM facet_matches m JOIN documents d ON d.id = m.id
+                ORDER BY d.{sort} {"DESC" if descending else "ASC"}, d.id
+                LIMIT ? OFFSET ?''', (limit, offset))]
+            _attach_entities(cursor, documents)
+            facets = _facet_counts(cursor, facet_limit)
+        finally:
+            conn.close()
+
+        return {
+            "status": "success",
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "documents": documents,
+            "facets": facets
+        }
+    except Exception as e:
+        logger.error(f"Error running faceted search: {str(e)}")
+        return {"status": "error", "message": str(e)}
+
+def matching_document_ids(
+    db_path: str = "data/documents.db",
+    tags: Optional[List[str]] = None,
+    any_tags: Optional[List[str]] = None,
+    authors: Optional[List[str]] = None,
+    affiliations: Optional[List[str]] = None,
+    document_types: Optional[List[str]] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+) -> List[str]:
+    """
+    IDs of the documents matching the same filters as faceted_search, without the page or facets.
+
+    Returns:
+        List[str]: Matching document IDs (empty on error)
+    """
+    try:
+        if not os.path.exists(db_path):
+            return []
+        conn = sqlite3.connect(db_path)
+        try:
+            _ensure_indexes(conn, db_path)
+            cursor = conn.cursor()
+            sets, params = _match_sets(
+                canonicalize_tags(tags or [], cursor=cursor),
+                canonicalize_tags(any_tags or [], cursor=cursor),
+                authors or [],
+                affiliations or [],
+                document_types or [],
+                date_from,
+                date_to
+            )
+            return [document_id for document_id, in cursor.execute(' INTERSECT '.join(sets), params)]
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.error(f"Error matching documents: {str(e)}")
+        return []
@@ -0,0 +1,312 @@
+import os
+import time
+import atexit
+import sqlite3
+import logging
+import threading
+import contextvars
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Set METRICS_ENABLED=false to turn instrumentation into a no-op
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() != 'false'
+
+# Where per-document stage measurements are kept
+METRICS_DB = os.getenv('METRICS_DB', 'data/metrics.db')
+
+# Seconds between batched writes of queued measurements to METRICS_DB
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '2'))
+
+# Upper bounds (seconds) of the Prometheus latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Document the current task is working on, used when a stage doesn't pass one
+_current_document: contextvars.ContextVar = contextvars.ContextVar('metrics_document', default=None)
+
+class Measurement:
+    """
+    Times one stage run; use as a (sync or async) context manager.
+
+    Wall time is always measured. CPU time is the calling thread's CPU time,
+    which is only meaningful for synchronous stages: async stages record no CPU
+    time because other coroutines run on the same thread while they wait.
+    Set bytes, tokens_in and tokens_out on the measurement before it exits, and
+    failed for runs that fail without raising.
+    """
+
+    def __init__(self, recorder: "MetricsRecorder", stage: str, document_id: Optional[str] = None, cpu: bool = True):
+        self.recorder = recorder
+        self.stage = stage
+        self.document_id = document_id or _current_document.get()
+        self.cpu = cpu
+        self.bytes = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.failed = False
+        self.cpu_seconds: Optional[float] = None
+        self._started = 0.0
+        self._cpu_started = 0.0
+
+    def __enter__(self) -> "Measurement":
+        self._started = time.perf_counter()
+        if self.cpu:
+            self._cpu_started = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        wall_seconds = time.perf_counter() - self._started
+        if self.cpu and self.cpu_seconds is None:
+            self.cpu_seconds = time.thread_time() - self._cpu_started
+        self.recorder.record(
+            self.stage,
+            document_id=self.document_id,
+            wall_seconds=wall_seconds,
+            cpu_seconds=self.cpu_seconds,
+            bytes_count=self.bytes,
+            tokens_in=self.tokens_in,
+            tokens_out=self.tokens_out,
+            error=self.failed or exc_type is not None
+        )
+        return False
+
+    async def __aenter__(self) -> "Measurement":
+        self.cpu = False
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        return self.__exit__(exc_type, exc, tb)
+
+class _StageTotals:
+    """Running totals of one stage for the Prometheus endpoint."""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.bytes = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+class MetricsRecorder:
+    """
+    Collects stage measurements for the ingest path.
+
+    Totals since process start are kept in memory and rendered in Prometheus
+    text format; every measurement is also written to the stage_metrics table
+    so the breakdown of a single document survives restarts. Recording only
+    queues the row: a background thread writes the queue in one transaction
+    every flush_interval seconds, so measured stages (many on the event loop)
+    never wait for SQLite.
+    """
+
+    def __init__(self, db_path: str = METRICS_DB, enabled: bool = METRICS_ENABLED, flush_interval: float = METRICS_FLUSH_INTERVAL):
+        """Initialize the recorder; the database and writer thread start with the first measurement."""
+        self.db_path = db_path
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self._totals: Dict[str, _StageTotals] = {}
+        self._pending: List[Tuple] = []
+        self._lock = threading.Lock()
+        # Guards the connection, which the writer thread and readers share
+        self._db_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writer: Optional[threading.Thread] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            # Measurements are cheap to lose and written from every worker thread
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS stage_metrics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                document_id TEXT,
+                stage TEXT,
+                wall_seconds REAL,
+                cpu_seconds REAL,
+                bytes INTEGER,
+                tokens_in INTEGER,
+                tokens_out INTEGER,
+                error INTEGER,
+                created_at TEXT
+            )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_stage_metrics_document_id ON stage_metrics (document_id)')
+            self._conn.commit()
+        return self._conn
+
+    def measure(self, stage: str, document_id: Optional[str] = None, cpu: bool = True) -> Measurement:
+        """Measure a stage run, e.g. `with recorder.measure("extract", file_id) as m: ...`."""
+        return Measurement(self, stage, document_id, cpu)
+
+    def record(
+        self,
+        stage: str,
+        document_id: Optional[str] = None,
+        wall_seconds: float = 0.0,
+        cpu_seconds: Optional[float] = None,
+        bytes_count: int = 0,
+        tokens_in: int = 0,
+        tokens_out: int = 0,
+        error: bool = False
+    ):
+        """
+        Record one stage run.
+
+        Args:
+            stage: Stage name, e.g. "download" or "gemini.analysis"
+            document_id: Drive ID of the document the work was for (None for batch-level stages)
+            wall_seconds: Elapsed wall-clock time
+            cpu_seconds: CPU time used, if known
+            bytes_count: Bytes read, written or transferred by the stage
+            tokens_in: LLM prompt tokens
+            tokens_out: LLM output tokens
+            error: Whether the run failed
+        """
+        if not self.enabled:
+            return
+        try:
+            with self._lock:
+                totals = self._totals.setdefault(stage, _StageTotals())
+                totals.count += 1
+                totals.errors += int(error)
+                totals.wall_seconds += wall_seconds
+                totals.cpu_seconds += cpu_seconds or 0.0
+                totals.bytes += bytes_count
+                totals.tokens_in += tokens_in
+                totals.tokens_out += tokens_out
+                for index, bound in enumerate(LATENCY_BUCKETS):
+                    if wall_seconds <= bound:
+                        totals.buckets[index] += 1
+
+                self._pending.append((
+                    document_id, stage, wall_seconds, cpu_seconds, bytes_count,
+                    tokens_in, tokens_out, int(error), datetime.now().isoformat()
+                ))
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_periodically, name="metrics-writer", daemon=True)
+                    self._writer.start()
+                    atexit.register(self.flush)
+        except Exception as e:
+            # Instrumentation must never break processing
+            logger.error(f"Error recording metrics for {stage}: {str(e)}")
+
+    def _write_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Write the queued measurements to the database now."""
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return
+        try:
+            with self._db_lock:
+                conn = self._connect()
+                conn.executemany('''
+                INSERT INTO stage_metrics (document_id, stage, wall_seconds, cpu_seconds, bytes, tokens_in, tokens_out, error, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Error writing {len(rows)} metrics: {str(e)}")
+
+    def document_breakdown(self, document_id: str) -> Dict[str, Any]:
+        """
+        Get the per-stage timing breakdown of a document.
+
+        Returns:
+            Dict[str, Any]: Totals and one entry per stage in the order stages first ran
+        """
+        breakdown = {"document_id": document_id, "wall_seconds": 0.0, "cpu_seconds": 0.0, "stages": []}
+        self.flush()
+        try:
+            with self._db_lock:
+                rows = self._connect().execute('''
+                SELECT stage, COUNT(*) AS runs, SUM(error) AS errors,
+                       SUM(wall_seconds) AS wall_seconds, SUM(cpu_seconds) AS cpu_seconds,
+                       SUM(bytes) AS bytes, SUM(tokens_in) AS tokens_in, SUM(tokens_out) AS tokens_out
+                FROM stage_metrics WHERE document_id = ?
+                GROUP BY stage ORDER BY MIN(id)
+                ''', (document_id,)).fetchall()
+        except Exception as e:
+            logger.error(f"Error retrieving metrics for {document_id}: {str(e)}")
+            return breakdown
+
+        for row in rows:
+            stage = dict(row)
+            stage["wall_seconds"] = round(stage["wall_seconds"] or 0.0, 4)
+            stage["cpu_seconds"] = round(stage["cpu_seconds"], 4) if stage["cpu_seconds"] is not None else None
+            breakdown["stages"].append(stage)
+        breakdown["wall_seconds"] = round(sum(stage["wall_seconds"] for stage in breakdown["stages"]), 4)
+        breakdown["cpu_seconds"] = round(sum(stage["cpu_seconds"] or 0.0 for stage in breakdown["stages"]), 4)
+        return breakdown
+
+    def render_prometheus(self) -> str:
+        """Render the in-memory totals in the Prometheus text exposition format."""
+        with self._lock:
+            totals = {stage: vars(stage_totals).copy() for stage, stage_totals in sorted(self._totals.items())}
+
+        lines = [
+            "# HELP ingest_stage_seconds Wall-clock time spent in each ingest stage.",
+            "# TYPE ingest_stage_seconds histogram"
+        ]
+        for stage, values in totals.items():
+            # Buckets are filled per bound, which is already cumulative
+            for bound, count in zip(LATENCY_BUCKETS, values["buckets"]):
+                lines.append(f'ingest_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'ingest_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {values["count"]}')
+            lines.append(f'ingest_stage_seconds_sum{{stage="{stage}"}} {values["wall_seconds"]:.6f}')
+            lines.append(f'ingest_stage_seconds_count{{stage="{stage}"}} {values["count"]}')
+
+        counters = [
+            ("ingest_stage_cpu_seconds_total", "CPU time spent in each ingest stage (synchronous stages only).", "cpu_seconds"),
+            ("ingest_stage_errors_total", "Failed runs of each ingest stage.", "errors"),
+            ("ingest_stage_bytes_total", "Bytes moved by each ingest stage.", "bytes"),
+            ("ingest_llm_prompt_tokens_total", "Prompt tokens sent by each LLM stage.", "tokens_in"),
+            ("ingest_llm_output_tokens_total", "Output tokens received by each LLM stage.", "tokens_out")
+        ]
+        for name, description, field in counters:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} counter")
+            for stage, values in totals.items():
+                lines.append(f'{name}{{stage="{stage}"}} {values[field]}')
+        return "\n".join(lines) + "\n"
+
+_recorder = MetricsRecorder()
+
+def get_metrics_recorder() -> MetricsRecorder:
+    """Get the process-wide metrics recorder."""
+    return _recorder
+
+def set_metrics_recorder(recorder: MetricsRecorder):
+    """Replace the process-wide metrics recorder (e.g. to write to another database)."""
+    global _recorder
+    _recorder = recorder
+
+def measure(stage: str, document_id: Optional[str] = None, cpu: bool = True) -> Measurement:
+    """Measure a stage run with the process-wide recorder."""
+    return _recorder.measure(stage, document_id, cpu)
+
+def record(stage: str, document_id: Optional[str] = None, **fields):
+    """Record a stage run measured elsewhere with the process-wide recorder."""
+    _recorder.record(stage, document_id, **fields)
+
+@contextmanager
+def document_scope(document_id: str):
+    """Attribute measurements without an explicit document to document_id."""
+    token = _current_document.set(document_id)
+    try:
+        yield
+    finally:
+        _current_document.reset(token)
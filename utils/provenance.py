@@ -0,0 +1,235 @@
+import os
+import sqlite3
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+def prompt_hash(*templates: str) -> str:
+    """Short, stable version of the prompt templates a field is generated from."""
+    return hashlib.sha256("\x00".join(templates).encode("utf-8")).hexdigest()[:16]
+
+def _ensure_table(cursor: sqlite3.Cursor):
+    """
+    One row per document and LLM-derived field: the prompt version and model that
+    produced the stored value, and when. Indexed by field and version so the
+    documents still on an old prompt are found without scanning the others.
+    """
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS field_provenance (
+        document_id TEXT,
+        field TEXT,
+        prompt_hash TEXT,
+        model TEXT,
+        generated_at TEXT,
+        PRIMARY KEY (document_id, field)
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_field_provenance_version ON field_provenance (field, prompt_hash, model)')
+
+def _has_table(cursor: sqlite3.Cursor) -> bool:
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'field_provenance'")
+    return cursor.fetchone() is not None
+
+def record_provenance(cursor: sqlite3.Cursor, document_id: str, provenance: Dict[str, Dict[str, str]]):
+    """
+    Record how fields of a document were generated, in the caller's transaction.
+
+    Args:
+        cursor: Cursor of the transaction writing the field values
+        document_id: Document the fields belong to
+        provenance: Field -> {"prompt_hash", "model", "generated_at"}
+    """
+    if not provenance:
+        return
+    _ensure_table(cursor)
+    cursor.executemany('''
+    INSERT INTO field_provenance (document_id, field, prompt_hash, model, generated_at)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (document_id, field) DO UPDATE SET
+        prompt_hash = excluded.prompt_hash,
+        model = excluded.model,
+        generated_at = excluded.generated_at
+    ''', [
+        (document_id, field, entry["prompt_hash"], entry["model"], entry.get("generated_at") or datetime.now().isoformat())
+        for field, entry in provenance.items()
+    ])
+
+def get_provenance(document_id: str, db_path: str = "data/documents.db") -> Dict[str, Dict[str, str]]:
+    """
+    How each recorded field of a document was generated.
+
+    Returns:
+        Dict[str, Dict[str, str]]: Field -> prompt_hash, model and generated_at
+            (empty if nothing was recorded)
+    """
+    try:
+        if not os.path.exists(db_path):
+            return {}
+        conn = sqlite3.connect(db_path)
+        try:
+            cursor = conn.cursor()
+            if not _has_table(cursor):
+                return {}
+            cursor.execute(
+                "SELECT field, prompt_hash, model, generated_at FROM field_provenance WHERE document_id = ? ORDER BY field",
+                (document_id,)
+            )
+            return {
+                field: {"prompt_hash": version, "model": model, "generated_at": generated_at}
+                for field, version, model, generated_at in cursor.fetchall()
+            }
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.error(f"Error getting provenance of {document_id}: {str(e)}")
+        return {}
+
+def _stale_query(model: Optional[str]) -> str:
+    """Documents whose value of a field is unrecorded, or from another prompt version (or model)."""
+    return f'''
+        SELECT d.id FROM documents d
+        LEFT JOIN field_provenance p ON p.document_id = d.id AND p.field = ?
+        WHERE p.document_id IS NULL OR p.prompt_hash != ?{" OR p.model != ?" if model else ""}'''
+
+def stale_documents(
+    versions: Dict[str, str],
+    model: Optional[str] = None,
+    db_path: str = "data/documents.db"
+) -> Dict[str, List[str]]:
+    """
+    Documents to regenerate per field after a prompt (or model) change.
+
+    A document's field is stale when no provenance was recorded for it, or it
+    was generated from a different prompt version, or by a different model
+    when model is given.
+
+    Args:
+        versions: Field -> current prompt version (only these fields are checked)
+        model: Current model name; None ignores which model generated a field
+        db_path: Path to the SQLite database
+
+    Returns:
+        Dict[str, List[str]]: Field -> stale document IDs (empty on error)
+    """
+    try:
+        if not os.path.exists(db_path):
+            return {}
+        conn = sqlite3.connect(db_path)
+        try:
+            cursor = conn.cursor()
+            _ensure_table(cursor)
+            query = _stale_query(model) + " ORDER BY d.processed_date, d.id"
+            return {
+                field: [document_id for document_id, in cursor.execute(query, (field, version, model) if model else (field, version))]
+                for field, version in versions.items()
+            }
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.error(f"Error selecting stale documents: {str(e)}")
+        return {}
+
+def stale_fields_by_document(
+    versions: Dict[str, str],
+    model: Optional[str] = None,
+    db_path: str = "data/documents.db"
+) -> Dict[str, List[str]]:
+    """
+    The same staleness as stale_documents, grouped by document.
+
+    Returns:
+        Dict[str, List[str]]: Document ID -> its stale fields, in the order of versions
+    """
+    by_document = {}
+    for field, document_ids in stale_documents(versions, model, db_path).items():
+        for document_id in document_ids:
+            by_document.setdefault(document_id, []).append(field)
+    return by_document
+
+def provenance_summary(
+    versions: Dict[str, str],
+    model: Optional[str] = None,
+    db_path: str = "data/documents.db"
+) -> Dict[str, Any]:
+    """
+    Per field: the current prompt version, how many documents were generated
+    from each recorded version and model, and how many are stale.
+
+    Args:
+        versions: Field -> current prompt version
+        model: Current model name; None ignores the model in the stale counts
+        db_path: Path to the SQLite database
+
+    Returns:
+        Dict[str, Any]: Status, document total and a summary per field
+    """
+    try:
+        if not os.path.exists(db_path):
+            return {"status": "error", "message": f"Database not found: {db_path}"}
+        conn = sqlite3.connect(db_path)
+        try:
+            cursor = conn.cursor()
+            _ensure_table(cursor)
+            total = cursor.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            fields = {}
+            for field, version in versions.items():
+                generated = [
+                    {"prompt_hash": prompt_version, "model": generated_by, "count": count, "current": prompt_version == version and (not model or generated_by == model)}
+                    for prompt_version, generated_by, count in cursor.execute('''
+                        SELECT prompt_hash, model, COUNT(*) AS count FROM field_provenance
+                        WHERE field = ? GROUP BY prompt_hash, model ORDER BY count DESC''', (field,))
+                ]
+                stale = cursor.execute(
+                    f"SELECT COUNT(*) FROM ({_stale_query(model)})",
+                    (field, version, model) if model else (field, version)
+                ).fetchone()[0]
+                fields[field] = {"prompt_hash": version, "stale_count": stale, "generated": generated}
+        finally:
+            conn.close()
+        return {"status": "success", "model": model, "document_count": total, "fields": fields}
+    except Exception as e:
+        logger.error(f"Error summarizing provenance: {str(e)}")
+        return {"status": "error", "message": str(e)}
+
+def baseline_provenance(
+    versions: Dict[str, str],
+    model: str,
+    db_path: str = "data/documents.db"
+) -> int:
+    """
+    Record the current prompt versions for fields that have no provenance yet.
+
+    For databases built before provenance was recorded, when the stored values
+    are known to come from the current prompts; otherwise every such document
+    counts as stale and the next stale backfill regenerates it.
+
+    Returns:
+        int: Number of field values stamped (-1 on error)
+    """
+    try:
+        if not os.path.exists(db_path):
+            return -1
+        conn = sqlite3.connect(db_path)
+        try:
+            cursor = conn.cursor()
+            _ensure_table(cursor)
+            now = datetime.now().isoformat()
+            stamped = 0
+            for field, version in versions.items():
+                cursor.execute('''
+                INSERT INTO field_provenance (document_id, field, prompt_hash, model, generated_at)
+                SELECT d.id, ?, ?, ?, ? FROM documents d
+                WHERE NOT EXISTS (SELECT 1 FROM field_provenance p WHERE p.document_id = d.id AND p.field = ?)
+                ''', (field, version, model, now, field))
+                stamped += cursor.rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        logger.info(f"Recorded current prompt versions for {stamped} field values without provenance")
+        return stamped
+    except Exception as e:
+        logger.error(f"Error recording baseline provenance: {str(e)}")
+        return -1
@@ -0,0 +1,626 @@
+import os
+import re
+import math
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Set SIMILARITY_INDEX_ENABLED=false to stop indexing documents as they are saved
+SIMILARITY_INDEX_ENABLED = os.getenv('SIMILARITY_INDEX_ENABLED', 'true').lower() != 'false'
+
+# Embedding width; changing it requires rebuild_similarity_index()
+EMBEDDING_DIMENSIONS = int(os.getenv('SIMILARITY_DIMENSIONS', '256'))
+
+# Corpora of at least this many documents are split into IVF partitions on rebuild
+IVF_MIN_DOCUMENTS = int(os.getenv('SIMILARITY_IVF_MIN_DOCUMENTS', '50000'))
+
+# Partitions searched per query when the index is partitioned
+IVF_PROBES = int(os.getenv('SIMILARITY_IVF_PROBES', '8'))
+
+# Terms (words and word pairs) are hashed into this many TF-IDF features
+HASH_BUCKETS = 1 << 20
+
+# Output dimensions each feature is added to (sparse random projection)
+PROJECTIONS_PER_FEATURE = 4
+
+# Rows scored per matrix product, which bounds query memory on large indexes
+QUERY_BLOCK_ROWS = 65536
+
+_INITIAL_CAPACITY = 1024
+
+# Per-projection seeds (multiples of the 64-bit golden ratio), so each projection hashes differently
+_PROJECTION_SEEDS = [np.uint64((0x9E3779B97F4A7C15 * (i + 1)) % (1 << 64)) for i in range(PROJECTIONS_PER_FEATURE)]
+
+_STOPWORDS = frozenset((
+    "a an and are as at be by for from has have in is it its of on or that the this to was were "
+    "which with will their they these those we our can may not also been than into more such"
+).split())
+
+def index_directory(db_path: str) -> str:
+    """Directory holding the vector files of the index for a documents database."""
+    return f"{os.path.splitext(db_path)[0]}_vectors"
+
+def _document_text(document: Dict[str, Any]) -> str:
+    return "\n".join(document.get(field) or '' for field in ('title', 'summary', 'analysis'))
+
+def _terms(text: str) -> Counter:
+    """Word and adjacent word-pair counts of normalized text, without stopwords."""
+    words = [word for word in re.findall(r'[a-z0-9]+', text.lower()) if len(word) > 1 and word not in _STOPWORDS]
+    terms = Counter(words)
+    terms.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return terms
+
+def _features(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Hashed feature IDs (sorted, unique) and their term counts."""
+    terms = _terms(text)
+    if not terms:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(term.encode('utf-8'), digest_size=8).digest(), 'little') for term in terms),
+        dtype=np.uint64,
+        count=len(terms)
+    )
+    features, inverse = np.unique((hashes % np.uint64(HASH_BUCKETS)).astype(np.int64), return_inverse=True)
+    counts = np.zeros(len(features), dtype=np.float32)
+    np.add.at(counts, inverse, np.fromiter(terms.values(), dtype=np.float32, count=len(terms)))
+    return features, counts
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: spreads feature IDs into independent-looking 64-bit values."""
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+def embed(features: np.ndarray, counts: np.ndarray, document_frequency: np.ndarray, document_count: int, dimensions: int = EMBEDDING_DIMENSIONS) -> np.ndarray:
+    """
+    Project a hashed TF-IDF vector to a dense unit vector.
+
+    Each feature is added, with a pseudo-random sign, to PROJECTIONS_PER_FEATURE
+    output dimensions derived from its ID, which is a sparse random projection
+    of the HASH_BUCKETS-wide TF-IDF vector that needs no stored matrix.
+
+    Args:
+        features: Hashed feature IDs from _features
+        counts: Term count of each feature
+        document_frequency: Documents containing each hashed feature
+        document_count: Documents in the corpus
+        dimensions: Output dimensions
+
+    Returns:
+        np.ndarray: float32 vector of unit length (all zeros for empty text)
+    """
+    vector = np.zeros(dimensions, dtype=np.float32)
+    if not len(features):
+        return vector
+    idf = np.log((document_count + 1) / (document_frequency[features] + 1)) + 1
+    weights = ((1 + np.log(counts)) * idf).astype(np.float32)
+    seeds = features.astype(np.uint64)
+    for projection_seed in _PROJECTION_SEEDS:
+        mixed = _mix(seeds + projection_seed)
+        signs = np.where(mixed >> np.uint64(63), -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, (mixed % np.uint64(dimensions)).astype(np.int64), signs * weights)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def _top_k(scores: np.ndarray, rows: np.ndarray, limit: int) -> List[Tuple[int, float]]:
+    if len(scores) > limit:
+        best = np.argpartition(-scores, limit)[:limit]
+        scores, rows = scores[best], rows[best]
+    order = np.argsort(-scores)
+    return [(int(rows[i]), float(scores[i])) for i in order]
+
+def _ensure_tables(cursor: sqlite3.Cursor):
+    """Create the similarity index table if it doesn't exist."""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS similarity_vectors (
+        document_id TEXT PRIMARY KEY,
+        row INTEGER UNIQUE,
+        content_hash TEXT,
+        features BLOB,
+        updated_at TEXT
+    )
+    ''')
+
+class SimilarityIndex:
+    """
+    Embeddings of every document's title, summary and analysis, for "more like this" lookups.
+
+    Vectors are rows of a float32 matrix in a memory-mapped file next to the
+    documents database, so queries read straight from the page cache. The
+    document_id -> row mapping and each document's hashed features live in the
+    similarity_vectors table. Document frequencies (for IDF) are kept per hashed
+    feature, so documents are embedded incrementally as they are saved; IDF drift
+    is corrected by rebuild(). Corpora above IVF_MIN_DOCUMENTS are split into
+    k-means partitions on rebuild and queries only score the nearest ones.
+    """
+
+    def __init__(self, db_path: str = "data/documents.db", dimensions: int = EMBEDDING_DIMENSIONS):
+        self.db_path = db_path
+        self.dimensions = dimensions
+        self.directory = index_directory(db_path)
+        self._lock = threading.RLock()
+        self._vectors: Optional[np.memmap] = None
+        self._partitions: Optional[np.memmap] = None
+        self._document_frequency: Optional[np.memmap] = None
+        self._centroids: Optional[np.ndarray] = None
+        self._mapped_file = None
+        self._centroids_mtime = None
+        self._synced = False
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        _ensure_tables(conn.cursor())
+        return conn
+
+    def _map(self):
+        """Open (creating if needed) the vector, partition and frequency files; remap them if another writer changed them."""
+        os.makedirs(self.directory, exist_ok=True)
+        vectors_path = self._path("vectors.f32")
+        if not os.path.exists(vectors_path):
+            self._resize(_INITIAL_CAPACITY)
+        stat = os.stat(vectors_path)
+        # A new inode means the index was rebuilt, a new size that it grew
+        if (stat.st_ino, stat.st_size) != self._mapped_file:
+            capacity = stat.st_size // (4 * self.dimensions)
+            self._vectors = np.memmap(vectors_path, dtype=np.float32, mode='r+', shape=(capacity, self.dimensions))
+            self._partitions = np.memmap(self._path("partitions.i32"), dtype=np.int32, mode='r+', shape=(capacity,))
+            frequency_path = self._path("document_frequency.i32")
+            mode = 'r+' if os.path.exists(frequency_path) else 'w+'
+            self._document_frequency = np.memmap(frequency_path, dtype=np.int32, mode=mode, shape=(HASH_BUCKETS,))
+            self._mapped_file = (stat.st_ino, stat.st_size)
+
+        centroids_path = self._path("centroids.npy")
+        mtime = os.path.getmtime(centroids_path) if os.path.exists(centroids_path) else None
+        if mtime != self._centroids_mtime:
+            self._centroids = np.load(centroids_path) if mtime else None
+            self._centroids_mtime = mtime
+
+    def _resize(self, capacity: int):
+        """Grow the vector and partition files to hold capacity rows (new rows are zero)."""
+        for name, width in (("vectors.f32", 4 * self.dimensions), ("partitions.i32", 4)):
+            with open(self._path(name), 'ab') as f:
+                f.truncate(capacity * width)
+        self._mapped_file = None
+
+    def _ensure_capacity(self, row: int):
+        if row >= len(self._vectors):
+            capacity = len(self._vectors)
+            while capacity <= row:
+                capacity *= 2
+            self._vectors.flush()
+            self._partitions.flush()
+            self._resize(capacity)
+            self._map()
+
+    def _nearest_partition(self, vector: np.ndarray) -> int:
+        if self._centroids is None or not vector.any():
+            return -1
+        return int(np.argmax(self._centroids @ vector))
+
+    def add(self, document: Dict[str, Any]) -> bool:
+        """
+        Embed a document and store (or replace) its vector.
+
+        Args:
+            document: Document dictionary with id and any of title, summary, analysis
+
+        Returns:
+            bool: True if the vector was written, False if the text hadn't changed
+        """
+        text = _document_text(document)
+        content_hash = hashlib.md5(text.encode('utf-8')).hexdigest()
+        with self._lock:
+            conn = self._connect()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT row, content_hash, features FROM similarity_vectors WHERE document_id = ?",
+                    (document["id"],)
+                )
+                existing = cursor.fetchone()
+                if existing and existing[1] == content_hash:
+                    return False
+
+                cursor.execute("SELECT COALESCE(MAX(row) + 1, 0), COUNT(*) FROM similarity_vectors")
+                next_row, document_count = cursor.fetchone()
+                if existing:
+                    row = existing[0]
+                else:
+                    row = next_row
+                    document_count += 1
+
+                self._map()
+                features, counts = _features(text)
+                if existing:
+                    self._document_frequency[np.frombuffer(existing[2], dtype=np.int64)] -= 1
+                self._document_frequency[features] += 1
+
+                vector = embed(features, counts, self._document_frequency, document_count, self.dimensions)
+                self._ensure_capacity(row)
+                self._vectors[row] = vector
+                self._partitions[row] = self._nearest_partition(vector)
+
+                cursor.execute('''
+                INSERT OR REPLACE INTO similarity_vectors (document_id, row, content_hash, features, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ''', (document["id"], row, content_hash, features.tobytes(), datetime.now().isoformat()))
+                conn.commit()
+                self._vectors.flush()
+                self._partitions.flush()
+                self._document_frequency.flush()
+                return True
+            finally:
+                conn.close()
+
+    def remove(self, document_id: str) -> bool:
+        """
+        Drop a document's vector, e.g. once the document was deleted.
+
+        Returns:
+            bool: True if the document was indexed
+        """
+        with self._lock:
+            conn = self._connect()
+            try:
+                existing = conn.execute(
+                    "SELECT row, features FROM similarity_vectors WHERE document_id = ?", (document_id,)
+                ).fetchone()
+                if existing is None:
+                    return False
+                self._map()
+                self._document_frequency[np.frombuffer(existing[1], dtype=np.int64)] -= 1
+                # A zero row scores 0 and is never returned; the next new document may reuse it
+                self._vectors[existing[0]] = 0
+                self._partitions[existing[0]] = -1
+                conn.execute("DELETE FROM similarity_vectors WHERE document_id = ?", (document_id,))
+                conn.commit()
+                self._vectors.flush()
+                self._partitions.flush()
+                self._document_frequency.flush()
+                return True
+            finally:
+                conn.close()
+
+    def sync(self) -> Dict[str, int]:
+        """
+        Add the documents missing from the index and drop those no longer in the database.
+
+        Documents go missing when they were saved before the index existed or
+        with SIMILARITY_INDEX_ENABLED=false. When more documents are missing than
+        indexed, the index is rebuilt instead, so IDF comes from the whole corpus.
+
+        Returns:
+            Dict[str, int]: Documents added and removed
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.row_factory = sqlite3.Row
+            try:
+                missing = [dict(row) for row in conn.execute('''
+                    SELECT d.id, d.title, d.summary, d.analysis FROM documents d
+                    WHERE NOT EXISTS (SELECT 1 FROM similarity_vectors s WHERE s.document_id = d.id)
+                    ORDER BY d.rowid''')]
+                deleted = [row[0] for row in conn.execute('''
+                    SELECT s.document_id FROM similarity_vectors s
+                    WHERE NOT EXISTS (SELECT 1 FROM documents d WHERE d.id = s.document_id)''')]
+                indexed = conn.execute("SELECT COUNT(*) FROM similarity_vectors").fetchone()[0] - len(deleted)
+                documents = None
+                if len(missing) > indexed:
+                    documents = [dict(row) for row in conn.execute("SELECT id, title, summary, analysis FROM documents ORDER BY rowid")]
+            finally:
+                conn.close()
+
+            if documents is not None:
+                self.rebuild(documents)
+            else:
+                for document_id in deleted:
+                    self.remove(document_id)
+                for document in missing:
+                    self.add(document)
+            return {"added": len(missing), "removed": len(deleted)}
+
+    def ensure_synced(self):
+        """sync() once per process, before the first lookup."""
+        with self._lock:
+            if not self._synced:
+                result = self.sync()
+                self._synced = True
+                if result["added"] or result["removed"]:
+                    logger.info(f"Similarity index backfilled {result['added']} documents and dropped {result['removed']} deleted ones")
+
+    def search(self, vector: np.ndarray, limit: int = 10, exclude_row: Optional[int] = None, probes: int = IVF_PROBES) -> List[Tuple[int, float]]:
+        """
+        Rows most similar to a unit vector, by cosine similarity.
+
+        Args:
+            vector: Query vector (unit length)
+            limit: Maximum number of rows returned
+            exclude_row: Row to leave out, usually the query document's own
+            probes: Partitions scored when the index is partitioned
+
+        Returns:
+            List[Tuple[int, float]]: (row, score) pairs, best first, with positive scores only
+        """
+        with self._lock:
+            self._map()
+            conn = self._connect()
+            try:
+                row_count = conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM similarity_vectors").fetchone()[0]
+            finally:
+                conn.close()
+            vectors = self._vectors
+            partitions = self._partitions
+            centroids = self._centroids
+
+        if centroids is not None:
+            # Unpartitioned rows (-1) were written without text; they can't match anything
+            probe = np.argsort(-(centroids @ vector))[:probes]
+            candidates = np.flatnonzero(np.isin(partitions[:row_count], probe))
+            scores = vectors[candidates] @ vector
+            rows = candidates
+        else:
+            blocks = []
+            for start in range(0, row_count, QUERY_BLOCK_ROWS):
+                blocks.append(vectors[start:min(start + QUERY_BLOCK_ROWS, row_count)] @ vector)
+            scores = np.concatenate(blocks) if blocks else np.array([], dtype=np.float32)
+            rows = np.arange(len(scores))
+
+        keep = scores > 0
+        if exclude_row is not None:
+            keep &= rows != exclude_row
+        return _top_k(scores[keep], rows[keep], limit)
+
+    def similar(self, document_id: str, limit: int = 10, probes: int = IVF_PROBES) -> Optional[List[Dict[str, Any]]]:
+        """
+        Documents most similar to an indexed document.
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: document_id and score per match, best
+                first, or None if the document isn't indexed
+        """
+        conn = self._connect()
+        try:
+            found = conn.execute("SELECT row FROM similarity_vectors WHERE document_id = ?", (document_id,)).fetchone()
+        finally:
+            conn.close()
+        if found is None:
+            return None
+
+        with self._lock:
+            self._map()
+            vector = np.array(self._vectors[found[0]])
+        if not vector.any():
+            return []
+
+        matches = self.search(vector, limit, exclude_row=found[0], probes=probes)
+        if not matches:
+            return []
+        conn = self._connect()
+        try:
+            placeholders = ",".join("?" * len(matches))
+            ids = dict(conn.execute(
+                f"SELECT row, document_id FROM similarity_vectors WHERE row IN ({placeholders})",
+                [row for row, _ in matches]
+            ).fetchall())
+        finally:
+            conn.close()
+        return [{"document_id": ids[row], "score": round(score, 4)} for row, score in matches if row in ids]
+
+    def rebuild(self, documents: Iterable[Dict[str, Any]], partitions: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Re-embed every document from scratch with corpus-wide document frequencies.
+
+        Args:
+            documents: Every document to index (id, title, summary, analysis)
+            partitions: IVF partitions to train; None picks about 4 * sqrt(n) when
+                the corpus has at least IVF_MIN_DOCUMENTS documents, 0 disables
+
+        Returns:
+            Dict[str, Any]: Indexed document count and partition count
+        """
+        with self._lock:
+            featurized = []
+            frequency = np.zeros(HASH_BUCKETS, dtype=np.int32)
+            for document in documents:
+                text = _document_text(document)
+                features, counts = _features(text)
+                frequency[features] += 1
+                featurized.append((document["id"], hashlib.md5(text.encode('utf-8')).hexdigest(), features, counts))
+
+            # Start from empty files so stale rows and partitions don't survive
+            for name in ("vectors.f32", "partitions.i32", "centroids.npy", "document_frequency.i32"):
+                if os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+            self._mapped_file = None
+            self._map()
+            self._document_frequency[:] = frequency
+            self._ensure_capacity(max(len(featurized) - 1, 0))
+
+            rows = []
+            for row, (document_id, content_hash, features, counts) in enumerate(featurized):
+                self._vectors[row] = embed(features, counts, frequency, len(featurized), self.dimensions)
+                rows.append((document_id, row, content_hash, features.tobytes(), datetime.now().isoformat()))
+            self._partitions[:] = -1
+
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM similarity_vectors")
+                conn.executemany('''
+                INSERT INTO similarity_vectors (document_id, row, content_hash, features, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ''', rows)
+                conn.commit()
+            finally:
+                conn.close()
+
+            if partitions is None:
+                partitions = int(4 * math.sqrt(len(rows))) if len(rows) >= IVF_MIN_DOCUMENTS else 0
+            if partitions:
+                self.train_partitions(partitions, row_count=len(rows))
+            self._vectors.flush()
+            self._partitions.flush()
+            self._document_frequency.flush()
+            logger.info(f"Rebuilt similarity index with {len(rows)} documents and {partitions} partitions")
+            return {"documents": len(rows), "partitions": partitions}
+
+    def train_partitions(self, partitions: int, row_count: int, iterations: int = 10, sample_size: int = 100000, seed: int = 0):
+        """Spherical k-means over (a sample of) the vectors; assigns every row to its nearest centroid."""
+        with self._lock:
+            self._map()
+            rng = np.random.default_rng(seed)
+            vectors = self._vectors[:row_count]
+            nonzero = np.flatnonzero(np.abs(vectors).sum(axis=1) > 0)
+            partitions = min(partitions, len(nonzero))
+            if partitions == 0:
+                return
+            sample = vectors[np.sort(rng.choice(nonzero, size=min(sample_size, len(nonzero)), replace=False))]
+            centroids = sample[rng.choice(len(sample), size=partitions, replace=False)].copy()
+
+            for _ in range(iterations):
+                assignment = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, sample)
+                norms = np.linalg.norm(sums, axis=1)
+                empty = norms == 0
+                # Re-seed empty partitions from random sample points
+                sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+                norms[empty] = 1.0
+                centroids = (sums / norms[:, None]).astype(np.float32)
+
+            self._partitions[:row_count] = -1
+            for start in range(0, len(nonzero), QUERY_BLOCK_ROWS):
+                block = nonzero[start:start + QUERY_BLOCK_ROWS]
+                self._partitions[block] = np.argmax(vectors[block] @ centroids.T, axis=1)
+            self._partitions.flush()
+            np.save(self._path("centroids.npy"), centroids)
+            self._centroids_mtime = None
+            logger.info(f"Trained {partitions} similarity index partitions over {len(sample)} vectors")
+
+_indexes: Dict[str, SimilarityIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_similarity_index(db_path: str = "data/documents.db") -> SimilarityIndex:
+    """The process-wide index for a documents database."""
+    with _indexes_lock:
+        if db_path not in _indexes:
+            _indexes[db_path] = SimilarityIndex(db_path)
+        return _indexes[db_path]
+
+def index_saved_document(document_id: str, db_path: str = "data/documents.db") -> bool:
+    """
+    Bring a document's vector in step with its saved title, summary and analysis.
+
+    Reads the document back from the database, so it indexes whatever was last
+    saved, and drops the vector if the document is gone.
+
+    Args:
+        document_id: ID of the saved document
+        db_path: Path to the SQLite database the document was saved to
+
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    try:
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            row = conn.execute("SELECT id, title, summary, analysis FROM documents WHERE id = ?", (document_id,)).fetchone()
+        finally:
+            conn.close()
+        index = get_similarity_index(db_path)
+        if row is None:
+            index.remove(document_id)
+        else:
+            index.add(dict(row))
+        return True
+    except Exception as e:
+        logger.error(f"Error indexing document {document_id} for similarity: {str(e)}")
+        return False
+
+def find_similar_documents(document_id: str, limit: int = 10, db_path: str = "data/documents.db") -> Optional[List[Dict[str, Any]]]:
+    """
+    Find the documents whose title, summary and analysis are most similar to a document's.
+
+    The first lookup in a process backfills documents saved before the index
+    existed and drops deleted ones; matches whose document has since been
+    deleted are dropped from the index as they are found.
+
+    Args:
+        document_id: ID of the document to match
+        limit: Maximum number of results
+        db_path: Path to the SQLite database
+
+    Returns:
+        Optional[List[Dict[str, Any]]]: id, title, document_type and score per
+            match, best first, or None if the document doesn't exist
+    """
+    try:
+        if not os.path.exists(db_path):
+            return None
+        index = get_similarity_index(db_path)
+        index.ensure_synced()
+        matches = index.similar(document_id, limit)
+        if matches is None:
+            conn = sqlite3.connect(db_path)
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT id, title, summary, analysis FROM documents WHERE id = ?", (document_id,)).fetchone()
+            conn.close()
+            if row is None:
+                return None
+            index.add(dict(row))
+            matches = index.similar(document_id, limit) or []
+        if not matches:
+            return []
+
+        conn = sqlite3.connect(db_path)
+        placeholders = ",".join("?" * len(matches))
+        details = {
+            row[0]: {"title": row[1], "document_type": row[2]}
+            for row in conn.execute(
+                f"SELECT id, title, document_type FROM documents WHERE id IN ({placeholders})",
+                [match["document_id"] for match in matches]
+            )
+        }
+        conn.close()
+        for match in matches:
+            if match["document_id"] not in details:
+                index.remove(match["document_id"])
+        return [
+            {"id": match["document_id"], **details[match["document_id"]], "score": match["score"]}
+            for match in matches if match["document_id"] in details
+        ]
+    except Exception as e:
+        logger.error(f"Error finding documents similar to {document_id}: {str(e)}")
+        return None
+
+def rebuild_similarity_index(db_path: str = "data/documents.db", partitions: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Re-embed every document in the database, e.g. after a bulk import or to refresh IDF weights.
+
+    Args:
+        db_path: Path to the SQLite database
+        partitions: IVF partitions to train (None decides from the corpus size, 0 disables)
+
+    Returns:
+        Dict[str, Any]: Status, indexed document count and partition count
+    """
+    try:
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        documents = [dict(row) for row in conn.execute("SELECT id, title, summary, analysis FROM documents ORDER BY rowid")]
+        conn.close()
+        return {"status": "success", **get_similarity_index(db_path).rebuild(documents, partitions)}
+    except Exception as e:
+        logger.error(f"Error rebuilding similarity index: {str(e)}")
+        return {"status": "error", "message": str(e)}
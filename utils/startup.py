@@ -0,0 +1,59 @@
+import time
+import logging
+import threading
+from functools import wraps
+from typing import Dict, Any, Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Seconds spent in each startup phase (module import, lifespan) and in building
+# each lazily created component, in the order they happened
+_phases: Dict[str, float] = {}
+_components: Dict[str, float] = {}
+_lock = threading.Lock()
+
+def record_phase(name: str, seconds: float):
+    """Record how long a startup phase took."""
+    with _lock:
+        _phases[name] = round(seconds, 4)
+    logger.info(f"Startup phase {name} took {seconds * 1000:.1f} ms")
+
+def lazy(factory: Callable[[], T]) -> Callable[[], T]:
+    """
+    Turn a component factory into a getter that builds the component on first call.
+
+    The component is created once per process (concurrent first calls wait for
+    the same instance) and its construction time is added to the startup report.
+
+    Args:
+        factory: Zero-argument callable building the component; its name labels the report
+
+    Returns:
+        Callable[[], T]: Getter returning the shared instance
+    """
+    name = factory.__name__.removeprefix('get_')
+    instance = []
+    build_lock = threading.Lock()
+
+    @wraps(factory)
+    def get() -> T:
+        if not instance:
+            with build_lock:
+                if not instance:
+                    started = time.perf_counter()
+                    instance.append(factory())
+                    seconds = time.perf_counter() - started
+                    with _lock:
+                        _components[name] = round(seconds, 4)
+                    logger.info(f"Initialized {name} in {seconds * 1000:.1f} ms")
+        return instance[0]
+
+    get.is_initialized = lambda: bool(instance)
+    return get
+
+def startup_report() -> Dict[str, Any]:
+    """Startup phase and component initialization times recorded so far, in seconds."""
+    with _lock:
+        return {"phases": dict(_phases), "components": dict(_components)}
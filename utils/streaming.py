@@ -0,0 +1,82 @@
+import json
+import logging
+from typing import Dict, Any, AsyncIterator, Callable, Optional
+
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+# Supported stream formats and their media types
+MEDIA_TYPES = {
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson"
+}
+
+def format_event(event: Dict[str, Any], stream_format: str = "sse") -> str:
+    """
+    Serialize one event for the wire.
+
+    SSE events use the event's "event" key as the event name so browsers can
+    subscribe to "result" and "done" separately; NDJSON writes one object per line.
+    """
+    data = json.dumps(event, default=str)
+    if stream_format == "ndjson":
+        return data + "\n"
+    return f"event: {event.get('event', 'message')}\ndata: {data}\n\n"
+
+async def progress_events(
+    results: AsyncIterator[Dict[str, Any]],
+    summarize: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+    is_success: Optional[Callable[[Dict[str, Any]], bool]] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Turn per-document results into progress events.
+
+    Emits a "result" event per document (summarized when summarize is given), an
+    "error" event if the batch fails midway, and a final "done" event with counts.
+    Only counters are kept, so memory doesn't grow with the batch size.
+
+    Args:
+        results: Async iterator of per-document results
+        summarize: Optional function producing the compact form of a result
+        is_success: Predicate deciding which results count as succeeded (default: no "error" key)
+    """
+    is_success = is_success or (lambda result: not result.get("error"))
+    count = 0
+    succeeded = 0
+    try:
+        async for result in results:
+            count += 1
+            if is_success(result):
+                succeeded += 1
+            yield {
+                "event": "result",
+                "index": count,
+                "result": summarize(result) if summarize else result
+            }
+    except Exception as e:
+        logger.error(f"Error while streaming results: {str(e)}")
+        yield {"event": "error", "index": count, "message": str(e)}
+    yield {"event": "done", "total_count": count, "succeeded_count": succeeded, "failed_count": count - succeeded}
+
+def stream_events(events: AsyncIterator[Dict[str, Any]], stream_format: str = "sse") -> StreamingResponse:
+    """
+    Build a StreamingResponse that sends events as they are produced.
+
+    Args:
+        events: Async iterator of event dictionaries
+        stream_format: "sse" (Server-Sent Events) or "ndjson"
+    """
+    if stream_format not in MEDIA_TYPES:
+        raise ValueError(f"Unsupported stream format: {stream_format}")
+
+    async def body():
+        async for event in events:
+            yield format_event(event, stream_format)
+
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[stream_format],
+        # Stop proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,403 @@
+import os
+import re
+import math
+import sqlite3
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable, Set, Tuple
+
+from utils.entity_profiles import refresh_entity_profiles
+
+logger = logging.getLogger(__name__)
+
+# Minimum string similarity (1 - edit distance / length) for two tags to be merge candidates
+MIN_STRING_SIMILARITY = float(os.getenv('TAG_MERGE_MIN_SIMILARITY', '0.85'))
+
+# Candidates below this string similarity, and acronym or suffix candidates,
+# also need co-occurrence profiles at least this similar (cosine)
+MIN_CONTEXT_SIMILARITY = float(os.getenv('TAG_MERGE_MIN_CONTEXT', '0.3'))
+
+# Candidates at or above this string similarity merge without a context check
+CERTAIN_STRING_SIMILARITY = 0.92
+
+# Tags shorter than this are only merged by normalization or as acronyms
+MIN_FUZZY_LENGTH = 5
+
+# Largest edit distance considered, which keeps the deletion keys per tag small
+MAX_EDIT_DISTANCE = 2
+
+# Trailing words that don't change what a multi-word tag is about
+# (machine-learning-models -> machine-learning)
+GENERIC_SUFFIXES = frozenset((
+    "model", "system", "technique", "method", "approach", "application",
+    "technology", "framework", "solution"
+))
+
+# Words that look plural but aren't
+_SINGULAR_ENDINGS = ("ss", "us", "is", "ias", "ics", "ops", "series", "species", "news")
+NOT_PLURAL = frozenset((
+    "aws", "chaos", "gas", "ios", "kubernetes", "lens", "macos", "pandas",
+    "redis", "sales", "windows"
+))
+
+def _singular(word: str) -> str:
+    """Strip common English plural endings from a word."""
+    if len(word) <= 3 or word.isdigit() or word in NOT_PLURAL or word.endswith(_SINGULAR_ENDINGS):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("sses", "shes", "ches", "xes")):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+def normalize_tag(tag: str) -> str:
+    """
+    Normalize a free-form tag: lowercase and hyphen-separated.
+
+    "Machine Learning", "machine_learning" and "machine-learning " all become
+    "machine-learning". Plurals are left alone here; plan_canonicalization
+    merges one into its singular only when both are in the vocabulary.
+    """
+    words = re.split(r'[^a-z0-9+#]+', tag.lower().strip())
+    return "-".join(word for word in words if word)
+
+def _singular_form(tag: str) -> str:
+    """A normalized tag with its last word made singular ("neural-networks" -> "neural-network")."""
+    words = tag.split("-")
+    return "-".join(words[:-1] + [_singular(words[-1])])
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or limit + 1 once it's certain to exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+def _deletions(tag: str, depth: int) -> Set[str]:
+    """Every string reachable from tag by deleting up to depth characters."""
+    keys = {tag}
+    frontier = {tag}
+    for _ in range(depth):
+        frontier = {word[:i] + word[i + 1:] for word in frontier for i in range(len(word))}
+        keys |= frontier
+    return keys
+
+def _max_distance(tag: str) -> int:
+    return min(MAX_EDIT_DISTANCE, math.floor(len(tag) * (1 - MIN_STRING_SIMILARITY)))
+
+def _cosine(a: Counter, b: Counter, exclude: Tuple[str, str]) -> float:
+    """Cosine similarity of two co-occurrence profiles, ignoring the pair itself."""
+    dot = sum(count * b[tag] for tag, count in a.items() if tag in b and tag not in exclude)
+    if not dot:
+        return 0.0
+    norm_a = math.sqrt(sum(count * count for tag, count in a.items() if tag not in exclude))
+    norm_b = math.sqrt(sum(count * count for tag, count in b.items() if tag not in exclude))
+    return dot / (norm_a * norm_b)
+
+def _candidate_pairs(tags: Iterable[str]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """
+    Pairs of normalized tags that may mean the same thing, with why.
+
+    Spelling variants are found through shared deletion keys (two strings within
+    edit distance d share a string reachable by at most d deletions from each),
+    so the whole vocabulary is never compared pairwise.
+    """
+    tags = sorted(tags)
+    pairs = {}
+
+    by_key = defaultdict(list)
+    for tag in tags:
+        if len(tag) >= MIN_FUZZY_LENGTH:
+            for key in _deletions(tag, _max_distance(tag)):
+                by_key[key].append(tag)
+    for group in by_key.values():
+        for i, a in enumerate(group):
+            for b in group[i + 1:]:
+                # Different numbers are different things (gpt-3, gpt-4)
+                if (a, b) in pairs or re.findall(r'\d+', a) != re.findall(r'\d+', b):
+                    continue
+                limit = min(_max_distance(a), _max_distance(b))
+                distance = _edit_distance(a, b, limit)
+                if distance <= limit:
+                    similarity = 1 - distance / max(len(a), len(b))
+                    pairs[(a, b)] = {"reason": "spelling", "string_similarity": round(similarity, 3)}
+
+    known = set(tags)
+    for tag in tags:
+        singular = _singular_form(tag)
+        if singular != tag and singular in known:
+            pairs[tuple(sorted((singular, tag)))] = {"reason": "plural"}
+
+    by_initials = defaultdict(list)
+    for tag in tags:
+        words = tag.split("-")
+        if len(words) >= 2 and all(words):
+            by_initials["".join(word[0] for word in words)].append(tag)
+        if len(words) >= 3 and words[-1] in GENERIC_SUFFIXES:
+            base = "-".join(words[:-1])
+            if base in known:
+                pairs[tuple(sorted((base, tag)))] = {"reason": "suffix"}
+    for tag in tags:
+        if "-" not in tag and len(tag) >= 2:
+            for expansion in by_initials.get(tag, ()):
+                pairs[tuple(sorted((tag, expansion)))] = {"reason": "acronym"}
+    return pairs
+
+def _is_variant(tag: str, group: List[str]) -> bool:
+    """Whether a tag is a plural, an acronym or a generic-suffix form of another tag in its group (never preferred as canonical)."""
+    if _singular_form(tag) != tag and _singular_form(tag) in group:
+        return True
+    words = tag.split("-")
+    if len(words) >= 3 and words[-1] in GENERIC_SUFFIXES and "-".join(words[:-1]) in group:
+        return True
+    return len(words) == 1 and any(
+        "-" in other and "".join(word[:1] for word in other.split("-")) == tag
+        for other in group
+    )
+
+def _load_aliases(cursor: sqlite3.Cursor) -> Dict[str, str]:
+    try:
+        return dict(cursor.execute("SELECT alias, canonical FROM tag_aliases").fetchall())
+    except sqlite3.OperationalError:
+        # No canonicalization has been applied to this database yet
+        return {}
+
+def load_tag_aliases(db_path: str = "data/documents.db") -> Dict[str, str]:
+    """Alias -> canonical tag mapping recorded in a documents database (empty if there is none)."""
+    if not os.path.exists(db_path):
+        return {}
+    conn = sqlite3.connect(db_path)
+    try:
+        return _load_aliases(conn.cursor())
+    finally:
+        conn.close()
+
+def canonicalize_tags(tags: Iterable[str], aliases: Optional[Dict[str, str]] = None, cursor: Optional[sqlite3.Cursor] = None) -> List[str]:
+    """
+    Normalize tags and map them through the alias table, keeping order and dropping duplicates.
+
+    Args:
+        tags: Tags as generated
+        aliases: Alias -> canonical mapping; loaded from cursor's database if not given
+        cursor: Cursor on the documents database holding tag_aliases
+
+    Returns:
+        List[str]: Canonical tags
+    """
+    if aliases is None:
+        aliases = _load_aliases(cursor) if cursor is not None else {}
+    canonical = []
+    for tag in tags:
+        normalized = normalize_tag(tag)
+        if normalized:
+            canonical.append(aliases.get(normalized, normalized))
+    return list(dict.fromkeys(canonical))
+
+def plan_canonicalization(db_path: str = "data/documents.db") -> Dict[str, Any]:
+    """
+    Work out which tags in the database should be merged, without changing anything.
+
+    Tags are first grouped by their normalized form. Normalized tags are then
+    merged when one is the plural of the other, they are spelling variants
+    (edit distance), acronyms of one another, or differ only by a generic
+    trailing word. Except for plurals and nearly identical spellings, their
+    co-occurrence profiles (the other tags on their documents) must also be similar. Each merged group keeps the tag used on the
+    most documents, preferring full forms over acronyms and suffixed variants.
+
+    Args:
+        db_path: Path to the SQLite database
+
+    Returns:
+        Dict[str, Any]: Vocabulary size before and after, and per canonical tag
+            the tags merged into it with the reason, scores and document counts
+    """
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    aliases = _load_aliases(cursor)
+    names = dict(cursor.execute("SELECT id, name FROM tags").fetchall())
+    tag_documents = defaultdict(set)
+    document_tags = defaultdict(set)
+    for document_id, tag_id in cursor.execute("SELECT document_id, tag_id FROM document_tags"):
+        if tag_id in names:
+            tag_documents[names[tag_id]].add(document_id)
+    conn.close()
+
+    # Raw tags -> normalized (and previously aliased) keys
+    key_of = {name: canonicalize_tags([name], aliases)[0] if normalize_tag(name) else name for name in names.values()}
+    key_documents = defaultdict(set)
+    for name, documents in tag_documents.items():
+        key_documents[key_of[name]] |= documents
+        for document_id in documents:
+            document_tags[document_id].add(key_of[name])
+    keys = set(key_of.values())
+
+    candidates = _candidate_pairs(keys)
+    involved = {tag for pair in candidates for tag in pair}
+    profiles = defaultdict(Counter)
+    for document_keys in document_tags.values():
+        for key in document_keys & involved:
+            profiles[key].update(document_keys - {key})
+
+    parent = {key: key for key in keys}
+
+    def find(key: str) -> str:
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    evidence = {}
+    for (a, b), candidate in sorted(candidates.items()):
+        context = _cosine(profiles[a], profiles[b], (a, b))
+        string_similarity = candidate.get("string_similarity", 0.0)
+        certain = candidate["reason"] == "plural" or string_similarity >= CERTAIN_STRING_SIMILARITY
+        if not certain and context < MIN_CONTEXT_SIMILARITY:
+            continue
+        evidence[(a, b)] = {**candidate, "context_similarity": round(context, 3)}
+        parent[find(a)] = find(b)
+
+    groups = defaultdict(list)
+    for key in keys:
+        groups[find(key)].append(key)
+    canonical_of = {}
+    for members in groups.values():
+        best = min(members, key=lambda key: (_is_variant(key, members), -len(key_documents[key]), len(key), key))
+        for key in members:
+            canonical_of[key] = best
+
+    merges = defaultdict(list)
+    for name in sorted(names.values()):
+        target = canonical_of[key_of[name]]
+        if name == target:
+            continue
+        key = key_of[name]
+        if key == target:
+            reason = {"reason": "normalized" if normalize_tag(name) == key else "alias"}
+        else:
+            reason = evidence.get(tuple(sorted((key, target)))) or {"reason": "transitive"}
+        merges[target].append({"tag": name, "documents": len(tag_documents.get(name, ())), **reason})
+
+    return {
+        "status": "success",
+        "tags_before": len(names),
+        "tags_after": len(set(canonical_of.values())),
+        "merged_tags": sum(len(merged) for merged in merges.values()),
+        "merges": [
+            {"canonical": target, "documents": len(key_documents[target]), "aliases": merges[target]}
+            for target in sorted(merges, key=lambda target: -len(merges[target]))
+        ],
+        # Normalized forms merged into another tag, recorded so new documents use it too
+        "aliases": {key: target for key, target in canonical_of.items() if key != target}
+    }
+
+def apply_canonicalization(plan: Dict[str, Any], db_path: str = "data/documents.db") -> Dict[str, Any]:
+    """
+    Rewrite document_tags to the canonical tags of a plan and record its aliases, in one transaction.
+
+    Args:
+        plan: Result of plan_canonicalization
+        db_path: Path to the SQLite database
+
+    Returns:
+        Dict[str, Any]: Status and the number of tags merged and removed
+    """
+    renames = [(alias["tag"], merge["canonical"]) for merge in plan["merges"] for alias in merge["aliases"]]
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tag_aliases (
+            alias TEXT PRIMARY KEY,
+            canonical TEXT,
+            created_at TEXT
+        )
+        ''')
+        now = datetime.now().isoformat()
+        cursor.executemany(
+            "INSERT OR REPLACE INTO tag_aliases (alias, canonical, created_at) VALUES (?, ?, ?)",
+            [(alias, canonical, now) for alias, canonical in plan["aliases"].items()]
+        )
+        # Earlier aliases follow their canonical tag if it has now been merged too
+        cursor.executemany(
+            "UPDATE tag_aliases SET canonical = ? WHERE canonical = ?",
+            [(canonical, alias) for alias, canonical in plan["aliases"].items()]
+        )
+
+        cursor.executemany("INSERT OR IGNORE INTO tags (name) VALUES (?)", {(canonical,) for _, canonical in renames})
+        cursor.execute("CREATE TEMP TABLE tag_merges (old_id INTEGER PRIMARY KEY, new_id INTEGER)")
+        cursor.executemany('''
+        INSERT INTO tag_merges (old_id, new_id)
+        SELECT old.id, new.id FROM tags old, tags new WHERE old.name = ? AND new.name = ?
+        ''', renames)
+        cursor.execute('''
+        INSERT OR IGNORE INTO document_tags (document_id, tag_id)
+        SELECT dt.document_id, m.new_id FROM document_tags dt JOIN tag_merges m ON dt.tag_id = m.old_id
+        ''')
+        cursor.execute("DELETE FROM document_tags WHERE tag_id IN (SELECT old_id FROM tag_merges)")
+        cursor.execute("DELETE FROM tags WHERE id IN (SELECT old_id FROM tag_merges)")
+        removed = cursor.rowcount
+        cursor.execute("DROP TABLE tag_merges")
+        # Profile tag counts refer to the merged tag IDs
+        refresh_entity_profiles(cursor)
+        conn.commit()
+        logger.info(f"Canonicalized tags: merged {len(renames)} tags, vocabulary {plan['tags_before']} -> {plan['tags_after']}")
+        return {"status": "success", "merged_tags": len(renames), "removed_tags": removed}
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Error applying tag canonicalization: {str(e)}")
+        return {"status": "error", "message": str(e)}
+    finally:
+        conn.close()
+
+def canonicalize_tag_vocabulary(db_path: str = "data/documents.db", dry_run: bool = True) -> Dict[str, Any]:
+    """
+    Plan tag merges and, unless dry_run, apply them.
+
+    Args:
+        db_path: Path to the SQLite database
+        dry_run: Only report what would change
+
+    Returns:
+        Dict[str, Any]: The plan (see plan_canonicalization), plus the outcome when applied
+    """
+    try:
+        if not os.path.exists(db_path):
+            return {"status": "error", "message": f"Database not found: {db_path}"}
+        plan = plan_canonicalization(db_path)
+        plan["dry_run"] = dry_run
+        if not dry_run:
+            outcome = apply_canonicalization(plan, db_path)
+            if outcome["status"] == "error":
+                return outcome
+            plan.update(outcome)
+        return plan
+    except Exception as e:
+        logger.error(f"Error canonicalizing tags: {str(e)}")
+        return {"status": "error", "message": str(e)}
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Merge duplicate tags (reports only, unless --apply)")
+    parser.add_argument("--db", default="data/documents.db", help="Documents database")
+    parser.add_argument("--apply", action="store_true", help="Rewrite document_tags and record the aliases")
+    args = parser.parse_args()
+
+    result = canonicalize_tag_vocabulary(args.db, dry_run=not args.apply)
+    if result["status"] == "error":
+        raise SystemExit(result["message"])
+    for merge in result["merges"]:
+        aliases = ", ".join(f"{alias['tag']} ({alias['reason']}, {alias['documents']} docs)" for alias in merge["aliases"])
+        print(f"{merge['canonical']} ({merge['documents']} docs) <- {aliases}")
+    action = "Merged" if args.apply else "Would merge"
+    print(f"\n{action} {result['merged_tags']} tags: {result['tags_before']} -> {result['tags_after']}")
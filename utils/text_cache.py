@@ -0,0 +1,92 @@
+import os
+import zlib
+import sqlite3
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Keep the extracted text of processed documents, so reprocessing skips the download and extraction
+TEXT_CACHE_ENABLED = os.getenv('TEXT_CACHE_ENABLED', 'true').lower() != 'false'
+
+# Where the compressed text is stored (kept apart from documents.db, which stays small)
+TEXT_CACHE_DB = os.getenv('TEXT_CACHE_DB', 'data/text_cache.db')
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS document_text (
+        document_id TEXT PRIMARY KEY,
+        text BLOB,
+        characters INTEGER,
+        cached_at TEXT
+    )
+    ''')
+    return conn
+
+def cache_text(document_id: str, text: str, db_path: str = TEXT_CACHE_DB) -> bool:
+    """
+    Store (or replace) the extracted text of a document, zlib-compressed.
+
+    Args:
+        document_id: Document ID the text was extracted for
+        text: Extracted text
+        db_path: Path to the text cache database
+
+    Returns:
+        bool: True if successful, False otherwise (including when caching is disabled)
+    """
+    if not TEXT_CACHE_ENABLED or not text:
+        return False
+    try:
+        conn = _connect(db_path)
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO document_text (document_id, text, characters, cached_at) VALUES (?, ?, ?, ?)",
+                (document_id, zlib.compress(text.encode('utf-8')), len(text), datetime.now().isoformat())
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        return True
+    except Exception as e:
+        logger.error(f"Error caching text for {document_id}: {str(e)}")
+        return False
+
+def get_cached_texts(document_ids: List[str], db_path: str = TEXT_CACHE_DB) -> Dict[str, str]:
+    """
+    Get the cached text of several documents.
+
+    Args:
+        document_ids: Document IDs to look up
+        db_path: Path to the text cache database
+
+    Returns:
+        Dict[str, str]: Text by document ID, for the documents that are cached
+    """
+    if not TEXT_CACHE_ENABLED or not document_ids or not os.path.exists(db_path):
+        return {}
+    try:
+        conn = _connect(db_path)
+        try:
+            texts = {}
+            # Stay well below SQLite's bound parameter limit
+            for start in range(0, len(document_ids), 500):
+                batch = document_ids[start:start + 500]
+                cursor = conn.execute(
+                    f"SELECT document_id, text FROM document_text WHERE document_id IN ({','.join('?' * len(batch))})",
+                    batch
+                )
+                texts.update((document_id, zlib.decompress(blob).decode('utf-8')) for document_id, blob in cursor)
+            return texts
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.error(f"Error reading cached text: {str(e)}")
+        return {}
+
+def get_cached_text(document_id: str, db_path: str = TEXT_CACHE_DB) -> Optional[str]:
+    """Get the cached text of one document, or None if it isn't cached."""
+    return get_cached_texts([document_id], db_path).get(document_id)
@@ -1,34 +1,43 @@
-from pypdf import PdfReader
 import logging
 import os
+from typing import Union, BinaryIO
 
 logger = logging.getLogger(__name__)
 
-def extract_text_from_pdf(pdf_path: str) -> str:
+# Marks the end of each page in extracted text, so chunking can split on pages
+PAGE_BREAK = "\f"
+
+def _describe(pdf_path: Union[str, BinaryIO]) -> str:
+    """Name a PDF source for log messages."""
+    return pdf_path if isinstance(pdf_path, str) else "<in-memory>"
+
+def extract_text_from_pdf(pdf_path: Union[str, BinaryIO]) -> str:
     """
     Extract text content from a PDF file.
     
     Args:
-        pdf_path (str): Path to the PDF file
+        pdf_path (str | BinaryIO): Path to the PDF file, or a seekable stream of its bytes
         
     Returns:
-        str: Extracted text content
+        str: Extracted text content, each page followed by PAGE_BREAK
         
     Raises:
         FileNotFoundError: If PDF file doesn't exist
         Exception: For other PDF processing errors
     """
-    if not os.path.exists(pdf_path):
+    if isinstance(pdf_path, str) and not os.path.exists(pdf_path):
         raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+    
+    from pypdf import PdfReader
         
     try:
         reader = PdfReader(pdf_path)
         text = ""
         for page in reader.pages:
-            text += page.extract_text() + "\n"
+            text += page.extract_text() + "\n" + PAGE_BREAK
         if not text.strip():
-            logger.warning(f"No text content extracted from PDF {pdf_path}")
+            logger.warning(f"No text content extracted from PDF {_describe(pdf_path)}")
         return text
     except Exception as e:
-        logger.error(f"Error extracting text from PDF {pdf_path}: {str(e)}")
+        logger.error(f"Error extracting text from PDF {_describe(pdf_path)}: {str(e)}")
         raise  # Re-raise the exception to be handled by caller 
\ No newline at end of file